@@ -0,0 +1,152 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+# Benchmark harness: generate synthetic data into a scratch workspace, time each
+# pipeline stage on it and compare against a stored baseline. No network.
+#
+#   python -m src.bench.run --seasons 10 --repeat 3
+#   python -m src.bench.run --seasons 30 --scale 10 --save-baseline
+#   python -m src.bench.run --seasons 10 --fail-on-regression   # exit 1 on regressions
+#
+# Pipeline modules read RAW_DIR/PROC_DIR/ART_DIR at import time, so nothing from
+# src (other than this file) is imported until the workspace env is set.
+
+BENCH_DIR = Path(os.getenv("BENCH_DIR", "data/bench"))
+BASELINE = BENCH_DIR / "baseline.json"
+
+# (name, target, kwargs); run in order, later stages read earlier outputs
+BENCHMARKS = [
+    ("team_ratings", "src.features.team_ratings:build_team_epa_rolling", {}),
+    ("player_usage", "src.features.player_usage:build_player_usage", {}),
+    ("player_stat_projections", "src.models.player_stats_projections:build_player_stat_projections", {}),
+    ("context_features", "src.features.context_features:build_context_features", {}),
+    ("injury_adjustments", "src.features.injury_adjustments:build_injury_adjustments", {}),
+    ("betting_features", "src.etl.fetch_betting_weather:build_betting_game_features", {}),
+    ("game_model_table", "src.models.enrich_game_features:build_game_model_table", {}),
+    ("train_game_win", "src.models.train_game_win:train_and_save", {}),
+    ("train_game_win_ext", "src.models.train_game_win_ext:train_and_save_extended", {}),
+    ("season_sim", "src.models.season_sim:simulate_season", {"sims": 2000}),
+]
+
+def _seasons(spec: str) -> list[int]:
+    # "10" = the last 10 seasons ending 2024; "2015-2024" or "2019,2020" as in the pipelines
+    if spec.isdigit() and len(spec) <= 2:
+        n = int(spec)
+        if not 1 <= n <= 30:
+            raise SystemExit("--seasons count must be 1..30")
+        return list(range(2025 - n, 2025))
+    if "-" in spec:
+        a, b = [int(x) for x in spec.split("-")]
+        return list(range(a, b + 1))
+    return [int(x) for x in spec.split(",")]
+
+def _workspace(root: Path) -> None:
+    for k, sub in [("RAW_DIR", "raw"), ("PROC_DIR", "processed"), ("ART_DIR", "artifacts"),
+                   ("NFL_CACHE_DIR", "cache/nflverse")]:
+        os.environ[k] = str(root / sub)
+    os.environ["PIPELINE_MANIFEST"] = str(root / "artifacts" / "pipeline_manifest.json")
+    os.environ["NFL_OFFLINE"] = "1"
+
+def run_benchmarks(seasons: list[int], scale: float = 1.0, repeat: int = 1, sims: int = 2000,
+                   only: list[str] | None = None, seed: int = 0) -> dict:
+    """Generate data for `seasons` in the current workspace and time every benchmark."""
+    from src.bench.synthetic import generate
+    from src.pipelines.runner import resolve
+    from src.utils.profiling import profile_call
+
+    t0 = time.time()
+    rows = generate(seasons, scale=scale, seed=seed)
+    print(f"[bench] generated {rows} in {time.time() - t0:.1f}s")
+
+    results = {}
+    for name, target, kwargs in BENCHMARKS:
+        kwargs = dict(kwargs)
+        if name == "season_sim":
+            kwargs.update(season=max(seasons), sims=sims)
+        if only and name not in only:
+            resolve(target)(**kwargs)  # untimed: later benchmarks read its outputs
+            continue
+        runs = []
+        for _ in range(repeat):
+            _, stats = profile_call(resolve(target), kwargs)
+            runs.append(stats)
+        walls = [r["wall_s"] for r in runs]
+        results[name] = {"wall_s": statistics.median(walls), "wall_runs": walls,
+                         "cpu_s": statistics.median(r["cpu_s"] for r in runs)}
+        print(f"[bench] {name:<26} {results[name]['wall_s']:8.3f}s  (runs: {', '.join(f'{w:.3f}' for w in walls)})")
+    return {"seasons": seasons, "scale": scale, "repeat": repeat, "sims": sims, "rows": rows, "results": results}
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2, min_delta: float = 0.05) -> list[str]:
+    """Print current vs baseline; returns the benchmarks that regressed beyond `tolerance` (and `min_delta` seconds)."""
+    if (current["seasons"], current["scale"]) != (baseline["seasons"], baseline["scale"]):
+        print(f"[bench] note: baseline was {len(baseline['seasons'])} seasons x{baseline['scale']} scale, "
+              f"this run {len(current['seasons'])} seasons x{current['scale']}")
+    regressions = []
+    print(f"{'benchmark':<26}{'baseline s':>12}{'current s':>12}{'ratio':>8}")
+    for name, r in current["results"].items():
+        b = baseline["results"].get(name)
+        if b is None:
+            print(f"{name:<26}{'-':>12}{r['wall_s']:>12.3f}")
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] else float("inf")
+        flag = ""
+        if r["wall_s"] > b["wall_s"] * (1 + tolerance) and r["wall_s"] - b["wall_s"] > min_delta:
+            regressions.append(name); flag = "  REGRESSION"
+        elif r["wall_s"] < b["wall_s"] * (1 - tolerance) and b["wall_s"] - r["wall_s"] > min_delta:
+            flag = "  faster"
+        print(f"{name:<26}{b['wall_s']:>12.3f}{r['wall_s']:>12.3f}{ratio:>7.2f}x{flag}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Synthetic-data pipeline benchmarks")
+    ap.add_argument("--seasons", default="5", help="Number of seasons (1-30) or a range like 2015-2024")
+    ap.add_argument("--scale", type=float, default=1.0, help="Row multiplier for pbp/weekly (e.g. 10 for 10x rows)")
+    ap.add_argument("--repeat", type=int, default=1, help="Timed runs per benchmark (median is reported)")
+    ap.add_argument("--sims", type=int, default=2000, help="Season simulations")
+    ap.add_argument("--only", action="append", default=None, metavar="NAME", help="Time only these benchmarks (the others still run once, untimed)")
+    ap.add_argument("--workdir", default=None, help="Scratch workspace (default: a temp dir, removed afterwards)")
+    ap.add_argument("--baseline", default=str(BASELINE), help="Baseline JSON to compare against")
+    ap.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    ap.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any benchmark regressed")
+    args = ap.parse_args()
+
+    seasons = _seasons(args.seasons)
+    out_dir = BENCH_DIR.resolve()
+    root = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="nfl-bench-"))
+    _workspace(root.resolve())
+    try:
+        current = run_benchmarks(seasons, scale=args.scale, repeat=args.repeat, sims=args.sims, only=args.only)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    from src.utils.profiling import _git_commit
+    current.update(started=time.strftime("%Y%m%dT%H%M%S"), commit=_git_commit(), cpus=os.cpu_count())
+    out_dir.mkdir(parents=True, exist_ok=True)
+    p = out_dir / f"bench_{current['started']}.json"
+    p.write_text(json.dumps(current, indent=2))
+    print(f"[bench] results -> {p}")
+
+    regressions = []
+    baseline = Path(args.baseline)
+    if baseline.exists():
+        regressions = compare(current, json.loads(baseline.read_text()), tolerance=args.tolerance)
+        if regressions:
+            print(f"[bench] regressions (> {args.tolerance:.0%} slower): {', '.join(regressions)}")
+    if args.save_baseline:
+        baseline.parent.mkdir(parents=True, exist_ok=True)
+        baseline.write_text(json.dumps(current, indent=2))
+        print(f"[bench] baseline -> {baseline}")
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
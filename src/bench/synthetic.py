@@ -0,0 +1,141 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from src.etl.catalog import slim_pbp, write_partition
+from src.etl.fetch_betting_weather import append_snapshots
+from src.utils.schema import enforce
+
+# Schema-faithful synthetic nflverse tables, written to RAW_DIR exactly as
+# fetch_nflverse / fetch_injuries / fetch_betting_lines would write them.
+# Team codes are nflverse's (the Rams are "LA"), so normalization is exercised.
+# RAW_DIR is read at import time: set it before importing this module.
+
+NFLVERSE_TEAMS = [
+    "ARI", "ATL", "BAL", "BUF", "CAR", "CHI", "CIN", "CLE", "DAL", "DEN", "DET", "GB",
+    "HOU", "IND", "JAX", "KC", "LAC", "LA", "LV", "MIA", "MIN", "NE", "NO", "NYG",
+    "NYJ", "PHI", "PIT", "SEA", "SF", "TB", "TEN", "WAS",
+]
+WEEKS = 18
+PLAYS_PER_GAME = 170
+PLAYERS_PER_TEAM = 12   # skill players with weekly rows
+BOOKS = ["book_a", "book_b", "book_c"]
+SNAPSHOTS = 4           # line snapshots per game and book
+
+def schedule(season: int, rng: np.random.Generator, played_weeks: int = WEEKS) -> pd.DataFrame:
+    """Every team plays every week (16 games/week); weeks after `played_weeks` have no scores."""
+    n = len(NFLVERSE_TEAMS)
+    perms = np.argsort(rng.random((WEEKS, n)), axis=1)
+    home = np.array(NFLVERSE_TEAMS)[perms[:, 0::2]].ravel()
+    away = np.array(NFLVERSE_TEAMS)[perms[:, 1::2]].ravel()
+    week = np.repeat(np.arange(1, WEEKS + 1), n // 2)
+    # first Sunday after Sep 7, with a few Thursday/Monday games
+    sunday = pd.Timestamp(f"{season}-09-07") + pd.Timedelta(days=(6 - pd.Timestamp(f"{season}-09-07").dayofweek) % 7)
+    shift = rng.choice([-3, 0, 0, 0, 0, 0, 1], size=len(week))
+    gameday = sunday + pd.to_timedelta((week - 1) * 7 + shift, unit="D")
+    played = week <= played_weeks
+    score = lambda: np.where(played, rng.poisson(22, len(week)).astype(float), np.nan)
+    return pd.DataFrame({
+        "game_id": [f"{season}_{w:02d}_{a}_{h}" for w, a, h in zip(week, away, home)],
+        "season": season, "game_type": "REG", "week": week,
+        "gameday": gameday.strftime("%Y-%m-%d"),
+        "gametime": rng.choice(["13:00", "16:25", "20:20"], size=len(week), p=[.6, .3, .1]),
+        "away_team": away, "home_team": home,
+        "away_score": score(), "home_score": score(),
+        "spread_line": np.round(rng.normal(0, 6, len(week)) * 2) / 2,
+        "total_line": np.round(rng.normal(45, 4, len(week)) * 2) / 2,
+    })
+
+def pbp(games: pd.DataFrame, rng: np.random.Generator, scale: float = 1.0) -> pd.DataFrame:
+    games = games[games["home_score"].notna()]
+    per = max(1, int(PLAYS_PER_GAME * scale))
+    n = len(games) * per
+    g = np.repeat(np.arange(len(games)), per)
+    home_pos = rng.random(n) < 0.5
+    home, away = games["home_team"].to_numpy()[g], games["away_team"].to_numpy()[g]
+    play_type = rng.choice(["pass", "run", "punt", "field_goal", "kickoff", "no_play"], size=n,
+                           p=[.5, .36, .04, .02, .04, .04])
+    return pd.DataFrame({
+        "play_id": np.tile(np.arange(1, per + 1), len(games)).astype(float),
+        "game_id": games["game_id"].to_numpy()[g],
+        "season": games["season"].to_numpy()[g], "week": games["week"].to_numpy()[g],
+        "posteam": np.where(home_pos, home, away), "defteam": np.where(home_pos, away, home),
+        "play_type": play_type,
+        "rush_attempt": (play_type == "run").astype(float),
+        "pass_attempt": (play_type == "pass").astype(float),
+        "epa": rng.normal(0.0, 1.4, n),
+        # a few of the other ~370 columns so slimming matters
+        "yards_gained": rng.integers(-5, 30, n).astype(float),
+        "desc": "synthetic play",
+        "wp": rng.random(n),
+    })
+
+def weekly(games: pd.DataFrame, rng: np.random.Generator, scale: float = 1.0) -> pd.DataFrame:
+    games = games[games["home_score"].notna()]
+    teams = np.concatenate([games["home_team"].to_numpy(), games["away_team"].to_numpy()])
+    season = np.tile(games["season"].to_numpy(), 2)
+    week = np.tile(games["week"].to_numpy(), 2)
+    k = max(1, int(PLAYERS_PER_TEAM * scale))
+    t = np.repeat(teams, k)
+    slot = np.tile(np.arange(k), len(teams))
+    n = len(t)
+    targets = rng.poisson(np.where(slot < k // 2, 6, 1), n).astype(float)
+    carries = rng.poisson(np.where(slot >= k - 2, 12, 0.3), n).astype(float)
+    return pd.DataFrame({
+        "player_id": [f"00-{tm}{s:03d}" for tm, s in zip(t, slot)],
+        "player_name": [f"{tm} Player {s}" for tm, s in zip(t, slot)],
+        "position": np.where(slot >= k - 2, "RB", np.where(slot % 3 == 0, "TE", "WR")),
+        "recent_team": t, "season": np.repeat(season, k), "week": np.repeat(week, k),
+        "targets": targets, "receptions": np.floor(targets * rng.uniform(.4, .9, n)),
+        "receiving_yards": np.round(targets * rng.normal(8, 3, n)),
+        "receiving_tds": rng.binomial(1, .08, n).astype(float),
+        "carries": carries, "rushing_yards": np.round(carries * rng.normal(4.2, 1.5, n)),
+        "rushing_tds": rng.binomial(1, .06, n).astype(float),
+        "fantasy_points": rng.gamma(2, 4, n),
+    })
+
+def injuries(wk: pd.DataFrame, rng: np.random.Generator, rate: float = 0.08) -> pd.DataFrame:
+    rep = wk.loc[rng.random(len(wk)) < rate, ["season", "week", "recent_team", "player_id", "player_name", "position"]]
+    status = rng.choice(["Questionable", "Doubtful", "Out", "IR"], size=len(rep), p=[.55, .1, .3, .05])
+    return pd.DataFrame({
+        "season": rep["season"].to_numpy(), "game_type": "REG", "team": rep["recent_team"].to_numpy(),
+        "week": rep["week"].to_numpy(), "gsis_id": rep["player_id"].to_numpy(),
+        "position": rep["position"].to_numpy(), "full_name": rep["player_name"].to_numpy(),
+        "report_status": status, "status_norm": status,
+    })
+
+def betting(games: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Line snapshots per (game, book) over the week before kickoff, in nflverse-ish raw columns."""
+    g = games.loc[games.index.repeat(len(BOOKS) * SNAPSHOTS)].reset_index(drop=True)
+    n = len(g)
+    kick = pd.to_datetime(g["gameday"]) + pd.Timedelta(hours=17)
+    hours_before = np.tile(np.linspace(144, 1, SNAPSHOTS), len(games) * len(BOOKS))
+    return pd.DataFrame({
+        "game_id": g["game_id"], "season": g["season"],
+        "book": np.tile(np.repeat(BOOKS, SNAPSHOTS), len(games)),
+        "timestamp": kick - pd.to_timedelta(hours_before, unit="h"),
+        "spread_line": g["spread_line"] + np.round(rng.normal(0, 1, n) * 2) / 2,
+        "total_line": g["total_line"] + np.round(rng.normal(0, 1, n) * 2) / 2,
+    })
+
+def generate(seasons, scale: float = 1.0, seed: int = 0, played_weeks: int = WEEKS,
+             full_pbp: bool = False, with_betting: bool = True) -> dict:
+    """Write every raw table for `seasons`; returns row counts per table."""
+    rng = np.random.default_rng(seed)
+    seasons = sorted(int(s) for s in seasons)
+    rows = {"schedules": 0, "pbp": 0, "weekly": 0, "injuries": 0, "betting_log": 0}
+    for s in seasons:
+        games = schedule(s, rng, played_weeks if s == seasons[-1] else WEEKS)
+        plays = pbp(games, rng, scale)
+        wk = weekly(games, rng, scale)
+        write_partition(enforce(games), "schedules", s)
+        write_partition(enforce(slim_pbp(plays)), "pbp_slim", s)
+        if full_pbp:
+            write_partition(enforce(plays), "pbp", s)
+        write_partition(enforce(wk), "weekly", s)
+        inj = injuries(wk, rng)
+        write_partition(enforce(inj), "injuries", s)
+        if with_betting:
+            rows["betting_log"] += append_snapshots(betting(games, rng), fetched_at=pd.Timestamp(f"{s + 1}-02-15"))
+        rows["schedules"] += len(games); rows["pbp"] += len(plays); rows["weekly"] += len(wk)
+        rows["injuries"] += len(inj)
+    return rows
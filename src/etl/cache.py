@@ -0,0 +1,197 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import pandas as pd
+
+# Local download cache for nfl_data_py calls.
+# Entries are keyed by (function, season, kwargs, nfl_data_py version); completed
+# seasons are kept forever, the in-progress season (and season-less tables like
+# ids) expire after NFL_CACHE_TTL_HOURS. NFL_OFFLINE=1 never touches the network:
+# calls are served from the cache, then from NFL_FIXTURE_DIR
+# (`<function>_<season>.parquet` or `<function>.parquet`).
+CACHE_DIR = Path(os.getenv("NFL_CACHE_DIR", "data/cache/nflverse"))
+CACHE_TTL_HOURS = float(os.getenv("NFL_CACHE_TTL_HOURS", "12"))
+CACHE_MAX_GB = float(os.getenv("NFL_CACHE_MAX_GB", "20"))
+OFFLINE = os.getenv("NFL_OFFLINE", "0") == "1"
+FIXTURE_DIR = Path(os.getenv("NFL_FIXTURE_DIR", "data/fixtures/nflverse"))
+
+_lock = threading.Lock()
+
+def current_season(today: pd.Timestamp | None = None) -> int:
+    """NFL season in progress (Jan/Feb playoff games belong to the prior season)."""
+    today = today or pd.Timestamp.today()
+    return today.year if today.month >= 3 else today.year - 1
+
+def _package_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("nfl_data_py")
+    except Exception:
+        return "unknown"
+
+def _ident(fn_name: str, season, kwargs: dict | None) -> dict:
+    return {"fn": fn_name, "season": season, "kwargs": json.dumps(kwargs or {}, sort_keys=True, default=str)}
+
+def cache_key(fn_name: str, season, kwargs: dict | None = None, version: str | None = None) -> str:
+    ident = _ident(fn_name, season, kwargs)
+    ident["version"] = version or _package_version()
+    return hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()[:32]
+
+def _meta_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+def _data_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.parquet"
+
+def _read_meta(p: Path) -> dict | None:
+    try:
+        return json.loads(p.read_text())
+    except Exception:
+        return None
+
+def _is_fresh(meta: dict) -> bool:
+    season = meta.get("season")
+    if season is not None and int(season) < current_season():
+        return True  # completed seasons never change
+    return (time.time() - meta.get("created", 0)) < CACHE_TTL_HOURS * 3600
+
+def _touch(key: str, meta: dict) -> None:
+    meta["last_access"] = time.time()
+    with _lock:
+        _meta_path(key).write_text(json.dumps(meta))
+
+def _offline_lookup(fn_name: str, season, kwargs: dict | None) -> pd.DataFrame | None:
+    # newest cached entry for this call under any package version, then fixtures
+    ident = _ident(fn_name, season, kwargs)
+    best = None
+    if CACHE_DIR.is_dir():
+        for mp in CACHE_DIR.glob("*.json"):
+            m = _read_meta(mp)
+            if m and all(m.get(k) == v for k, v in ident.items()) and _data_path(mp.stem).exists():
+                if best is None or m["created"] > best[1]["created"]:
+                    best = (mp.stem, m)
+    if best is not None:
+        _touch(*best)
+        return pd.read_parquet(_data_path(best[0]))
+    name = f"{fn_name}_{season}.parquet" if season is not None else f"{fn_name}.parquet"
+    if (FIXTURE_DIR / name).exists():
+        return pd.read_parquet(FIXTURE_DIR / name)
+    return None
+
+def _store(key: str, meta: dict, df: pd.DataFrame) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = _data_path(key).with_suffix(".parquet.tmp")
+    try:
+        df.to_parquet(tmp, index=False)
+    except Exception as e:
+        print(f"[cache] could not cache {meta['fn']} {meta['season']}: {e}")
+        tmp.unlink(missing_ok=True)
+        return
+    os.replace(tmp, _data_path(key))
+    meta.update(created=time.time(), last_access=time.time(), bytes=_data_path(key).stat().st_size)
+    with _lock:
+        _meta_path(key).write_text(json.dumps(meta))
+    evict()
+
+def evict(max_gb: float | None = None) -> int:
+    """Drop least-recently-used entries until the cache fits under the disk cap. Returns bytes freed."""
+    cap = (CACHE_MAX_GB if max_gb is None else max_gb) * 2**30
+    with _lock:
+        if not CACHE_DIR.is_dir():
+            return 0
+        entries = []
+        for mp in CACHE_DIR.glob("*.json"):
+            m = _read_meta(mp)
+            if m is not None:
+                entries.append((m.get("last_access", 0), m.get("bytes", 0), mp.stem))
+        total = sum(e[1] for e in entries)
+        freed = 0
+        for _, size, key in sorted(entries):
+            if total - freed <= cap:
+                break
+            _data_path(key).unlink(missing_ok=True)
+            _meta_path(key).unlink(missing_ok=True)
+            freed += size
+        return freed
+
+def cached_call(fn_name: str, season, fetch, kwargs: dict | None = None) -> pd.DataFrame:
+    """
+    Return `fetch()` for one (function, season) unit through the cache.
+    A stale entry is still served if the refresh fails.
+    """
+    if OFFLINE:
+        df = _offline_lookup(fn_name, season, kwargs)
+        if df is None:
+            raise FileNotFoundError(f"offline: {fn_name} season={season} not found in cache or fixtures")
+        return df
+
+    key = cache_key(fn_name, season, kwargs)
+    meta = _read_meta(_meta_path(key)) if _meta_path(key).exists() else None
+    if meta is not None and _data_path(key).exists() and _is_fresh(meta):
+        _touch(key, meta)
+        return pd.read_parquet(_data_path(key))
+    try:
+        df = fetch()
+    except Exception:
+        if meta is not None and _data_path(key).exists():
+            print(f"[cache] refresh of {fn_name} {season} failed; serving stale copy.")
+            _touch(key, meta)
+            return pd.read_parquet(_data_path(key))
+        raise
+    if df is not None and len(df):
+        _store(key, {**_ident(fn_name, season, kwargs), "version": _package_version()}, df)
+    return df
+
+class CachedNFL:
+    """
+    Stand-in for the `nfl_data_py` module: `import_*` functions split their
+    year list into per-season cached calls. With NFL_OFFLINE=1 it works
+    without the package installed, serving only cache/fixture data.
+    """
+    def __init__(self):
+        try:
+            import nfl_data_py as nfl
+        except Exception:
+            if not OFFLINE:
+                raise
+            nfl = None
+        self._nfl = nfl
+
+    def _offline_has(self, name: str) -> bool:
+        if FIXTURE_DIR.is_dir() and any(FIXTURE_DIR.glob(f"{name}*.parquet")):
+            return True
+        return CACHE_DIR.is_dir() and any((_read_meta(p) or {}).get("fn") == name for p in CACHE_DIR.glob("*.json"))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        real = getattr(self._nfl, name, None) if self._nfl is not None else None
+        if not name.startswith("import_") or (real is None and not (OFFLINE and self._offline_has(name))):
+            if real is None:
+                raise AttributeError(name)
+            return real
+
+        def call(years=None, **kwargs):
+            if years is None:
+                return cached_call(name, None, lambda: real(**kwargs), kwargs)
+            parts = []
+            for y in years:
+                try:
+                    parts.append(cached_call(name, int(y), lambda y=y: real([y], **kwargs), kwargs))
+                except Exception as e:
+                    from src.etl.fetch_nflverse import _is_not_found   # lazy: fetch_nflverse imports this module
+                    if len(years) > 1 and _is_not_found(e):
+                        print(f"[{name}] {y} not available; skipping.")
+                        continue
+                    raise
+            parts = [p for p in parts if p is not None and len(p)]
+            return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        call.__name__ = name
+        return call
+
+def nfl_client() -> CachedNFL:
+    return CachedNFL()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+import os
+import re
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.utils.schema import enforce
+
+RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
+
+# Rows per parquet row group: small enough that week/game filters can skip groups
+ROW_GROUP_ROWS = int(os.getenv("ROW_GROUP_ROWS", "32768"))
+COMPRESSION = "zstd"
+
+# Sort order inside each season partition (columns missing from a table are ignored)
+SORT_KEYS = {
+    "pbp": ["week", "game_id", "play_id"],
+    "pbp_slim": ["week", "game_id", "play_id"],
+    "weekly": ["week", "player_id"],
+    "rosters": ["week", "team", "player_id"],
+    "schedules": ["week", "game_id"],
+    "injuries": ["week", "team", "gsis_id"],
+}
+
+# Columns materialized into the slim `pbp_slim` table at ETL time (and the only
+# ones downloaded with PBP_KEEP_FULL=0). Declared here rather than registered by
+# the feature modules: stages run in their own worker processes, and the ETL one
+# never imports them. A feature module that reads more pbp columns must add them
+# here; team_ratings checks its set is covered at import.
+PBP_SLIM_COLUMNS = ["season", "week", "game_id", "play_id", "posteam", "defteam",
+                    "play_type", "rush_attempt", "pass_attempt", "epa"]
+
+def slim_pbp(df: pd.DataFrame) -> pd.DataFrame:
+    return df[[c for c in PBP_SLIM_COLUMNS if c in df.columns]]
+
+_PART_RE = re.compile(r"^season=(\d{4})$")
+
+def table_dir(table: str) -> Path:
+    return RAW_DIR / table
+
+def partition_path(table: str, season: int) -> Path:
+    return table_dir(table) / f"season={int(season)}" / "part-0.parquet"
+
+def write_partition(df: pd.DataFrame, table: str, season: int) -> str:
+    """
+    (Re)write one season partition: rows sorted by SORT_KEYS, zstd-compressed,
+    fixed-size row groups with column statistics. Atomic replace, so a failed
+    refresh never leaves a half-written season behind.
+    """
+    keys = [c for c in SORT_KEYS.get(table, []) if c in df.columns]
+    if keys:
+        df = df.sort_values(keys, kind="mergesort")
+    p = partition_path(table, season)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp,
+                   compression=COMPRESSION, row_group_size=ROW_GROUP_ROWS, write_statistics=True)
+    os.replace(tmp, p)
+    return str(p)
+
+def write_partitions(df: pd.DataFrame, table: str, season_col: str = "season") -> list[str]:
+    """Split a multi-season frame and rewrite only the seasons it contains."""
+    return [write_partition(g, table, int(s)) for s, g in df.groupby(season_col)]
+
+def _partitions(table: str) -> dict[int, Path]:
+    d = table_dir(table)
+    if not d.is_dir():
+        return {}
+    out = {}
+    for sub in d.iterdir():
+        m = _PART_RE.match(sub.name)
+        if m and (sub / "part-0.parquet").exists():
+            out[int(m.group(1))] = sub / "part-0.parquet"
+    return out
+
+def _legacy_files(table: str) -> dict[int, Path]:
+    """
+    Map season -> monolithic `{table}_{start}_{end}.parquet` file covering it.
+    When ranges overlap the most recently written file wins, so no season is
+    read twice.
+    """
+    pat = re.compile(rf"^{re.escape(table)}_(\d{{4}})_(\d{{4}})\.parquet$")
+    files = []
+    for p in RAW_DIR.glob(f"{table}_*.parquet"):
+        m = pat.match(p.name)
+        if m:
+            files.append((p.stat().st_mtime, int(m.group(1)), int(m.group(2)), p))
+    out: dict[int, Path] = {}
+    for _, start, end, p in sorted(files):
+        for s in range(start, end + 1):
+            out[s] = p
+    return out
+
+def _sources(table: str) -> dict[int, Path]:
+    # partitions take precedence over any legacy range file
+    src = _legacy_files(table)
+    src.update(_partitions(table))
+    return src
+
+def available_seasons(table: str) -> list[int]:
+    return sorted(_sources(table))
+
+def _read_one(path: Path, season: int, columns: list[str] | None, filters) -> pd.DataFrame:
+    names = pq.read_schema(path).names
+    cols = None if columns is None else [c for c in columns if c in names]
+    flt = list(filters or [])
+    if path.parent.name != f"season={season}":
+        # legacy range file: only pull this season's rows
+        flt.append(("season", "==", season))
+    return pq.read_table(path, columns=cols, filters=flt or None).to_pandas()
+
+def read_table(table: str, seasons=None, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+    """
+    Read a raw table, touching only the requested seasons and columns.
+    `filters` is a pyarrow DNF list (e.g. [("week", "<=", 10)]) pushed down to
+    row-group statistics. Requested columns absent from a season are skipped.
+    The pipeline schema (src.utils.schema) is enforced on the result.
+    """
+    src = _sources(table)
+    if not src:
+        raise FileNotFoundError(f"No '{table}' data in {RAW_DIR}; run ETL first.")
+    wanted = sorted(src) if seasons is None else [int(s) for s in seasons if int(s) in src]
+    parts = [_read_one(src[s], s, columns, filters) for s in wanted]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame(columns=columns or [])
+    return enforce(pd.concat(parts, ignore_index=True), inplace=True)
+
+def materialize_pbp_slim(seasons=None) -> list[str]:
+    """(Re)build slim pbp partitions from full-width pbp already on disk, one season at a time."""
+    full = _sources("pbp")
+    wanted = sorted(full) if seasons is None else [int(s) for s in seasons if int(s) in full]
+    return [write_partition(_read_one(full[s], s, PBP_SLIM_COLUMNS, None), "pbp_slim", s) for s in wanted]
+
+def _pbp_sources(seasons, columns: list[str]) -> list[tuple[int, Path]]:
+    # slim partition if it has every requested column, else the full-width table
+    slim, full = _sources("pbp_slim"), _sources("pbp")
+    wanted = sorted(set(slim) | set(full)) if seasons is None else [int(s) for s in seasons]
+    out = []
+    for s in wanted:
+        if s in slim and set(columns) <= set(pq.read_schema(slim[s]).names):
+            out.append((s, slim[s]))
+        elif s in full:
+            out.append((s, full[s]))
+    return out
+
+def read_pbp(seasons=None, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+    """
+    Read play-by-play from the slim projection where it covers the requested
+    columns, falling back per season to the full-width table (column-pruned).
+    """
+    columns = columns or PBP_SLIM_COLUMNS
+    parts = [_read_one(p, s, columns, filters) for s, p in _pbp_sources(seasons, columns)]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        raise FileNotFoundError(f"No pbp data in {RAW_DIR}; run ETL first.")
+    return enforce(pd.concat(parts, ignore_index=True), inplace=True)
+
+def iter_pbp(seasons=None, columns: list[str] | None = None, memory_mb: float = 256):
+    """
+    Yield play-by-play as pandas chunks, one parquet batch at a time, so peak
+    memory is set by `memory_mb` rather than by how many seasons exist.
+    Batch size is calibrated from the in-memory width of a small probe batch.
+    """
+    columns = columns or PBP_SLIM_COLUMNS
+    batch_rows = None
+    for s, path in _pbp_sources(seasons, columns):
+        pf = pq.ParquetFile(path)
+        cols = [c for c in columns if c in pf.schema_arrow.names]
+        if batch_rows is None:
+            probe = next(pf.iter_batches(batch_size=4096, columns=cols), None)
+            if probe is None or probe.num_rows == 0:
+                continue
+            per_row = probe.to_pandas().memory_usage(deep=True).sum() / probe.num_rows
+            # arrow batch + pandas copy + filter/groupby temporaries ~ 4x the frame
+            batch_rows = max(4096, int(memory_mb * 2**20 / (4 * per_row)))
+        legacy = path.parent.name != f"season={s}"
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=cols):
+            df = batch.to_pandas()
+            if legacy:
+                df = df[df["season"] == s]
+            if len(df):
+                yield enforce(df)
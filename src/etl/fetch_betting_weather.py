@@ -1,14 +1,182 @@
 from __future__ import annotations
+import hashlib
+import json
 import os
+import re
 from pathlib import Path
 import pandas as pd
+import pyarrow.parquet as pq
+from src.etl.cache import nfl_client
+from src.etl.catalog import read_table
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 
+# Append-only line snapshot log: betting_log/season=YYYY/date=YYYY-MM-DD/part-<hash>.parquet,
+# one row per (game_id, book, timestamp). Timestamps are the feed's own, naive UTC;
+# fetched_at is when we pulled the row. Feeds without timestamps only carry
+# closing lines: those rows have timestamp NaT, live in date=undated and count
+# as taken at kickoff.
+LOG_DIR = RAW_DIR / "betting_log"
+LOG_KEYS = ["game_id", "book", "timestamp"]
+LOG_COLUMNS = LOG_KEYS + ["season", "spread", "total", "fetched_at"]
+UNDATED = "undated"
+MIGRATED = LOG_DIR / "_migrated.json"   # legacy betting_*.parquet files already imported
+
+# Source column candidates across nfl_data_py versions / feeds
+_CANDIDATES = {
+    "spread": ["spread_close", "closing_spread", "spread_line", "home_spread", "spread"],
+    "total": ["total_close", "closing_total", "total_line", "over_under", "total"],
+    "book": ["book", "sportsbook", "provider", "bookmaker"],
+    "timestamp": ["timestamp", "line_timestamp", "updated_at", "last_update", "ts"],
+}
+_DATE_RE = re.compile(r"^date=(\d{4}-\d{2}-\d{2})$")
+
+def _pick(df: pd.DataFrame, key: str) -> str | None:
+    cols = {c.lower(): c for c in df.columns}
+    return next((cols[c] for c in _CANDIDATES[key] if c in cols), None)
+
+def normalize_lines(df: pd.DataFrame, fetched_at: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Map a raw betting table onto the log schema. Snapshots without a timestamp keep NaT (closing lines)."""
+    fetched_at = pd.Timestamp(fetched_at or pd.Timestamp.utcnow()).tz_localize(None)
+    out = pd.DataFrame({"game_id": df["game_id"].astype(str)})
+    book = _pick(df, "book")
+    out["book"] = df[book].astype(str) if book else "consensus"
+    ts = _pick(df, "timestamp")
+    if ts:
+        out["timestamp"] = pd.to_datetime(df[ts], errors="coerce", utc=True).dt.tz_localize(None)
+    else:
+        out["timestamp"] = pd.Series(pd.NaT, index=out.index, dtype="datetime64[ns]")
+    out["fetched_at"] = fetched_at
+    out["season"] = (df["season"] if "season" in df.columns else out["game_id"].str[:4]).astype(int)
+    for key in ("spread", "total"):
+        src = _pick(df, key)
+        out[key] = pd.to_numeric(df[src], errors="coerce") if src else float("nan")
+    return out.dropna(subset=["spread", "total"], how="all")
+
+def _partition_dir(season: int, day) -> Path:
+    return LOG_DIR / f"season={int(season)}" / (f"date={UNDATED}" if day is None else f"date={pd.Timestamp(day):%Y-%m-%d}")
+
+def _read_dir(d: Path, columns=None) -> pd.DataFrame | None:
+    files = list(d.glob("*.parquet")) if d.is_dir() else []
+    if not files:
+        return None
+    return pd.concat([pq.read_table(p, columns=columns).to_pandas() for p in files], ignore_index=True)
+
+def _same(a: pd.Series, b: pd.Series) -> pd.Series:
+    return (a == b) | (a.isna() & b.isna())
+
+def _new_rows(part: pd.DataFrame, d: Path, undated: bool) -> pd.DataFrame:
+    if not undated:
+        seen = _read_dir(d, LOG_KEYS)
+        return part if seen is None else part[~pd.MultiIndex.from_frame(part[LOG_KEYS]).isin(pd.MultiIndex.from_frame(seen))]
+    # no feed timestamp to key on: skip rows that repeat the last logged line of their (game, book)
+    seen = _read_dir(d, ["game_id", "book", "spread", "total", "fetched_at"])
+    if seen is None:
+        return part
+    last = seen.sort_values("fetched_at").drop_duplicates(["game_id", "book"], keep="last")
+    m = part.merge(last.drop(columns="fetched_at"), on=["game_id", "book"], how="left", suffixes=("", "_prev"))
+    repeat = _same(m["spread"], m["spread_prev"]) & _same(m["total"], m["total_prev"])
+    return part[~repeat.to_numpy()]
+
+def append_snapshots(df: pd.DataFrame, fetched_at: pd.Timestamp | None = None) -> int:
+    """
+    Append line snapshots to the log. Only the partitions the new rows fall
+    into (their day, or the season's undated one) are consulted for
+    de-duplication, so cost is O(new rows), not O(history). Returns the number
+    of rows actually written.
+    """
+    new = normalize_lines(df, fetched_at)
+    dated, undated = new[new["timestamp"].notna()], new[new["timestamp"].isna()]
+    parts = [(season, day, p.drop_duplicates(LOG_KEYS, keep="last"))
+             for (season, day), p in dated.groupby(["season", dated["timestamp"].dt.normalize()])]
+    parts += [(season, None, p.drop_duplicates(["game_id", "book"], keep="last")) for season, p in undated.groupby("season")]
+    written = 0
+    for season, day, part in parts:
+        d = _partition_dir(season, day)
+        part = _new_rows(part, d, undated=day is None)
+        if part.empty:
+            continue
+        part = part.sort_values(LOG_KEYS)[LOG_COLUMNS]
+        digest = hashlib.sha1(pd.util.hash_pandas_object(part, index=False).values.tobytes()).hexdigest()[:12]
+        d.mkdir(parents=True, exist_ok=True)
+        part.to_parquet(d / f"part-{digest}.parquet", index=False)
+        written += len(part)
+    return written
+
+def read_log(seasons=None, until: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Read the snapshot log, pruning season and day partitions (days after `until` are skipped)."""
+    files = []
+    for sd in sorted(LOG_DIR.glob("season=*")):
+        if seasons is not None and int(sd.name.split("=")[1]) not in {int(s) for s in seasons}:
+            continue
+        for dd in sorted(sd.iterdir()):
+            m = _DATE_RE.match(dd.name)
+            # undated rows are closing lines, never after any cutoff day
+            if dd.name == f"date={UNDATED}" or (m and (until is None or pd.Timestamp(m.group(1)) <= pd.Timestamp(until).normalize())):
+                files.extend(sorted(dd.glob("*.parquet")))
+    if not files:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    return pd.concat([pd.read_parquet(p) for p in files], ignore_index=True).reindex(columns=LOG_COLUMNS)
+
+def _kickoffs(seasons=None) -> pd.DataFrame:
+    """game_id -> kickoff (naive UTC) from schedules; gametime is US/Eastern."""
+    try:
+        s = read_table("schedules", seasons=seasons, columns=["game_id", "gameday", "gametime"])
+    except FileNotFoundError:
+        return pd.DataFrame(columns=["game_id", "kickoff"])
+    t = s["gametime"].fillna("13:00") if "gametime" in s.columns else "13:00"
+    local = pd.to_datetime(s["gameday"].astype(str) + " " + t, errors="coerce")
+    kick = local.dt.tz_localize("America/New_York", ambiguous="NaT", nonexistent="NaT").dt.tz_convert("UTC").dt.tz_localize(None)
+    return pd.DataFrame({"game_id": s["game_id"].astype(str), "kickoff": kick})
+
+def lines_asof(log: pd.DataFrame, cutoffs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Consensus (median across books) line per game as of each game's cutoff.
+    `cutoffs` has game_id, cutoff (naive UTC; NaT = no cutoff) and optionally
+    kickoff. For each (game, book) the last snapshot at or before the cutoff is
+    used; snapshots without a timestamp count as taken at kickoff.
+    """
+    m = log.merge(cutoffs[[c for c in ("game_id", "cutoff", "kickoff") if c in cutoffs.columns]], on="game_id", how="inner")
+    at = m["timestamp"].fillna(m["kickoff"]) if "kickoff" in m.columns else m["timestamp"]
+    m = m.assign(at=at)
+    m = m[m["cutoff"].isna() | (m["at"] <= m["cutoff"])]
+    last = m.sort_values(["game_id", "book", "at", "fetched_at"]).drop_duplicates(["game_id", "book"], keep="last")
+    return last.groupby("game_id", as_index=False)[["spread", "total"]].median()
+
+def consensus_lines(cutoff="close", seasons=None) -> pd.DataFrame:
+    """
+    Consensus lines at a cutoff: "open" (first snapshot per book), "close"
+    (last at/before kickoff) or a pd.Timedelta / string like "24h" before kickoff.
+    """
+    if cutoff == "open":
+        log = read_log(seasons)
+        first = log.sort_values(LOG_KEYS + ["fetched_at"]).drop_duplicates(["game_id", "book"], keep="first")
+        return first.groupby("game_id", as_index=False)[["spread", "total"]].median()
+    offset = pd.Timedelta(0) if cutoff == "close" else pd.Timedelta(cutoff)
+    kick = _kickoffs(seasons)
+    cut = kick.assign(cutoff=kick["kickoff"] - offset)
+    log = read_log(seasons, until=cut["cutoff"].max() if len(cut) and cut["cutoff"].notna().all() else None)
+    games = pd.DataFrame({"game_id": log["game_id"].unique()}).merge(cut, on="game_id", how="left")
+    return lines_asof(log, games)
+
+def _migrate_legacy() -> None:
+    # import monolithic betting_<start>_<end>.parquet files into the log, each (name, size, mtime) once
+    done = json.loads(MIGRATED.read_text()) if MIGRATED.exists() else []
+    todo = [p for p in sorted(RAW_DIR.glob("betting_*.parquet"))
+            if [p.name, p.stat().st_size, p.stat().st_mtime] not in done]
+    for p in todo:
+        df = pd.read_parquet(p)
+        if "game_id" in df.columns:
+            append_snapshots(df, fetched_at=pd.Timestamp(p.stat().st_mtime, unit="s"))
+        done.append([p.name, p.stat().st_size, p.stat().st_mtime])
+    if todo:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        MIGRATED.write_text(json.dumps(done))
+
 def fetch_betting_lines(years) -> str|None:
     try:
-        import nfl_data_py as nfl
+        nfl = nfl_client()  # cached, per-season calls
     except Exception as e:
         print("nfl_data_py not available:", e)
         return None
@@ -17,38 +185,32 @@ def fetch_betting_lines(years) -> str|None:
     except Exception as e:
         print("import_betting_lines failed:", e)
         return None
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    p = RAW_DIR / f"betting_{min(years)}_{max(years)}.parquet"
-    df.to_parquet(p, index=False)
-    return str(p)
+    if df is None or len(df) == 0 or "game_id" not in df.columns:
+        print("import_betting_lines returned no usable rows.")
+        return None
+    n = append_snapshots(df)
+    print(f"[betting] appended {n} new line snapshots")
+    return str(LOG_DIR)
 
-def build_betting_game_features() -> str|None:
-    # Reduce betting to pregame closing spread/total per game_id
-    files = [p for p in RAW_DIR.glob("betting_*.parquet")]
-    if not files:
+def build_betting_game_features(cutoff="close", seasons=None) -> str|None:
+    """
+    Per-game consensus spread/total at `cutoff` (see consensus_lines).
+    "close" keeps the historical closing_spread/closing_total columns in
+    betting_features.parquet; other cutoffs write betting_features_<cutoff>.parquet.
+    """
+    _migrate_legacy()
+    if not LOG_DIR.exists():
         return None
-    df = pd.concat([pd.read_parquet(p) for p in files], ignore_index=True)
-    # Try to standardize column names (book, spread_close, total_close, team)
-    cols = {c.lower():c for c in df.columns}
-    # Heuristics
-    if "spread_close" in cols or "closing_spread" in cols or "spread" in cols:
-        pass
-    # Keep one line per game: home closing spread and total
-    # Attempt to identify home team columns
-    candidates = [c for c in df.columns if "home" in c.lower() and "team" in c.lower()]
-    if candidates:
-        home_col = candidates[0]
+    out = consensus_lines(cutoff, seasons)
+    if cutoff == "close":
+        out = out.rename(columns={"spread":"closing_spread","total":"closing_total"})
+        name = "betting_features.parquet"
     else:
-        home_col = "home_team" if "home_team" in df.columns else None
-
-    # If multiple books, choose consensus if available else median
-    group = df.groupby("game_id", dropna=False).agg({
-        "spread_close":"median" if "spread_close" in df.columns else "min",
-        "total_close":"median" if "total_close" in df.columns else "min"
-    })
-    out = group.reset_index().rename(columns={"spread_close":"closing_spread","total_close":"closing_total"})
+        label = str(cutoff).replace(" ", "")
+        out = out.rename(columns={"spread":f"spread_{label}","total":f"total_{label}"})
+        name = f"betting_features_{label}.parquet"
 
     PROC_DIR.mkdir(parents=True, exist_ok=True)
-    p = PROC_DIR / "betting_features.parquet"
+    p = PROC_DIR / name
     out.to_parquet(p, index=False)
     return str(p)
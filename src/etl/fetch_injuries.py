@@ -2,6 +2,9 @@ from __future__ import annotations
 import os
 from pathlib import Path
 import pandas as pd
+from src.etl.cache import nfl_client
+from src.etl.catalog import table_dir, write_partitions
+from src.utils.schema import enforce
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 
@@ -14,7 +17,7 @@ STATUS_NORMALIZE = {
 def fetch_injuries(years) -> str|None:
     """Try multiple nfl_data_py entry points for injuries and return parquet path or None."""
     try:
-        import nfl_data_py as nfl
+        nfl = nfl_client()  # cached, per-season calls
     except Exception as e:
         print("nfl_data_py import failed:", e)
         return None
@@ -43,6 +46,9 @@ def fetch_injuries(years) -> str|None:
         df["status_norm"] = "Active"
 
     RAW_DIR.mkdir(parents=True, exist_ok=True)
-    p = RAW_DIR / f"injuries_{min(years)}_{max(years)}.parquet"
-    df.to_parquet(p, index=False)
-    return str(p)
+    if "season" not in df.columns:
+        p = RAW_DIR / f"injuries_{min(years)}_{max(years)}.parquet"
+        df.to_parquet(p, index=False)
+        return str(p)
+    write_partitions(enforce(df), "injuries")
+    return str(table_dir("injuries"))
@@ -1,42 +1,149 @@
 from __future__ import annotations
 import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import pandas as pd
+from src.etl.cache import nfl_client
+from src.etl.catalog import PBP_SLIM_COLUMNS, slim_pbp, table_dir, write_partition
+from src.utils.schema import enforce
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 
-def _safe_import(callable_fn, years, name: str) -> pd.DataFrame:
+# Concurrency / retry knobs (env overridable; run() also takes workers=)
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "8"))
+ETL_RETRIES = int(os.getenv("ETL_RETRIES", "4"))
+ETL_BACKOFF = float(os.getenv("ETL_BACKOFF", "1.0"))  # seconds, doubled per attempt
+# Set PBP_KEEP_FULL=0 to download/store only the slim pbp projection
+PBP_KEEP_FULL = os.getenv("PBP_KEEP_FULL", "1") != "0"
+
+# Per-season tables: output name -> nfl_data_py function name
+SEASON_TABLES = {
+    "pbp": "import_pbp_data",
+    "weekly": "import_weekly_data",
+    "rosters": "import_rosters",
+    "schedules": "import_schedules",
+}
+
+_TRANSIENT_MARKERS = ("timed out", "timeout", "temporarily", "temporary failure", "connection",
+                      "reset by peer", "remote end closed", "incomplete read", "too many requests")
+_TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+_STATUS_RE = re.compile(r"(?<![\w.])([1-5]\d\d)(?![\w.])")   # a standalone 3-digit code, not part of 1500 or 5.02
+
+def _status(e: Exception) -> set[int]:
+    # HTTP status from the exception (urllib .code, aiohttp .status, requests .response), else from its message
+    for code in (getattr(e, "code", None), getattr(e, "status", None),
+                 getattr(getattr(e, "response", None), "status_code", None)):
+        if isinstance(code, int):
+            return {code}
+    return {int(m) for m in _STATUS_RE.findall(str(e) or "")}
+
+def _is_not_found(e: Exception) -> bool:
+    return 404 in _status(e) or "not found" in (str(e) or "").lower()
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    msg = (str(e) or "").lower()
+    return bool(_status(e) & _TRANSIENT_STATUS) or any(m in msg for m in _TRANSIENT_MARKERS)
+
+def _fetch_unit(callable_fn, year, name: str, retries: int = ETL_RETRIES,
+                backoff: float = ETL_BACKOFF) -> tuple[pd.DataFrame | None, dict]:
     """
-    Run an nfl_data_py import function one season at a time.
-    Swallow 404/Not Found for any season and keep going.
-    Never raise — always return a DataFrame (possibly empty).
+    Fetch one (table, season) unit. `year=None` calls the function with no args.
+    404s are skipped immediately; transient errors are retried with exponential
+    backoff (+ jitter); anything else is logged and skipped.
+    Never raises — returns (DataFrame or None, timing/status record).
     """
-    import nfl_data_py as nfl  # noqa: F401  (ensures package is present)
-    parts = []
-    for y in years:
+    rec = {"table": name, "season": year, "status": "ok", "attempts": 0, "seconds": 0.0, "rows": 0}
+    label = year if year is not None else "all"
+    t0 = time.perf_counter()
+    df = None
+    for attempt in range(1, retries + 2):
+        rec["attempts"] = attempt
         try:
-            df = callable_fn([y])
-            if df is None or len(df) == 0:
-                print(f"[{name}] {y} empty; skipping.")
-                continue
-            # tiny memory saver: downcast floats if present
-            for c in df.select_dtypes(include="float").columns:
-                df[c] = pd.to_numeric(df[c], downcast="float")
-            print(f"[{name}] {y} done.")
-            parts.append(df)
+            df = callable_fn([year]) if year is not None else callable_fn()
+            break
         except Exception as e:
-            msg = (str(e) or "").lower()
-            if "404" in msg or "not found" in msg:
-                print(f"[{name}] {y} not available; skipping.")
+            if _is_not_found(e):
+                print(f"[{name}] {label} not available; skipping.")
+                rec["status"] = "missing"
+            elif _is_transient(e) and attempt <= retries:
+                delay = backoff * 2 ** (attempt - 1) + random.uniform(0, backoff)
+                print(f"[{name}] {label} transient error ({e!r}); retry {attempt}/{retries} in {delay:.1f}s")
+                time.sleep(delay)
                 continue
-            # non-404 error: log and keep going instead of aborting
-            print(f"[{name}] {y} failed with: {e!r} — skipping.")
-            continue
-    if not parts:
+            else:
+                # non-404 error (or retries exhausted): log and keep going instead of aborting
+                print(f"[{name}] {label} failed with: {e!r} — skipping.")
+                rec["status"] = "failed"
+            df = None
+            break
+    rec["seconds"] = time.perf_counter() - t0
+
+    if rec["status"] != "ok":
+        return None, rec
+    if df is None or len(df) == 0:
+        print(f"[{name}] {label} empty; skipping.")
+        rec["status"] = "empty"
+        return None, rec
+    # tiny memory saver: downcast floats if present
+    for c in df.select_dtypes(include="float").columns:
+        df[c] = pd.to_numeric(df[c], downcast="float")
+    rec["rows"] = len(df)
+    print(f"[{name}] {label} done ({rec['seconds']:.1f}s).")
+    return df, rec
+
+def _fetch_all(units, workers: int = ETL_WORKERS, sink=None) -> tuple[dict[str, list[pd.DataFrame]], list[dict]]:
+    """
+    Run (name, callable_fn, year) units on a bounded thread pool.
+    Returns ({name: [frames in season order]}, [timing records]).
+    If `sink(name, year, df)` is given it is called as each unit completes and
+    the frame is not retained (so only in-flight seasons are held in memory).
+    """
+    parts: dict[str, dict] = {}
+    timings: list[dict] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(_fetch_unit, fn, y, name): (name, y) for name, fn, y in units}
+        for fut in as_completed(futs):
+            name, y = futs[fut]
+            df, rec = fut.result()
+            timings.append(rec)
+            if df is None:
+                continue
+            if sink is not None:
+                try:
+                    sink(name, y, df)
+                    continue
+                except Exception as e:
+                    print(f"[{name}] {y} save failed:", e)
+                    rec["status"] = "save_failed"
+                    continue
+            parts.setdefault(name, {})[y] = df
+    ordered = {name: [d[y] for y in sorted(d, key=lambda v: (v is None, v))] for name, d in parts.items()}
+    return ordered, timings
+
+def _safe_import(callable_fn, years, name: str, workers: int = ETL_WORKERS) -> pd.DataFrame:
+    """
+    Run an nfl_data_py import function one season per unit (concurrently).
+    Swallow 404/Not Found for any season and keep going.
+    Never raise — always return a DataFrame (possibly empty).
+    """
+    parts, _ = _fetch_all([(name, callable_fn, y) for y in years], workers=workers)
+    if not parts.get(name):
         return pd.DataFrame()
-    out = pd.concat(parts, ignore_index=True)
-    return out
+    return pd.concat(parts[name], ignore_index=True)
+
+def _print_timings(timings: list[dict], wall: float) -> None:
+    print(f"[ETL] {len(timings)} units in {wall:.1f}s wall "
+          f"({sum(r['seconds'] for r in timings):.1f}s summed unit time)")
+    print(f"  {'table':<10}{'season':>7}{'status':>9}{'tries':>6}{'secs':>8}{'rows':>10}")
+    for r in sorted(timings, key=lambda r: (r["table"], r["season"] is None, r["season"] or 0)):
+        season = r["season"] if r["season"] is not None else "-"
+        print(f"  {r['table']:<10}{season:>7}{r['status']:>9}{r['attempts']:>6}{r['seconds']:>8.1f}{r['rows']:>10}")
 
 def _resolve_years(user_years) -> list[int]:
     # If user supplied a range/list, clamp to <= current year
@@ -48,62 +155,54 @@ def _resolve_years(user_years) -> list[int]:
     smax = min(smax, pd.Timestamp.today().year)
     return list(range(smin, smax + 1))
 
-def run(seasons) -> dict:
+def run(seasons, workers: int | None = None) -> dict:
     """
-    Downloads core nflverse tables into data/raw/*.parquet.
-    Returns dict of file paths. Never raises — downstream can proceed.
+    Downloads core nflverse tables into season partitions
+    (data/raw/<table>/season=YYYY/part-0.parquet, see src.etl.catalog).
+    Every (table, season) unit is fetched concurrently on a pool of `workers`
+    threads (default ETL_WORKERS) and written as soon as it lands, so a refresh
+    only rewrites the seasons requested. Downloads go through the local cache
+    (src.etl.cache), so closed seasons are fetched once. Returns dict of
+    table -> directory. Never raises — downstream can proceed.
     """
-    import nfl_data_py as nfl
+    nfl = nfl_client()
 
     years = _resolve_years(seasons)
-    print(f"[ETL] Seasons resolved to: {years}")
+    workers = workers or ETL_WORKERS
+    print(f"[ETL] Seasons resolved to: {years} ({workers} workers)")
     out: dict[str, str] = {}
 
-    try:
-        pbp = _safe_import(nfl.import_pbp_data, years, "pbp")
-        if not pbp.empty:
-            p = RAW_DIR / f"pbp_{years[0]}_{years[-1]}.parquet"
-            pbp.to_parquet(p, index=False)
-            out["pbp"] = str(p)
-    except Exception as e:
-        print("[pbp] save failed:", e)
-
-    try:
-        wk = _safe_import(nfl.import_weekly_data, years, "weekly")
-        if not wk.empty:
-            p = RAW_DIR / f"weekly_{years[0]}_{years[-1]}.parquet"
-            wk.to_parquet(p, index=False)
-            out["weekly"] = str(p)
-    except Exception as e:
-        print("[weekly] save failed:", e)
-
-    try:
-        rosters = _safe_import(nfl.import_rosters, years, "rosters")
-        if not rosters.empty:
-            p = RAW_DIR / f"rosters_{years[0]}_{years[-1]}.parquet"
-            rosters.to_parquet(p, index=False)
-            out["rosters"] = str(p)
-    except Exception as e:
-        print("[rosters] save failed:", e)
-
-    try:
-        schedules = _safe_import(nfl.import_schedules, years, "schedules")
-        if not schedules.empty:
-            p = RAW_DIR / f"schedules_{years[0]}_{years[-1]}.parquet"
-            schedules.to_parquet(p, index=False)
-            out["schedules"] = str(p)
-    except Exception as e:
-        print("[schedules] save failed:", e)
-
-    # ID map is optional
-    try:
-        ids = nfl.import_ids()
-        if ids is not None and len(ids) > 0:
+    # (offline, a function with no cached/fixture data is simply absent)
+    fns = {name: getattr(nfl, fn, None) for name, fn in SEASON_TABLES.items()}
+    if not PBP_KEEP_FULL and fns["pbp"] is not None:
+        fns["pbp"] = lambda ys: nfl.import_pbp_data(ys, columns=list(PBP_SLIM_COLUMNS))
+    units = [(name, fn, y) for name, fn in fns.items() if fn is not None for y in years]
+    # ID map is optional (not per-season)
+    if getattr(nfl, "import_ids", None) is not None:
+        units.append(("ids", nfl.import_ids, None))
+
+    def _save(name, year, df):
+        if name == "ids":
             p = RAW_DIR / "ids_latest.parquet"
-            ids.to_parquet(p, index=False)
+            df.to_parquet(p, index=False)
             out["ids"] = str(p)
-    except Exception as e:
-        print("[ids] import failed (non-fatal):", e)
+            return
+        # team aliases are normalized once, here, and stored as int8 codes
+        df = enforce(df)
+        if name == "pbp":
+            # slim projection is what feature builders read; full width is optional
+            write_partition(slim_pbp(df), "pbp_slim", year)
+            out["pbp_slim"] = str(table_dir("pbp_slim"))
+            if PBP_KEEP_FULL:
+                write_partition(df, "pbp", year)
+                out["pbp"] = str(table_dir("pbp"))
+        else:
+            write_partition(df, name, year)
+            out[name] = str(table_dir(name))
+
+    t0 = time.perf_counter()
+    _, timings = _fetch_all(units, workers=workers, sink=_save)
+    _print_timings(timings, time.perf_counter() - t0)
 
     print("[ETL] wrote:", out)
     return out
@@ -1,13 +1,21 @@
 from __future__ import annotations
+import hashlib
 import os
+from dataclasses import dataclass
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from src.etl.catalog import read_table
+from src.features.rolling import segments
+from src.utils.schema import TEAMS, TEAM_DTYPE, enforce, team_codes
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 STATIC_DIR = Path("data/static")
 
+SHORT_WEEK_DAYS = 5   # rest of 5 days or fewer (Thursday/Saturday after Sunday)
+DOME_PATTERN = "dome|retractable|semi|canopy"
+
 def haversine(lat1, lon1, lat2, lon2):
     R = 6371.0
     p1 = np.radians(lat1); p2 = np.radians(lat2)
@@ -16,67 +24,119 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2*np.arctan2(np.sqrt(a), np.sqrt(1-a))
     return R*c
 
-def build_context_features() -> str:
-    sched_files = [p for p in RAW_DIR.glob("schedules_*.parquet")]
-    pbp_files = [p for p in RAW_DIR.glob("pbp_*.parquet")]
-    assert sched_files, "Schedules parquet missing"
-    schedules = (pd.read_parquet(sched_files[0]) if len(sched_files)==1 
-                 else pd.concat([pd.read_parquet(p) for p in sched_files], ignore_index=True))
-
-    # Stadium lookup
-    stad = pd.read_csv(STATIC_DIR / "stadiums.csv")
-    stad = stad[["team","lat","lon","roof"]]
-
-    # Rest days per team: derive from schedules
-    # Build long form: one row per team per game with date
-    gcols = ["game_id","season","week","gameday","home_team","away_team"]
-    games = schedules[gcols].copy()
-    # Convert dates
+# 32x32 stadium matrices indexed by team code (TEAMS order), cached in
+# PROC_DIR and rebuilt only when stadiums.csv changes (keyed on its sha256).
+@dataclass
+class StadiumMatrix:
+    key: str
+    km: np.ndarray    # km[i, j]: great-circle km from team i's stadium to team j's
+    tz: np.ndarray    # tz[i, j]: hours team j's stadium is ahead of team i's (standard time)
+    dome: np.ndarray  # dome-like roof at team j's stadium
+
+def stadium_matrix(path: Path | None = None) -> StadiumMatrix:
+    path = Path(path or STATIC_DIR / "stadiums.csv")
+    key = hashlib.sha256(path.read_bytes()).hexdigest()
+    cache = PROC_DIR / "stadium_matrix.npz"
+    if cache.exists():
+        with np.load(cache) as z:
+            if str(z["key"]) == key:
+                return StadiumMatrix(key=key, km=z["km"], tz=z["tz"], dome=z["dome"])
+
+    stad = pd.read_csv(path)
+    stad = stad.assign(code=team_codes(stad["team"])).query("code >= 0").drop_duplicates("code", keep="last")
+    n = len(TEAMS)
+    lat, lon, off = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    roof = np.full(n, "", dtype=object)
+    c = stad["code"].to_numpy()
+    lat[c], lon[c] = stad["lat"].to_numpy(float), stad["lon"].to_numpy(float)
+    if "utc_offset" in stad.columns:
+        off[c] = stad["utc_offset"].to_numpy(float)
+    roof[c] = stad["roof"].fillna("").astype(str).to_numpy()
+    km = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    m = StadiumMatrix(key=key, km=km, tz=off[None, :] - off[:, None],
+                      dome=pd.Series(roof).str.contains(DOME_PATTERN, case=False).to_numpy())
+    PROC_DIR.mkdir(parents=True, exist_ok=True)
+    np.savez(cache, key=np.array(key), km=m.km, tz=m.tz, dome=m.dome)
+    return m
+
+def _lookup(mat: np.ndarray, i: np.ndarray, j: np.ndarray, missing=np.nan) -> np.ndarray:
+    # code -1 (unknown team) must not wrap around to the last row
+    ok = (i >= 0) & (j >= 0)
+    return np.where(ok, mat[np.maximum(i, 0), np.maximum(j, 0)], missing)
+
+def _run_length(flag: np.ndarray, seg) -> np.ndarray:
+    """Length of the current run of True ending at each row (0 where False), restarting per group."""
+    idx = np.arange(len(flag))
+    # last "reset" at or before each row: a False row, or just before the group start
+    reset = np.where(flag, -1, idx)
+    reset[seg.starts] = np.where(flag[seg.starts], seg.starts - 1, seg.starts)
+    last = np.maximum.accumulate(reset) if len(flag) else reset
+    return np.where(flag, idx - last, 0)
+
+def _cumsum(x: np.ndarray, seg) -> np.ndarray:
+    cs = np.cumsum(x)
+    return cs - (cs - x)[seg.starts][seg.ids]
+
+def build_context_features(seasons=None) -> str:
+    """
+    Per team-game schedule context: rest, short weeks, road trips, travel and
+    time zones, all from one sort of the team timeline and stadium lookups.
+    """
+    schedules = read_table("schedules", seasons=seasons,
+                           columns=["game_id","season","week","gameday","home_team","away_team"])
+    assert len(schedules), "Schedules parquet missing"
+    stad = stadium_matrix()
+
+    # Long form: one row per team per game
+    games = schedules
     if "gameday" in games:
-        games["gameday"] = pd.to_datetime(games["gameday"], errors="coerce")
+        day = pd.to_datetime(games["gameday"], errors="coerce")
     else:
         # fallback
-        games["gameday"] = pd.to_datetime(games["game_id"].str[0:8], errors="coerce")
-
-    home = games.rename(columns={"home_team":"team"})[["game_id","season","week","gameday","team"]].copy()
-    away = games.rename(columns={"away_team":"team"})[["game_id","season","week","gameday","team"]].copy()
-    long = pd.concat([home, away], ignore_index=True)
-
-    long = long.sort_values(["team","gameday"])
-    long["prev_game_date"] = long.groupby("team")["gameday"].shift(1)
-    long["rest_days"] = (long["gameday"] - long["prev_game_date"]).dt.days
-    long["rest_days"] = long["rest_days"].fillna(10)  # assume ~10 for Week 1
-
-    # Travel distance: use stadium coords (home stadium as origin, opponent stadium as destination when away)
-    # Merge coords for each team
-    long = long.merge(stad, on="team", how="left")
-    long = long.rename(columns={"lat":"team_lat","lon":"team_lon","roof":"team_roof"})
-
-    # Map opponent for each row
-    opp = games.copy()
-    opp["home_opp"] = opp["away_team"]
-    opp["away_opp"] = opp["home_team"]
-    # Merge opponent depending on whether team is home or away
-    long = long.merge(games[["game_id","home_team","away_team"]], on="game_id", how="left")
-    long["is_home"] = (long["team"] == long["home_team"]).astype(int)
-    long["opponent"] = np.where(long["is_home"]==1, long["away_team"], long["home_team"])
-
-    # Opponent stadium coords
-    opp_coords = stad.rename(columns={"team":"opponent","lat":"opp_lat","lon":"opp_lon","roof":"opp_roof"})
-    long = long.merge(opp_coords, on="opponent", how="left")
-
-    # Distance: if home game, distance=0; else stadium-to-stadium great-circle
-    long["travel_km"] = np.where(long["is_home"]==1, 0.0,
-                                 haversine(long["team_lat"], long["team_lon"], long["opp_lat"], long["opp_lon"]))
-
-    # Dome/indoor indicator (game-level): prefer home/venue; fall back to opponent if missing
-    long["roof_game"] = np.where(long["is_home"]==1, long["team_roof"], long["opp_roof"])
-    long["is_dome_like"] = long["roof_game"].fillna("").str.contains("dome|retractable|semi|canopy", case=False).astype(int)
-
-    # Save team-game context
-    out = long[["game_id","season","week","team","is_home","rest_days","travel_km","is_dome_like"]].copy()
+        day = pd.to_datetime(games["game_id"].str[0:8], errors="coerce")
+    n = len(games)
+    home, away = team_codes(games["home_team"]), team_codes(games["away_team"])
+    team = np.concatenate([home, away]).astype(np.int64)
+    opp = np.concatenate([away, home]).astype(np.int64)
+    is_home = np.repeat([1, 0], n)
+    gameday = np.tile(day.to_numpy(dtype="datetime64[ns]"), 2)
+
+    # the one sort: team timeline (unknown teams, code -1, sort first as their own group)
+    order = np.lexsort((gameday, team))
+    long = pd.DataFrame({
+        "game_id": np.tile(games["game_id"].to_numpy(), 2)[order],
+        "season": np.tile(games["season"].to_numpy(), 2)[order],
+        "week": np.tile(games["week"].to_numpy(), 2)[order],
+        "team": pd.Categorical.from_codes(team[order], dtype=TEAM_DTYPE),
+        "is_home": is_home[order],
+    })
+    team, opp, gameday = team[order], opp[order], gameday[order]
+    by_team = segments(long, ["team"])
+    by_season = segments(long, ["team","season"])
+    venue = np.where(long["is_home"].to_numpy() == 1, team, opp)
+
+    # Rest days since the team's previous game (assume ~10 for its first)
+    prev = np.where(by_team.pos > 0, np.roll(gameday, 1), np.datetime64("NaT"))
+    rest = (gameday - prev).astype("timedelta64[D]").astype(float)
+    rest[np.isnat(prev) | np.isnat(gameday)] = np.nan
+    long["rest_days"] = np.where(np.isnan(rest), 10.0, rest)
+    long["short_week"] = (long["rest_days"] <= SHORT_WEEK_DAYS).astype(int)
+
+    # Travel: home stadium to the venue (0 at home); season totals include this trip
+    away_game = long["is_home"].to_numpy() == 0
+    long["travel_km"] = np.where(away_game, _lookup(stad.km, team, venue), 0.0)
+    long["tz_shift"] = np.where(away_game, _lookup(stad.tz, team, venue), 0.0)
+    long["consecutive_road"] = _run_length(away_game, by_season)
+    long["season_travel_km"] = _cumsum(np.nan_to_num(long["travel_km"].to_numpy()), by_season)
+    long["season_tz_crossed"] = _cumsum(np.abs(np.nan_to_num(long["tz_shift"].to_numpy())), by_season)
+
+    # Dome/indoor indicator (game-level): the venue's roof
+    long["is_dome_like"] = np.where(venue >= 0, stad.dome[np.maximum(venue, 0)], False).astype(int)
+
+    out = long[["game_id","season","week","team","is_home","rest_days","travel_km","is_dome_like",
+                "short_week","consecutive_road","season_travel_km","tz_shift","season_tz_crossed"]]
 
     PROC_DIR.mkdir(parents=True, exist_ok=True)
     path = PROC_DIR / "context_features.parquet"
-    out.to_parquet(path, index=False)
+    enforce(out).to_parquet(path, index=False)
     return str(path)
@@ -1,7 +1,11 @@
 from __future__ import annotations
 import os
 from pathlib import Path
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
+from src.etl.catalog import available_seasons, read_table
+from src.utils.schema import enforce
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
@@ -19,18 +23,78 @@ INJURY_MULTIPLIERS = {
     "Rest": 0.85,
 }
 
+# Compact as-of index: status codes index STATUS_NAMES; OTHER_CODE is any
+# unrecognized status (multiplier 0.9), NO_REPORT (-1) means no status on file.
+STATUS_NAMES = list(INJURY_MULTIPLIERS)
+OTHER_CODE = len(STATUS_NAMES)
+NO_REPORT = -1
+CODE_MULTIPLIERS = np.array(list(INJURY_MULTIPLIERS.values()) + [0.9, 1.0], dtype=np.float32)  # [-1] -> no report
+MAX_WEEK = 22
+INDEX_NAME = "injury_index.npz"
+
+@dataclass
+class InjuryIndex:
+    players: np.ndarray   # sorted player ids (str)
+    seasons: np.ndarray   # contiguous season range
+    status: np.ndarray    # int8 [player, season, week 0..MAX_WEEK], forward-filled within season
+
+    def status_asof(self, player_ids, season, week) -> pd.DataFrame:
+        """
+        Vectorized as-of lookup: latest reported status at or before `week` of
+        `season` for each player. season/week may be scalars or arrays
+        broadcastable to player_ids. Returns status and inj_multiplier columns.
+        """
+        ids = np.asarray(player_ids, dtype=str)
+        season, week = np.broadcast_arrays(np.asarray(season), np.asarray(week))
+        season = np.broadcast_to(season, ids.shape)
+        week = np.broadcast_to(week, ids.shape)
+        pos = np.searchsorted(self.players, ids).clip(0, max(len(self.players) - 1, 0))
+        s_idx = season.astype(int) - int(self.seasons[0]) if len(self.seasons) else np.zeros(ids.shape, int)
+        hit = (len(self.players) > 0) & (self.players[pos] == ids) & (s_idx >= 0) & (s_idx < len(self.seasons))
+        codes = np.full(ids.shape, NO_REPORT, dtype=np.int8)
+        w = np.clip(week.astype(int), 0, MAX_WEEK)
+        codes[hit] = self.status[pos[hit], s_idx[hit], w[hit]]
+        names = np.array(STATUS_NAMES + ["Other", None], dtype=object)
+        return pd.DataFrame({"status": names[codes], "inj_multiplier": CODE_MULTIPLIERS[codes]})
+
+def build_injury_index(adj: pd.DataFrame) -> InjuryIndex:
+    """Dense player x season x week status array, forward-filled across weeks within a season."""
+    adj = adj.dropna(subset=["player_id","season","week"])
+    ids = adj["player_id"].astype(str).to_numpy(dtype=str)
+    players = np.unique(ids)
+    seasons = np.arange(int(adj["season"].min()), int(adj["season"].max()) + 1) if len(adj) else np.array([], int)
+    status = np.full((len(players), len(seasons), MAX_WEEK + 1), NO_REPORT, dtype=np.int8)
+    if len(adj):
+        lookup = {n: i for i, n in enumerate(STATUS_NAMES)}
+        code = adj["status"].map(lookup).fillna(OTHER_CODE).to_numpy(np.int8)
+        p = np.searchsorted(players, ids)
+        si = adj["season"].to_numpy(int) - seasons[0]
+        wi = np.clip(adj["week"].to_numpy(int), 0, MAX_WEEK)
+        status[p, si, wi] = code  # later rows win for duplicate reports
+        # forward fill: index of the last reported week at or before each week
+        weeks = np.arange(MAX_WEEK + 1)
+        last = np.maximum.accumulate(np.where(status != NO_REPORT, weeks, 0), axis=2)
+        status = np.take_along_axis(status, last, axis=2)
+    return InjuryIndex(players=players, seasons=seasons, status=status)
+
+def load_injury_index(path: Path | None = None) -> InjuryIndex | None:
+    path = path or PROC_DIR / INDEX_NAME
+    if not path.exists():
+        return None
+    with np.load(path) as z:
+        return InjuryIndex(players=z["players"], seasons=z["seasons"], status=z["status"])
+
 def build_injury_adjustments() -> str|None:
-    files = [p for p in RAW_DIR.glob("injuries_*.parquet")]
-    if not files:
+    if not available_seasons("injuries"):
         print("No injuries parquet found; skipping injury adjustments.")
         return None
-    inj = pd.concat([pd.read_parquet(p) for p in files], ignore_index=True)
+    inj = read_table("injuries")
 
     # Harmonize key columns
     cols = inj.columns.str.lower()
     inj.columns = cols
     # Try to find consistent keys
-    candidates_id = [c for c in inj.columns if "player_id" in c]
+    candidates_id = [c for c in inj.columns if "player_id" in c] or [c for c in ("gsis_id",) if c in inj.columns]
     pid = candidates_id[0] if candidates_id else None
     team_col = "team" if "team" in inj.columns else ("posteam" if "posteam" in inj.columns else None)
     season_col = "season" if "season" in inj.columns else None
@@ -48,5 +112,9 @@ def build_injury_adjustments() -> str|None:
 
     PROC_DIR.mkdir(parents=True, exist_ok=True)
     p = PROC_DIR / "injury_adjustments.parquet"
-    adj.to_parquet(p, index=False)
+    enforce(adj).to_parquet(p, index=False)
+
+    # as-of index for week-specific lookups (see InjuryIndex.status_asof)
+    idx = build_injury_index(adj.sort_values(["season","week"], kind="mergesort"))
+    np.savez(PROC_DIR / INDEX_NAME, players=idx.players, seasons=idx.seasons, status=idx.status)
     return str(p)
@@ -3,6 +3,9 @@ import os
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from src.etl.catalog import read_table
+from src.features.rolling import expanding_mean, fill_na, rolling_mean, segments, shift
+from src.utils.schema import enforce
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
@@ -21,12 +24,15 @@ def _safe_div(a: pd.Series, b: pd.Series) -> pd.Series:
     out = out / b.replace({0: np.nan})
     return out.fillna(0.0)
 
-def build_player_usage() -> str:
-    # ---- load weekly parquet (created by fetch_nflverse) ----
-    weekly_parqs = sorted(RAW_DIR.glob("weekly_*.parquet"))
-    if not weekly_parqs:
-        raise FileNotFoundError("weekly parquet not found in data/raw; run ETL first.")
-    wk = pd.read_parquet(weekly_parqs[-1])  # most recent combined file
+# Candidate weekly columns across nfl_data_py versions (absent ones are skipped on read)
+WEEKLY_COLUMNS = ["player_id","gsis_id","pfr_id","player_name","player","name",
+                  "recent_team","team","posteam","season","week","game_week",
+                  "targets","target","rushing_attempts","rush_att","carries","rushing_att",
+                  "receiving_yards","rec_yards","yards_receiving","rushing_yards","rush_yards","yards_rushing"]
+
+def build_player_usage(seasons=None) -> str:
+    # ---- load weekly partitions (created by fetch_nflverse) ----
+    wk = read_table("weekly", seasons=seasons, columns=WEEKLY_COLUMNS)
 
     # ---- normalize column names & pick keys ----
     # handle different nfl_data_py versions
@@ -69,7 +75,7 @@ def build_player_usage() -> str:
 
     # ---- compute team totals per game ----
     team_tot = (
-        wk_std.groupby(["season","week","team"], as_index=False)
+        wk_std.groupby(["season","week","team"], as_index=False, observed=True)
               .agg(team_targets=("targets","sum"),
                    team_carries=("rush_att","sum"))
     )
@@ -83,25 +89,22 @@ def build_player_usage() -> str:
     usage["carry_share"]  = _safe_div(usage["rush_att"], usage["team_carries"])
 
     # ---- simple projection: last-3 avg per player-season ----
-    usage = usage.sort_values(["player_id","season","week"])
-    def _proj(g: pd.DataFrame) -> pd.Series:
-        # mean of last 3 games as "next" projection; shift so it predicts next week
-        ts = g["target_share"].rolling(3, min_periods=1).mean().shift(1).fillna(g["target_share"].expanding().mean())
-        cs = g["carry_share"].rolling(3, min_periods=1).mean().shift(1).fillna(g["carry_share"].expanding().mean())
-        return pd.DataFrame({"proj_target_share_next": ts, "proj_carry_share_next": cs})
-
-    proj = usage.groupby(["player_id","season"], group_keys=False).apply(_proj)
-    usage = pd.concat([usage.reset_index(drop=True), proj.reset_index(drop=True)], axis=1)
+    usage = usage.sort_values(["player_id","season","week"]).reset_index(drop=True)
+    seg = segments(usage, ["player_id","season"])
+    # mean of last 3 games as "next" projection; shift so it predicts next week
+    for col, out in [("target_share","proj_target_share_next"), ("carry_share","proj_carry_share_next")]:
+        x = usage[col].to_numpy(float)
+        usage[out] = fill_na(shift(rolling_mean(x, seg, 3), seg), expanding_mean(x, seg))
 
     # latest row per (player, season) as our current projection snapshot
-    latest = usage.sort_values(["player_id","season","week"]).groupby(["player_id","season"]).tail(1)
+    latest = usage.sort_values(["player_id","season","week"]).groupby(["player_id","season"], observed=True).tail(1)
 
     PROC_DIR.mkdir(parents=True, exist_ok=True)
     ART_DIR.mkdir(parents=True, exist_ok=True)
 
     # keep a processed parquet (all games)
     out_parq = PROC_DIR / "player_usage.parquet"
-    usage.to_parquet(out_parq, index=False)
+    enforce(usage).to_parquet(out_parq, index=False)
 
     # and a compact CSV for downstream modules / app
     cols = ["player_id","player_name","team","season","proj_target_share_next","proj_carry_share_next",
@@ -0,0 +1,101 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# Segmented (group-boundary-aware) window statistics over a frame sorted by its
+# group keys. Everything is one pass of NumPy ops over the whole column; the
+# only Python loop is the EWMA recurrence, which steps over *positions within
+# a group* (at most a few hundred) rather than over groups.
+# Semantics match the pandas per-group equivalents: rolling/expanding means
+# skip NaNs and honour min_periods; ewm_mean is `ewm(alpha, adjust=False)`
+# (a NaN carries the previous value forward, and the previous value keeps
+# decaying across the gap, as pandas does with its default ignore_na=False).
+
+@dataclass
+class Segments:
+    ids: np.ndarray     # group number per row (0..n_groups-1, non-decreasing)
+    starts: np.ndarray  # first row of each group
+    pos: np.ndarray     # position of each row within its group
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.starts)
+
+def segments(df: pd.DataFrame, keys: list[str]) -> Segments:
+    """Group boundaries for `df`, which must already be sorted so each group is contiguous."""
+    n = len(df)
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+    for k in keys:
+        col = df[k]
+        v = col.cat.codes.to_numpy() if isinstance(col.dtype, pd.CategoricalDtype) else col.to_numpy()
+        change[1:] |= v[1:] != v[:-1]
+    starts = np.flatnonzero(change)
+    ids = np.cumsum(change) - 1
+    pos = np.arange(n) - starts[ids] if n else np.zeros(0, dtype=np.int64)
+    return Segments(ids=ids, starts=starts, pos=pos)
+
+def _valid(x) -> tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, dtype=float)
+    ok = ~np.isnan(x)
+    return np.where(ok, x, 0.0), ok.astype(float)
+
+def _window_sum(v: np.ndarray, seg: Segments, window: int | None) -> np.ndarray:
+    # sum over [max(group start, i-window+1), i] from one global cumsum
+    cs = np.concatenate([[0.0], np.cumsum(v)])
+    i = np.arange(len(v))
+    lo = seg.starts[seg.ids] if window is None else np.maximum(seg.starts[seg.ids], i - window + 1)
+    return cs[i + 1] - cs[lo]
+
+def rolling_mean(x, seg: Segments, window: int, min_periods: int = 1) -> np.ndarray:
+    v, ok = _valid(x)
+    s, c = _window_sum(v, seg, window), _window_sum(ok, seg, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(c >= max(min_periods, 1), s / c, np.nan)
+
+def expanding_mean(x, seg: Segments, min_periods: int = 1) -> np.ndarray:
+    v, ok = _valid(x)
+    s, c = _window_sum(v, seg, None), _window_sum(ok, seg, None)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(c >= max(min_periods, 1), s / c, np.nan)
+
+def group_mean(x, seg: Segments) -> np.ndarray:
+    """Mean of each row's whole group (NaN-skipping), broadcast back to rows."""
+    v, ok = _valid(x)
+    s = np.bincount(seg.ids, weights=v, minlength=seg.n_groups)
+    c = np.bincount(seg.ids, weights=ok, minlength=seg.n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (s / c)[seg.ids]
+
+def shift(x, seg: Segments, periods: int = 1) -> np.ndarray:
+    """Lag within group (first `periods` rows of each group become NaN)."""
+    x = np.asarray(x, dtype=float)
+    out = np.full(len(x), np.nan)
+    keep = seg.pos >= periods
+    out[keep] = x[np.flatnonzero(keep) - periods]
+    return out
+
+def ewm_mean(x, seg: Segments, alpha: float) -> np.ndarray:
+    """`ewm(alpha=alpha, adjust=False).mean()` per group (ignore_na=False: NaN gaps still decay)."""
+    x = np.asarray(x, dtype=float)
+    y = x.copy()
+    wt = np.ones(len(x))   # weight of y in the next update: (1 - alpha) per step since it was last reset
+    if not len(x):
+        return y
+    # rows bucketed by position within group; step t only depends on step t-1
+    order = np.argsort(seg.pos, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(seg.pos))])
+    # (a group starting with NaN stays NaN until its first observation)
+    for t in range(1, len(bounds) - 1):
+        rows = order[bounds[t]:bounds[t + 1]]
+        prev, cur = y[rows - 1], x[rows]
+        old = wt[rows - 1] * (1 - alpha)
+        mixed = np.where(prev == cur, prev, (old * prev + alpha * cur) / (old + alpha))
+        y[rows] = np.where(np.isnan(cur), prev, np.where(np.isnan(prev), cur, mixed))
+        wt[rows] = np.where(np.isnan(cur) & ~np.isnan(prev), old, 1.0)
+    return y
+
+def fill_na(x: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(x), fallback, x)
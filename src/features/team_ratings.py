@@ -1,7 +1,11 @@
 from __future__ import annotations
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
+from src.etl.catalog import PBP_SLIM_COLUMNS, available_seasons, iter_pbp, read_pbp
+from src.features.rolling import ewm_mean, expanding_mean, rolling_mean, segments, shift
+from src.utils.schema import TEAMS, enforce, read_parquet, team_codes
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
@@ -12,43 +16,298 @@ def _read_parquet(name: str) -> pd.DataFrame:
 def _save(df: pd.DataFrame, name: str) -> str:
     PROC_DIR.mkdir(parents=True, exist_ok=True)
     out = PROC_DIR / name
-    df.to_parquet(out, index=False)
+    enforce(df).to_parquet(out, index=False)
     return str(out)
 
-def build_team_epa_rolling(window:int=8) -> str:
-    pbp_files = [p for p in RAW_DIR.glob("pbp_*.parquet")]
-    assert pbp_files, "No PBP parquet found. Run ETL first."
-    pbp = pd.read_parquet(pbp_files[0]) if len(pbp_files)==1 else pd.concat([pd.read_parquet(p) for p in pbp_files], ignore_index=True)
+# The only pbp columns the ratings need (the rest of the ~370 are never read)
+PBP_COLUMNS = ["season","week","game_id","posteam","defteam","play_type","rush_attempt","pass_attempt","epa"]
+assert set(PBP_COLUMNS) <= set(PBP_SLIM_COLUMNS), "add the new pbp columns to catalog.PBP_SLIM_COLUMNS"
 
+# Out-of-core aggregation: stream pbp batches under a memory budget (MB)
+PBP_STREAMING = os.getenv("PBP_STREAMING", "1") != "0"
+PBP_MEMORY_MB = float(os.getenv("PBP_MEMORY_MB", "256"))
+
+GAME_KEYS = ["season","week","game_id"]
+
+# Rating cube: every variant is computed for offense, defense and net in one
+# pass and stored side by side in team_ratings.parquet as {off,def,net}_{variant}
+RATING_WINDOWS = (4, 8, 16)   # rolling N prior games (min 3 games)
+RATING_EWM_SPANS = (4, 8)     # EWMA of prior games
+RATING_VARIANTS = [f"roll{w}" for w in RATING_WINDOWS] + [f"ewm{s}" for s in RATING_EWM_SPANS] + ["std"]  # std = season to date
+# Variant the game models use; empty = the default rolling columns as built
+RATING_VARIANT = os.getenv("RATING_VARIANT", "")
+
+# Incremental refresh state (see update_team_epa_rolling)
+STATE_NAME = "team_ratings_state.npz"
+SIDES = [("off","epa_per_play"), ("def","def_epa_per_play_allowed")]
+
+def _windows(window: int) -> list[int]:
+    return sorted(set(RATING_WINDOWS) | {window})
+
+def _scrimmage(pbp: pd.DataFrame) -> pd.DataFrame:
     # Keep scrimmage plays only
-    pbp = pbp.loc[pbp["play_type"].isin(["pass","run"]) | ((pbp.get("rush_attempt",0)==1) | (pbp.get("pass_attempt",0)==1))].copy()
+    return pbp.loc[pbp["play_type"].isin(["pass","run"]) | ((pbp.get("rush_attempt",0)==1) | (pbp.get("pass_attempt",0)==1))]
 
-    # Build per-game EPA/play for offense and defense
+def _game_sums(pbp: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Per team-game play counts and EPA sums (additive, so chunks can be combined)."""
     # Offense
-    off = (pbp.groupby(["season","week","game_id","posteam"], dropna=False)
+    off = (pbp.groupby(GAME_KEYS + ["posteam"], dropna=False, observed=True)
               .agg(plays=("epa","size"), epa_sum=("epa","sum"))
-              .reset_index())
-    off = off.rename(columns={"posteam":"team"})
-    off["epa_per_play"] = off["epa_sum"] / off["plays"]
-
-    # Defense (by defteam)
-    deff = (pbp.groupby(["season","week","game_id","defteam"], dropna=False)
-              .agg(d_plays=("epa","size"), d_epa_sum=("epa","sum"))
               .reset_index()
-              .rename(columns={"defteam":"team"}))
-    deff["def_epa_per_play_allowed"] = deff["d_epa_sum"] / deff["d_plays"]
+              .rename(columns={"posteam":"team"}))
+    # Defense (by defteam)
+    deff = (pbp.groupby(GAME_KEYS + ["defteam"], dropna=False, observed=True)
+               .agg(d_plays=("epa","size"), d_epa_sum=("epa","sum"))
+               .reset_index()
+               .rename(columns={"defteam":"team"}))
+    return off, deff
+
+def _combine(parts: list[pd.DataFrame]) -> pd.DataFrame:
+    df = pd.concat(parts, ignore_index=True)
+    return df.groupby(GAME_KEYS + ["team"], dropna=False, observed=True, sort=False).sum().reset_index()
+
+def _game_epa(seasons=None, streaming: bool = PBP_STREAMING,
+              memory_mb: float = PBP_MEMORY_MB) -> tuple[pd.DataFrame, pd.DataFrame]:
+    if not streaming:
+        pbp = read_pbp(seasons=seasons, columns=PBP_COLUMNS)
+        assert len(pbp), "No PBP data found. Run ETL first."
+        return _game_sums(_scrimmage(pbp))
 
-    df = off.merge(deff[["season","week","game_id","team","def_epa_per_play_allowed"]],
-                   on=["season","week","game_id","team"], how="left")
+    # Only the small per-team-game partial sums are held; pbp chunks are dropped
+    offs, defs = [], []
+    for chunk in iter_pbp(seasons=seasons, columns=PBP_COLUMNS, memory_mb=memory_mb):
+        off, deff = _game_sums(_scrimmage(chunk))
+        offs.append(off); defs.append(deff)
+        if len(offs) >= 64:
+            offs, defs = [_combine(offs)], [_combine(defs)]
+    assert offs, "No PBP data found. Run ETL first."
+    return _combine(offs), _combine(defs)
 
-    # Sort chronologically then rolling by team
-    df = df.sort_values(["team","season","week"])
-    df["off_epa_pp_roll"] = (df.groupby("team")["epa_per_play"]
-                               .transform(lambda s: s.shift(1).rolling(window, min_periods=3).mean()))
-    df["def_epa_pp_roll"] = (df.groupby("team")["def_epa_per_play_allowed"]
-                               .transform(lambda s: s.shift(1).rolling(window, min_periods=3).mean()))
+def _team_games(off: pd.DataFrame, deff: pd.DataFrame) -> pd.DataFrame:
+    off["epa_per_play"] = off["epa_sum"] / off["plays"]
+    deff["def_epa_per_play_allowed"] = deff["d_epa_sum"] / deff["d_plays"]
+    return off.merge(deff[["season","week","game_id","team","def_epa_per_play_allowed"]],
+                     on=["season","week","game_id","team"], how="left")
 
-    # A simple net rating (lower defensive EPA allowed is better; subtract)
-    df["net_epa_rating"] = df["off_epa_pp_roll"] - df["def_epa_pp_roll"]
+def _ratings(games: pd.DataFrame, window: int) -> pd.DataFrame:
+    # Sort chronologically, then every rating variant in one vectorized pass
+    df = games.sort_values(["team","season","week"]).reset_index(drop=True)
+    df = _rating_cube(df, windows=_windows(window))
+    # Default columns (used by the game models) are the `window` rolling variant
+    return df.assign(**select_ratings(df, f"roll{window}"))
 
+def build_team_epa_rolling(window:int=8, seasons=None, streaming: bool = PBP_STREAMING,
+                           memory_mb: float = PBP_MEMORY_MB) -> str:
+    """
+    Per team-game EPA/play plus rolling offense/defense/net ratings.
+    With `streaming` (default) pbp is aggregated batch by batch within
+    `memory_mb`; otherwise all requested seasons are loaded at once.
+    Also saves the rolling state used by update_team_epa_rolling.
+    """
+    df = _ratings(_team_games(*_game_epa(seasons, streaming=streaming, memory_mb=memory_mb)), window)
+    _save_state(_state_from(df, window, seasons))
     return _save(df, "team_ratings.parquet")
+
+def _rating_cube(df: pd.DataFrame, windows=RATING_WINDOWS, spans=RATING_EWM_SPANS) -> pd.DataFrame:
+    """Pre-game ratings from prior games only; `df` sorted by team, season, week."""
+    by_team = segments(df, ["team"])
+    by_season = segments(df, ["team","season"])
+    cube = {}
+    for side, col in SIDES:
+        prior = shift(df[col], by_team)
+        for w in windows:
+            cube[f"{side}_roll{w}"] = rolling_mean(prior, by_team, w, min_periods=min(3, w))
+        for span in spans:
+            cube[f"{side}_ewm{span}"] = ewm_mean(prior, by_team, alpha=2 / (span + 1))
+        cube[f"{side}_std"] = expanding_mean(shift(df[col], by_season), by_season)
+    # Net rating: lower defensive EPA allowed is better, so subtract
+    for v in [k[4:] for k in cube if k.startswith("off_")]:
+        cube[f"net_{v}"] = cube[f"off_{v}"] - cube[f"def_{v}"]
+    return df.assign(**cube)
+
+def select_ratings(df: pd.DataFrame, variant: str = "roll8") -> pd.DataFrame:
+    """Map one cube variant onto the off_epa_pp_roll / def_epa_pp_roll / net_epa_rating columns."""
+    if f"off_{variant}" not in df.columns:
+        raise KeyError(f"Rating variant '{variant}' not in ratings cube (have: {RATING_VARIANTS})")
+    return pd.DataFrame({"off_epa_pp_roll": df[f"off_{variant}"],
+                         "def_epa_pp_roll": df[f"def_{variant}"],
+                         "net_epa_rating": df[f"net_{variant}"]}, index=df.index)
+
+def load_ratings(variant: str | None = None) -> pd.DataFrame:
+    """team_ratings.parquet with `variant` (default RATING_VARIANT) in the standard rating columns."""
+    ratings = read_parquet(PROC_DIR / "team_ratings.parquet")
+    variant = variant or RATING_VARIANT
+    return ratings.assign(**select_ratings(ratings, variant)) if variant else ratings
+
+# --- Incremental refresh ---------------------------------------------------
+# The state holds, per team (indexed by int8 team code): the last max(window)
+# per-game EPA values, the EWMA after the last game, and the current season's
+# running sum/count, for offense and defense. That is everything the next
+# game's pre-game ratings depend on, so new games cost O(teams x window).
+
+def _state_from(df: pd.DataFrame, window: int, seasons=None) -> dict:
+    """Rolling state after the last game of each team in the (sorted) ratings frame."""
+    n, hist = len(TEAMS), max(_windows(window))
+    state = {"window": np.array(window), "spans": np.array(RATING_EWM_SPANS),
+             "seasons": np.array(sorted(df["season"].unique()) if seasons is None else sorted(seasons)),
+             "all_seasons": np.array(seasons is None),
+             "week": np.array(int(df.loc[df["season"] == df["season"].max(), "week"].max())),
+             "season": np.full(n, -1, dtype=np.int64)}
+    df = df[df["team"].notna()]
+    codes = team_codes(df["team"])
+    seg = segments(df, ["team"])
+    ends = np.append(seg.starts[1:], len(df)) - 1
+    t = codes[seg.starts]
+    last_season = df["season"].to_numpy()[ends]
+    state["season"][t] = last_season
+    in_last = df["season"].to_numpy() == last_season[seg.ids]
+    for side, col in SIDES:
+        x = df[col].to_numpy(dtype=float)
+        h = np.full((n, hist), np.nan)
+        for k in range(hist):  # k-th most recent game
+            idx = ends - k
+            ok = idx >= seg.starts
+            h[t[ok], hist - 1 - k] = x[idx[ok]]
+        state[f"{side}_hist"] = h
+        e = np.full((n, len(RATING_EWM_SPANS)), np.nan)
+        for j, span in enumerate(RATING_EWM_SPANS):
+            e[t, j] = ewm_mean(x, seg, alpha=2 / (span + 1))[ends]
+        state[f"{side}_ewm"] = e
+        ok = in_last & ~np.isnan(x)
+        state[f"{side}_sum"] = np.zeros(n); state[f"{side}_cnt"] = np.zeros(n)
+        state[f"{side}_sum"][t] = np.bincount(seg.ids, weights=np.where(ok, x, 0.0), minlength=seg.n_groups)
+        state[f"{side}_cnt"][t] = np.bincount(seg.ids, weights=ok.astype(float), minlength=seg.n_groups)
+    return state
+
+def _save_state(state: dict) -> str:
+    PROC_DIR.mkdir(parents=True, exist_ok=True)
+    p = PROC_DIR / STATE_NAME
+    np.savez(p, **state)
+    return str(p)
+
+def _load_state() -> dict | None:
+    p = PROC_DIR / STATE_NAME
+    if not p.exists():
+        return None
+    with np.load(p) as z:
+        return {k: z[k] for k in z.files}
+
+def _advance(state: dict, games: pd.DataFrame) -> pd.DataFrame:
+    """Pre-game ratings for `games` (one week: at most one game per team), then fold them into `state`."""
+    window = int(state["window"])
+    t = team_codes(games["team"]).astype(np.int64)
+    season = games["season"].to_numpy().astype(np.int64)
+    same = state["season"][t] == season
+    cube = {}
+    for side, col in SIDES:
+        x = games[col].to_numpy(dtype=float)
+        h = state[f"{side}_hist"][t]
+        for w in _windows(window):
+            last = h[:, -w:]
+            c = (~np.isnan(last)).sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cube[f"{side}_roll{w}"] = np.where(c >= min(3, w), np.nansum(last, axis=1) / c, np.nan)
+        e = state[f"{side}_ewm"][t]
+        for j, span in enumerate(state["spans"]):
+            cube[f"{side}_ewm{span}"] = e[:, j]
+        ssum = np.where(same, state[f"{side}_sum"][t], 0.0)
+        scnt = np.where(same, state[f"{side}_cnt"][t], 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cube[f"{side}_std"] = np.where(scnt > 0, ssum / scnt, np.nan)
+
+        # fold the new games in
+        state[f"{side}_hist"][t] = np.column_stack([h[:, 1:], x])
+        alpha = 2 / (state["spans"] + 1)
+        xe = x[:, None]
+        state[f"{side}_ewm"][t] = np.where(np.isnan(xe), e, np.where(np.isnan(e), xe, (1 - alpha) * e + alpha * xe))
+        ok = ~np.isnan(x)
+        state[f"{side}_sum"][t] = ssum + np.where(ok, x, 0.0)
+        state[f"{side}_cnt"][t] = scnt + ok
+    state["season"][t] = season
+    for v in [k[4:] for k in cube if k.startswith("off_")]:
+        cube[f"net_{v}"] = cube[f"off_{v}"] - cube[f"def_{v}"]
+    out = games.assign(**cube)
+    return out.assign(**select_ratings(out, f"roll{window}"))
+
+def available_pbp_seasons() -> list[int]:
+    return sorted(set(available_seasons("pbp_slim")) | set(available_seasons("pbp")))
+
+def _new_games(state: dict, known: set, season: int | None, week: int | None) -> pd.DataFrame:
+    # seasons from the state's last one onwards; in that season only weeks >= its
+    # last week (row groups are sorted by week, so the rest are pruned unread)
+    start, start_week = int(state["season"].max()), int(state["week"])
+    stop = int(season) if season is not None else max(available_pbp_seasons() + [start])
+    offs, defs = [], []
+    for s in range(start, stop + 1):
+        filters = []
+        if s == start:
+            filters.append(("week", ">=", start_week))
+        if s == season and week is not None:
+            filters.append(("week", "<=", int(week)))
+        try:
+            pbp = read_pbp(seasons=[s], columns=PBP_COLUMNS, filters=filters or None)
+        except FileNotFoundError:
+            continue
+        pbp = pbp[~pbp["game_id"].astype(str).isin(known)]
+        if len(pbp):
+            off, deff = _game_sums(_scrimmage(pbp))
+            offs.append(off); defs.append(deff)
+    if not offs:
+        return pd.DataFrame()
+    games = _team_games(_combine(offs), _combine(defs))
+    return games[games["team"].notna()]
+
+def _stale(state: dict) -> bool:
+    # a season before the state's last one that the state never saw (e.g. the range was widened)
+    if not bool(state["all_seasons"]):
+        return False
+    last, seen = int(state["season"].max()), set(state["seasons"].tolist())
+    return any(s < last and s not in seen for s in available_pbp_seasons())
+
+def update_team_epa_rolling(season: int | None = None, week: int | None = None, verify: bool = False,
+                            streaming: bool = PBP_STREAMING, memory_mb: float = PBP_MEMORY_MB) -> str:
+    """
+    Append ratings for games not yet in team_ratings.parquet (through `season`/`week`
+    if given) using the saved rolling state; only the latest seasons' pbp is read.
+    Falls back to a full build when there is no state or older seasons appeared.
+    With `verify`, the result is checked against a full rebuild.
+    """
+    state = _load_state()
+    path = PROC_DIR / "team_ratings.parquet"
+    if state is None or not path.exists() or _stale(state):
+        print("[ratings] no usable incremental state; full rebuild")
+        return build_team_epa_rolling(streaming=streaming, memory_mb=memory_mb)
+    window = int(state["window"])
+    ratings = read_parquet(path)
+    games = _new_games(state, set(ratings["game_id"].astype(str)), season, week)
+    if len(games):
+        games = games.sort_values(["season","week","team"]).reset_index(drop=True)
+        new = pd.concat([_advance(state, g) for _, g in games.groupby(["season","week"], sort=True)], ignore_index=True)
+        ratings = pd.concat([ratings, enforce(new)[ratings.columns]], ignore_index=True)
+        ratings = ratings.sort_values(["team","season","week"]).reset_index(drop=True)
+        state["seasons"] = np.array(sorted(set(state["seasons"].tolist()) | set(new["season"].astype(int))))
+        last = games.iloc[-1]
+        state["week"] = np.array(int(last["week"]))
+    print(f"[ratings] incremental update: {len(games)} new team-games")
+
+    if verify:
+        full = _ratings(_team_games(*_game_epa(None if bool(state["all_seasons"]) else state["seasons"].tolist(),
+                                               streaming=streaming, memory_mb=memory_mb)), window)
+        if season is not None and week is not None:
+            full = full[(full["season"] < season) | ((full["season"] == season) & (full["week"] <= week))]
+        _verify(ratings, full)
+
+    _save_state(state)
+    return _save(ratings, "team_ratings.parquet")
+
+def _verify(inc: pd.DataFrame, full: pd.DataFrame) -> None:
+    keys = ["season","week","game_id","team"]
+    a = inc[inc["team"].notna()].sort_values(keys).reset_index(drop=True)
+    b = enforce(full[full["team"].notna()]).sort_values(keys).reset_index(drop=True)
+    if len(a) != len(b) or not (a["game_id"].astype(str).values == b["game_id"].astype(str).values).all():
+        raise AssertionError(f"incremental ratings rows differ from a full rebuild ({len(a)} vs {len(b)})")
+    cols = [c for c in b.columns if c.startswith(("off_","def_","net_"))]
+    bad = [c for c in cols if not np.allclose(a[c].to_numpy(float), b[c].to_numpy(float), equal_nan=True)]
+    if bad:
+        raise AssertionError(f"incremental ratings differ from a full rebuild in {bad}")
+    print(f"[ratings] verified {len(a)} rows x {len(cols)} rating columns against a full rebuild")
@@ -2,25 +2,37 @@ from __future__ import annotations
 import os
 from pathlib import Path
 import pandas as pd
+from src.features.injury_adjustments import MAX_WEEK, load_injury_index
+from src.utils.schema import read_parquet
 
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
 
-def apply_injury_to_player_projections() -> str:
+def apply_injury_to_player_projections(week: int | None = None) -> str:
+    """
+    Scale usage projections by injury status as of `week` of each row's season
+    (default: the latest status on file for that season).
+    """
     usage_proj = pd.read_csv(ART_DIR / "player_usage_projections.csv")
     # Most recent season per player already in the file; we align by (player_id, team, season)
     inj_path = PROC_DIR / "injury_adjustments.parquet"
-    if not inj_path.exists():
+    index = load_injury_index()
+    if index is None and not inj_path.exists():
         print("No injury adjustments found; copying projections through.")
         out = usage_proj.copy()
         out.to_csv(ART_DIR / "player_usage_projections_injury_adj.csv", index=False)
         return str(ART_DIR / "player_usage_projections_injury_adj.csv")
 
-    inj = pd.read_parquet(inj_path)
-    # Take the latest week row per player within season as the current status
-    inj = inj.sort_values(["player_id","season","week"]).groupby(["player_id","season"]).tail(1)
-
-    out = usage_proj.merge(inj[["player_id","season","inj_multiplier"]], on=["player_id","season"], how="left")
+    if index is not None:
+        # O(1) per player: forward-filled status array lookup, no sort of the injury table
+        asof = index.status_asof(usage_proj["player_id"], usage_proj["season"], MAX_WEEK if week is None else week)
+        out = usage_proj.copy()
+        out["inj_multiplier"] = asof["inj_multiplier"].to_numpy(float)
+    else:
+        inj = read_parquet(inj_path)
+        # Take the latest week row per player within season as the current status
+        inj = inj.sort_values(["player_id","season","week"]).groupby(["player_id","season"], observed=True).tail(1)
+        out = usage_proj.merge(inj[["player_id","season","inj_multiplier"]], on=["player_id","season"], how="left")
     out["inj_multiplier"] = out["inj_multiplier"].fillna(1.0)
 
     # Scale forecast shares by injury multiplier and renormalize per team roughly
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import TimeSeriesSplit
+from src.models.batch_score import BatchScorer, linear_fold
+from src.utils.schema import read_parquet
+
+PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
+ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Walk-forward backtest of the game-win models: for every week of every test
+# season, train on all completed games before it and predict that week. Each
+# fold refits the production model, CalibratedClassifierCV(LogisticRegression,
+# isotonic, TimeSeriesSplit(5)), by hand: split k's logistic fit is warm-started
+# from split k of the previous week (one more week of data, nearly the same
+# optimum), which CalibratedClassifierCV can't do since it clones its estimator.
+# The design matrix is built once and handed to the workers; each worker runs
+# one test season, its weeks in order so the warm starts chain.
+
+N_SPLITS = 5
+BASIC_FEATURES = ["net_diff","off_diff","def_diff"]
+EXTENDED_FEATURES = ["net_diff","off_diff","def_diff","rest_diff","travel_diff_km","dome_any"]
+
+def design(df: pd.DataFrame, model: str) -> tuple[pd.DataFrame, list[str]]:
+    """Completed games in time order with the model's features, as the trainers prepare them."""
+    df = df[df["home_score"].notna() & df["away_score"].notna()]
+    if model == "basic":
+        features = BASIC_FEATURES
+        df = df.dropna(subset=features)
+    else:
+        features = EXTENDED_FEATURES + [c for c in ("closing_spread", "closing_total") if c in df.columns]
+        df = df.assign(**{c: df[c].fillna(0.0) for c in features})
+    df = df.sort_values(["season","week"], kind="stable")
+    return df[["game_id","season","week","home_win", *features]].reset_index(drop=True), features
+
+_X = _y = _when = None
+
+def _init(X: np.ndarray, y: np.ndarray, when: np.ndarray):
+    global _X, _y, _when
+    _X, _y, _when = X, y, when
+
+def fit_folds(X: np.ndarray, y: np.ndarray, lrs: list[LogisticRegression]) -> list:
+    """Calibrated folds as CalibratedClassifierCV fits them, reusing (warm-starting) `lrs`."""
+    folds = []
+    for lr, (tr, cal) in zip(lrs, TimeSeriesSplit(N_SPLITS).split(X)):
+        lr.fit(X[tr], y[tr])
+        iso = IsotonicRegression(out_of_bounds="clip").fit(lr.decision_function(X[cal]), y[cal])
+        folds.append(linear_fold(lr, iso))
+    return folds
+
+def _run_season(season: int, min_train: int) -> tuple[np.ndarray, np.ndarray]:
+    # (rows, P(home win)) for every week of `season` with enough history
+    lrs = [LogisticRegression(max_iter=2000, warm_start=True) for _ in range(N_SPLITS)]
+    rows, probs = [], []
+    for w in np.unique(_when[_when // 100 == season]):
+        train, test = np.flatnonzero(_when < w), np.flatnonzero(_when == w)
+        if len(train) < min_train:
+            continue
+        scorer = BatchScorer(features=[], folds=fit_folds(_X[train], _y[train], lrs))
+        rows.append(test)
+        probs.append(scorer.predict(_X[test]))
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([])
+    return np.concatenate(rows), np.concatenate(probs)
+
+def _scores(g: pd.DataFrame) -> pd.Series:
+    p, y = g["home_win_prob"].clip(1e-15, 1 - 1e-15), g["home_win"]
+    return pd.Series({"games": len(g), "brier": ((p - y) ** 2).mean(),
+                      "logloss": -(y * np.log(p) + (1 - y) * np.log(1 - p)).mean(),
+                      "accuracy": ((p > 0.5) == (y == 1)).mean()})
+
+def calibration(preds: pd.DataFrame, bins: int = 10) -> pd.DataFrame:
+    """Predicted vs observed home-win rate by probability bin."""
+    b = np.minimum((preds["home_win_prob"] * bins).astype(int), bins - 1)
+    out = preds.groupby(b).agg(games=("home_win", "size"), predicted=("home_win_prob", "mean"), observed=("home_win", "mean"))
+    out.index = [f"{k / bins:.1f}-{(k + 1) / bins:.1f}" for k in out.index]
+    return out.rename_axis("bin").reset_index()
+
+def backtest(model: str = "extended", seasons: list[int] | None = None, min_train: int = 500,
+             workers: int | None = None) -> dict:
+    """
+    Out-of-sample predictions for every week of `seasons` (default: all with
+    `min_train` earlier games). Writes backtest_<model>_{predictions,weekly,seasons,calibration}.csv
+    to ART_DIR and returns their paths.
+    """
+    df, features = design(read_parquet(PROC_DIR / "game_model_table.parquet"), model)
+    X, y = df[features].to_numpy(float), df["home_win"].to_numpy(int)
+    when = df["season"].to_numpy(np.int64) * 100 + df["week"].to_numpy(np.int64)   # compact dtypes would overflow
+    seasons = sorted(set(df["season"]) if seasons is None else set(seasons) & set(df["season"]))
+    workers = BACKTEST_WORKERS if workers is None else max(1, int(workers))
+    parallel = workers > 1 and len(seasons) > 1
+    print(f"[backtest] {model}: {len(df):,} games, {len(features)} features, {len(seasons)} season(s), {workers} worker(s)")
+
+    rows, probs = [], []
+    with ProcessPoolExecutor(max_workers=min(workers, len(seasons)), initializer=_init, initargs=(X, y, when)) \
+            if parallel else contextlib.nullcontext() as pool:
+        if not parallel:
+            _init(X, y, when)
+        for r, p in (pool.map if parallel else map)(_run_season, seasons, [min_train] * len(seasons)):
+            rows.append(r); probs.append(p)
+    rows = np.concatenate(rows)
+    if not len(rows):
+        raise RuntimeError(f"No week has {min_train} earlier games to train on; lower min_train.")
+    preds = df.loc[rows, ["game_id","season","week","home_win"]].assign(home_win_prob=np.concatenate(probs))
+
+    weekly = preds.groupby(["season","week"]).apply(_scores).reset_index()
+    by_season = pd.concat([preds.groupby("season").apply(_scores).reset_index(),
+                           _scores(preds).to_frame().T.assign(season="all")], ignore_index=True)
+    by_season["games"] = by_season["games"].astype(int)
+    weekly["games"] = weekly["games"].astype(int)
+
+    ART_DIR.mkdir(parents=True, exist_ok=True)
+    out = {}
+    for name, table in [("predictions", preds), ("weekly", weekly), ("seasons", by_season), ("calibration", calibration(preds))]:
+        out[name] = str(ART_DIR / f"backtest_{model}_{name}.csv")
+        table.to_csv(out[name], index=False)
+    overall = by_season.iloc[-1]
+    print(f"[backtest] {model}: {int(overall['games']):,} games out of sample, brier {overall['brier']:.4f}, "
+          f"logloss {overall['logloss']:.4f}, accuracy {overall['accuracy']:.3f}")
+    return out
+
+def _season_list(spec: str | None) -> list[int] | None:
+    if not spec:
+        return None
+    a, _, b = spec.partition("-")
+    return list(range(int(a), int(b or a) + 1))
+
+def main():
+    ap = argparse.ArgumentParser(description="Walk-forward backtest: train through week N, predict week N+1")
+    ap.add_argument("--model", choices=["basic", "extended", "both"], default="extended")
+    ap.add_argument("--seasons", default=None, help="test seasons, e.g. 2005-2024 (default: all with enough history)")
+    ap.add_argument("--min-train", type=int, default=500, help="earlier games required before a week is predicted")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    for model in (["basic", "extended"] if args.model == "both" else [args.model]):
+        for name, path in backtest(model, _season_list(args.seasons), min_train=args.min_train, workers=args.workers).items():
+            print(f"{name}: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass, fields
+from pathlib import Path
+import numpy as np
+
+# NumPy re-implementation of the fitted game models' predict_proba, for scoring
+# millions of (sim, game) rows at once. A model is a list of linear folds, each
+# with its own calibration; P(home win) is the mean of the calibrated folds,
+# exactly as CalibratedClassifierCV averages its calibrated classifiers.
+# The trainers export it next to the joblib model as <model>_scorer.json, so
+# scoring needs neither sklearn nor joblib.
+
+@dataclass
+class LinearFold:
+    coef: np.ndarray                  # per feature
+    intercept: float
+    x_thresholds: np.ndarray | None = None   # isotonic calibration
+    y_thresholds: np.ndarray | None = None
+    a: float | None = None            # sigmoid (Platt) calibration: 1 / (1 + exp(a * d + b))
+    b: float | None = None
+
+    def calibrate(self, d: np.ndarray) -> np.ndarray:
+        if self.x_thresholds is not None:
+            return np.interp(d, self.x_thresholds, self.y_thresholds)
+        if self.a is not None:
+            return 1.0 / (1.0 + np.exp(self.a * d + self.b))
+        return 1.0 / (1.0 + np.exp(-d))   # uncalibrated logistic
+
+def linear_fold(lr, calibrator=None) -> LinearFold:
+    fold = LinearFold(coef=np.asarray(lr.coef_, dtype=float).ravel(), intercept=float(np.ravel(lr.intercept_)[0]))
+    if calibrator is None:
+        return fold
+    if hasattr(calibrator, "X_thresholds_"):
+        fold.x_thresholds = np.asarray(calibrator.X_thresholds_, dtype=float)
+        fold.y_thresholds = np.asarray(calibrator.y_thresholds_, dtype=float)
+    else:
+        fold.a, fold.b = float(calibrator.a_), float(calibrator.b_)
+    return fold
+
+@dataclass
+class BatchScorer:
+    features: list[str]
+    folds: list[LinearFold]
+
+    @classmethod
+    def from_model(cls, model, features: list[str]) -> "BatchScorer":
+        """From a fitted LogisticRegression or CalibratedClassifierCV over one."""
+        if hasattr(model, "calibrated_classifiers_"):
+            folds = [linear_fold(c.estimator, c.calibrators[0]) for c in model.calibrated_classifiers_]
+        elif hasattr(model, "coef_"):
+            folds = [linear_fold(model)]
+        else:
+            raise TypeError(f"Can't batch-score a {type(model).__name__}")
+        return cls(features=list(features), folds=folds)
+
+    @classmethod
+    def fallback(cls) -> "BatchScorer":
+        # the net_diff proxy season_sim has always used without a model
+        return cls(features=["net_diff"], folds=[LinearFold(coef=np.array([0.9]), intercept=0.25)])
+
+    def weights(self, feature: str) -> np.ndarray:
+        """Coefficient of `feature` in each fold (0 if the model doesn't use it)."""
+        if feature not in self.features:
+            return np.zeros(len(self.folds))
+        i = self.features.index(feature)
+        return np.array([f.coef[i] for f in self.folds])
+
+    def decision(self, X: np.ndarray) -> np.ndarray:
+        """(folds x rows) linear scores."""
+        return np.stack([X @ f.coef + f.intercept for f in self.folds])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """P(home win) per row of X (columns in `features` order)."""
+        d = self.decision(np.asarray(X, dtype=float))
+        return sum(f.calibrate(d[k]) for k, f in enumerate(self.folds)) / len(self.folds)
+
+    def save(self, path: Path) -> Path:
+        # floats round-trip exactly through json, so the loaded scorer is bit-identical
+        folds = [{f.name: (v.tolist() if isinstance(v, np.ndarray) else v)
+                  for f in fields(LinearFold) for v in [getattr(fold, f.name)]} for fold in self.folds]
+        path.write_text(json.dumps({"features": self.features, "folds": folds}))
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "BatchScorer":
+        d = json.loads(Path(path).read_text())
+        arrays = {"coef", "x_thresholds", "y_thresholds"}
+        return cls(features=d["features"],
+                   folds=[LinearFold(**{k: (np.asarray(v, dtype=float) if k in arrays and v is not None else v)
+                                        for k, v in f.items()}) for f in d["folds"]])
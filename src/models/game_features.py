@@ -0,0 +1,107 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.etl.catalog import read_table
+from src.features.team_ratings import load_ratings
+from src.utils.schema import read_parquet, team_codes
+
+PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
+
+# Wide game feature assembler shared by enrichment, training and weekly scoring.
+# Team-game features (ratings + context) are joined once into one frame keyed by
+# (game_id, team); each schedule row then takes its home and away rows by integer
+# position. The result is sorted by season/week so any week range is a
+# contiguous slice (see week_slice).
+
+SCHEDULE_COLUMNS = ["game_id","season","week","home_team","away_team","home_score","away_score"]
+
+# team-game column -> (home column, away column); names match the historical game_model_table
+RATING_FEATURES = {
+    "off_epa_pp_roll": ("off_epa_pp_roll", "away_off_roll"),
+    "def_epa_pp_roll": ("def_epa_pp_roll", "away_def_roll"),
+    "net_epa_rating": ("net_epa_rating", "away_net"),
+}
+CONTEXT_FEATURES = {
+    "rest_days": ("home_rest", "away_rest"),
+    "travel_km": ("home_travel", "away_travel"),
+    "is_dome_like": ("home_dome", "away_dome"),
+    "short_week": ("home_short_week", "away_short_week"),
+    "consecutive_road": ("home_consecutive_road", "away_consecutive_road"),
+    "season_travel_km": ("home_season_travel_km", "away_season_travel_km"),
+    "tz_shift": ("home_tz_shift", "away_tz_shift"),
+    "season_tz_crossed": ("home_season_tz_crossed", "away_season_tz_crossed"),
+}
+# home - away differences
+DIFFS = {
+    "net_diff": ("net_epa_rating", "away_net"),
+    "off_diff": ("off_epa_pp_roll", "away_off_roll"),
+    "def_diff": ("def_epa_pp_roll", "away_def_roll"),
+    "rest_diff": ("home_rest", "away_rest"),
+    "travel_diff_km": ("home_travel", "away_travel"),
+    "season_travel_diff_km": ("home_season_travel_km", "away_season_travel_km"),
+    "tz_crossed_diff": ("home_season_tz_crossed", "away_season_tz_crossed"),
+}
+
+def team_game_features(ratings: pd.DataFrame, context: pd.DataFrame | None = None) -> pd.DataFrame:
+    """One row per (game_id, team) with rating and (optional) context columns."""
+    tg = ratings[["game_id","team", *RATING_FEATURES]]
+    if context is not None:
+        cols = [c for c in CONTEXT_FEATURES if c in context.columns]
+        tg = tg.merge(context[["game_id","team", *cols]], on=["game_id","team"], how="outer")
+    tg = tg[tg["team"].notna()].drop_duplicates(["game_id","team"], keep="last")
+    return tg.reset_index(drop=True)
+
+def _take(col: pd.Series, pos: np.ndarray) -> np.ndarray:
+    v = col.to_numpy(dtype=float)
+    return np.where(pos >= 0, v[np.maximum(pos, 0)], np.nan) if len(v) else np.full(len(pos), np.nan)
+
+def assemble(schedules: pd.DataFrame, ratings: pd.DataFrame, context: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Wide per-game features (home, away and diffs), sorted by season, week, game_id."""
+    games = schedules[[c for c in SCHEDULE_COLUMNS if c in schedules.columns]]
+    games = games.sort_values(["season","week","game_id"], kind="stable").reset_index(drop=True)
+    tg = team_game_features(ratings, context)
+
+    # (game_id, side) -> row of tg
+    index = pd.MultiIndex.from_arrays([tg["game_id"].astype(str).to_numpy(), team_codes(tg["team"])])
+    gid = games["game_id"].astype(str).to_numpy()
+    pos = {side: index.get_indexer(pd.MultiIndex.from_arrays([gid, team_codes(games[f"{side}_team"])]))
+           for side in ("home", "away")}
+
+    wide = {}
+    for src, (h, a) in {**RATING_FEATURES, **CONTEXT_FEATURES}.items():
+        if src in tg.columns:
+            wide[h], wide[a] = _take(tg[src], pos["home"]), _take(tg[src], pos["away"])
+    for name, (h, a) in DIFFS.items():
+        if h in wide:
+            wide[name] = wide[h] - wide[a]
+    if "home_dome" in wide:
+        wide["dome_any"] = ((wide["home_dome"] == 1) | (wide["away_dome"] == 1)).astype(int)
+    return games.assign(**wide)
+
+def load_game_features(rating: str | None = None, seasons=None, context: bool = True) -> pd.DataFrame:
+    """Assemble from the processed ratings/context; context is skipped if it hasn't been built."""
+    schedules = read_table("schedules", seasons=seasons, columns=SCHEDULE_COLUMNS)
+    assert len(schedules), "Missing schedules. Run ETL first."
+    ratings = load_ratings(rating)
+    ctx = None
+    if context:
+        p = PROC_DIR / "context_features.parquet"
+        if p.exists():
+            ctx = read_parquet(p)
+        else:
+            print("context_features.parquet not found; assembling without context features.")
+    if seasons is not None:
+        keep = {int(s) for s in seasons}
+        ratings = ratings[ratings["season"].isin(keep)]
+        ctx = ctx[ctx["season"].isin(keep)] if ctx is not None else None
+    return assemble(schedules, ratings, ctx)
+
+def week_slice(wide: pd.DataFrame, season: int, week: int | None = None, last_week: int | None = None) -> pd.DataFrame:
+    """Rows for `season` (optionally weeks `week`..`last_week`) as a contiguous slice of a sorted frame."""
+    key = wide["season"].to_numpy(np.int64) * 100 + wide["week"].to_numpy(np.int64)
+    lo = season * 100 + (week if week is not None else 0)
+    hi = season * 100 + (last_week if last_week is not None else week if week is not None else 99)
+    a, b = np.searchsorted(key, lo, "left"), np.searchsorted(key, hi, "right")
+    return wide.iloc[a:b]
@@ -1,7 +1,8 @@
 from __future__ import annotations
 import os
 from pathlib import Path
-import pandas as pd
+from src.features.rolling import ewm_mean, segments
+from src.utils.schema import read_parquet
 
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
@@ -11,16 +12,18 @@ def _ensure_dirs():
 
 def build_simple_usage_projections() -> str:
     _ensure_dirs()
-    usage = pd.read_parquet(PROC_DIR / "player_usage.parquet")
+    usage = read_parquet(PROC_DIR / "player_usage.parquet")
 
     # Forecast next game's usage as EWMA of last 4 (carry/target shares)
-    usage = usage.sort_values(["player_id","season","week"])
-    usage["carry_share_fcast"] = usage.groupby("player_id")["carry_share"].transform(lambda s: s.ewm(span=4, adjust=False).mean())
-    usage["target_share_fcast"] = usage.groupby("player_id")["target_share"].transform(lambda s: s.ewm(span=4, adjust=False).mean())
+    usage = usage.sort_values(["player_id","season","week"]).reset_index(drop=True)
+    seg = segments(usage, ["player_id"])
+    alpha = 2 / (4 + 1)  # span=4
+    usage["carry_share_fcast"] = ewm_mean(usage["carry_share"], seg, alpha)
+    usage["target_share_fcast"] = ewm_mean(usage["target_share"], seg, alpha)
 
     # Take most recent obs per player-season-week as "projection for next week"
-    latest = usage.groupby(["player_id","season"]).tail(1).copy()
-    out = latest[["player_id","player_name","posteam","season","week","carry_share_fcast","target_share_fcast"]].copy()
+    latest = usage.groupby(["player_id","season"], observed=True).tail(1).copy()
+    out = latest[["player_id","player_name","team","season","week","carry_share_fcast","target_share_fcast"]].copy()
     out.rename(columns={
         "carry_share_fcast":"proj_carry_share_next",
         "target_share_fcast":"proj_target_share_next"
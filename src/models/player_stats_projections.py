@@ -3,6 +3,9 @@ import os
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from src.etl.catalog import read_table
+from src.features.rolling import ewm_mean, expanding_mean, fill_na, group_mean, rolling_mean, segments, shift
+from src.utils.schema import enforce
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
@@ -23,12 +26,16 @@ def _safe_div(a: pd.Series, b: pd.Series) -> pd.Series:
     out = out / b.replace({0: np.nan})
     return out.fillna(0.0)
 
-def build_player_stat_projections() -> str:
+# Candidate weekly columns across nfl_data_py versions (absent ones are skipped on read)
+WEEKLY_COLUMNS = ["season","week","game_week","player_id","gsis_id","pfr_id","player_name","player","name",
+                  "recent_team","team","posteam","targets","target","receptions","rec",
+                  "receiving_yards","rec_yards","yards_receiving","receiving_tds","rec_tds","td_receiving",
+                  "rushing_attempts","rush_att","carries","rushing_att","rushing_yards","rush_yards","yards_rushing",
+                  "rushing_tds","rush_tds","td_rushing"]
+
+def build_player_stat_projections(seasons=None) -> str:
     # Load weekly data written by ETL
-    weekly_parqs = sorted(RAW_DIR.glob("weekly_*.parquet"))
-    if not weekly_parqs:
-        raise FileNotFoundError("weekly parquet not found in data/raw; run ETL first.")
-    wk = pd.read_parquet(weekly_parqs[-1])
+    wk = read_table("weekly", seasons=seasons, columns=WEEKLY_COLUMNS)
 
     # Map varying column names across nfl_data_py versions
     season = _col(wk, ["season"])
@@ -64,7 +71,7 @@ def build_player_stat_projections() -> str:
         df[out_col] = wk[src].fillna(0).astype(float) if (src and src in wk.columns) else 0.0
 
     # Team totals per game (for shares/normalization)
-    team_tot = (df.groupby(["season","week","team"], as_index=False)
+    team_tot = (df.groupby(["season","week","team"], as_index=False, observed=True)
                   .agg(team_targets=("targets","sum"),
                        team_carries=("rush_att","sum")))
     df = df.merge(team_tot, on=["season","week","team"], how="left")
@@ -76,43 +83,32 @@ def build_player_stat_projections() -> str:
     df["carry_share"]  = _safe_div(df["rush_att"], df["team_carries"])
 
     # Rolling form (last-3) with a prior from player-season mean
-    df = df.sort_values(["player_id","season","week"])
-    def _proj(g: pd.DataFrame) -> pd.DataFrame:
-        ts_mean = g["target_share"].expanding().mean()
-        cs_mean = g["carry_share"].expanding().mean()
-        ts = g["target_share"].rolling(3, min_periods=1).mean().shift(1).fillna(ts_mean)
-        cs = g["carry_share"].rolling(3, min_periods=1).mean().shift(1).fillna(cs_mean)
-        # Convert shares to counting stats using latest team totals observed
-        team_tgt_next = g["team_targets"].rolling(3, min_periods=1).mean().shift(1).fillna(g["team_targets"].expanding().mean())
-        team_car_next = g["team_carries"].rolling(3, min_periods=1).mean().shift(1).fillna(g["team_carries"].expanding().mean())
-        proj_targets = (ts * team_tgt_next).clip(lower=0)
-        proj_carries = (cs * team_car_next).clip(lower=0)
-        # Yardage/TD simple rates
-        ypt = (g["rec_yards"] / g["targets"].replace({0:np.nan})).fillna(7.5)   # yards per target prior
-        ypc = (g["rush_yards"]/ g["rush_att"].replace({0:np.nan})).fillna(4.2)  # yards per carry prior
-        tpr = (g["rec_td"]   / g["targets"].replace({0:np.nan})).fillna(0.04)   # TD per target prior
-        ctd = (g["rush_td"]  / g["rush_att"].replace({0:np.nan})).fillna(0.03)  # TD per carry prior
-        # EWMA smoothing
-        ypt_s = ypt.ewm(alpha=0.5, adjust=False).mean().shift(1).fillna(ypt.mean())
-        ypc_s = ypc.ewm(alpha=0.5, adjust=False).mean().shift(1).fillna(ypc.mean())
-        tpr_s = tpr.ewm(alpha=0.5, adjust=False).mean().shift(1).fillna(tpr.mean())
-        ctd_s = ctd.ewm(alpha=0.5, adjust=False).mean().shift(1).fillna(ctd.mean())
-
-        out = pd.DataFrame({
-            "proj_targets": proj_targets,
-            "proj_carries": proj_carries,
-            "proj_rec_yards": proj_targets * ypt_s,
-            "proj_rush_yards": proj_carries * ypc_s,
-            "proj_rec_td": proj_targets * tpr_s,
-            "proj_rush_td": proj_carries * ctd_s,
-        })
-        return out
-
-    proj = df.groupby(["player_id","season"], group_keys=False).apply(_proj).reset_index(drop=True)
-    out = pd.concat([df.reset_index(drop=True), proj], axis=1)
+    df = df.sort_values(["player_id","season","week"]).reset_index(drop=True)
+    seg = segments(df, ["player_id","season"])
+    def _next(col: str) -> np.ndarray:
+        # last-3 mean shifted to predict next week, falling back to the season-to-date mean
+        x = df[col].to_numpy(float)
+        return fill_na(shift(rolling_mean(x, seg, 3), seg), expanding_mean(x, seg))
+    def _rate(num: str, den: str, prior: float) -> np.ndarray:
+        # per-game rate, EWMA-smoothed and shifted, falling back to the player-season mean
+        r = (df[num] / df[den].replace({0:np.nan})).fillna(prior).to_numpy(float)
+        return fill_na(shift(ewm_mean(r, seg, alpha=0.5), seg), group_mean(r, seg))
+
+    # Convert shares to counting stats using latest team totals observed
+    proj_targets = (_next("target_share") * _next("team_targets")).clip(min=0)
+    proj_carries = (_next("carry_share") * _next("team_carries")).clip(min=0)
+    # Yardage/TD simple rates: yards per target / carry, TD per target / carry (with priors)
+    out = df.assign(
+        proj_targets=proj_targets,
+        proj_carries=proj_carries,
+        proj_rec_yards=proj_targets * _rate("rec_yards", "targets", 7.5),
+        proj_rush_yards=proj_carries * _rate("rush_yards", "rush_att", 4.2),
+        proj_rec_td=proj_targets * _rate("rec_td", "targets", 0.04),
+        proj_rush_td=proj_carries * _rate("rush_td", "rush_att", 0.03),
+    )
 
     # Latest row per player-season is our current projection snapshot
-    latest = out.sort_values(["player_id","season","week"]).groupby(["player_id","season"]).tail(1)
+    latest = out.sort_values(["player_id","season","week"]).groupby(["player_id","season"], observed=True).tail(1)
 
     ART_DIR.mkdir(parents=True, exist_ok=True)
     PROC_DIR.mkdir(parents=True, exist_ok=True)
@@ -125,6 +121,6 @@ def build_player_stat_projections() -> str:
     latest[latest_cols].to_csv(ART_DIR / "player_stat_projections.csv", index=False)
 
     # Keep full per-game frame too (optional for analysis)
-    out.to_parquet(PROC_DIR / "player_stat_projections_pergame.parquet", index=False)
+    enforce(out).to_parquet(PROC_DIR / "player_stat_projections_pergame.parquet", index=False)
 
     return str(ART_DIR / "player_stat_projections.csv")
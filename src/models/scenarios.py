@@ -0,0 +1,137 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
+
+# What-if store for season simulations. Each game's simulated results are one
+# bitset over sims (bit s = home team won sim s), stored games x words as
+# uint64 and memory-mapped. Per-team results are bitsets too: made playoffs,
+# won division, top seed, and standings points (2 per win, 1 per tie) as bit
+# planes. A scenario ("BUF beat KC and MIA lost in week 12") is an AND of game
+# rows (or their complements); every conditional figure is then a popcount of
+# that mask ANDed with a team row, so a query never unpacks a single sim.
+
+WIN_BITS = 6   # standings points (2 per win, 1 per tie) up to 63
+
+def scenario_dir(season: int) -> Path:
+    return ART_DIR / f"season_{season}_scenarios"
+
+def _to_words(bits: np.ndarray) -> np.ndarray:
+    # (rows x sims) 0/1 -> (rows x words) uint64, sim s in bit s % 64 of word s // 64
+    pad = (-bits.shape[1]) % 64
+    packed = np.packbits(np.pad(bits.astype(np.uint8), ((0, 0), (0, pad))), axis=1, bitorder="little")
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+_POP16 = np.unpackbits(np.arange(1 << 16, dtype=">u2").view(np.uint8)).reshape(-1, 16).sum(axis=1).astype(np.uint8)
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a (..., words) uint64 array."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return np.take(_POP16, np.ascontiguousarray(words).view(np.uint16)).sum(axis=-1, dtype=np.int64)
+
+def write_store(path: Path, state, games: pd.DataFrame, teams: list[str], block: int = 1 << 16) -> Path:
+    """
+    Write the store for a SimState (sim_engine). `games` has game_id, week,
+    home_team, away_team in the state's game order. The store is built in a
+    sibling directory and swapped in, so readers that still have the old files
+    memory-mapped keep a consistent (old) view.
+    """
+    sims, ngames, nteams = state.sims, len(games), len(teams)
+    words = -(-sims // 64)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    game_bits = np.lib.format.open_memmap(tmp / "games.npy", mode="w+", dtype=np.uint64, shape=(ngames, words))
+    # team rows: playoffs, division title, top seed, then the points bit planes
+    team_bits = np.lib.format.open_memmap(tmp / "teams.npy", mode="w+", dtype=np.uint64,
+                                          shape=(3 + WIN_BITS, nteams, words))
+    for a in range(0, sims, block):   # block is a multiple of 64, so blocks fill whole words
+        b = min(a + block, sims)
+        w0, w1 = a // 64, -(-b // 64)
+        rows = np.unpackbits(state.outcomes[a:b], axis=1, count=ngames)
+        game_bits[:, w0:w1] = _to_words(rows.T)
+        seeds, points = state.seeds[a:b].T, state.points[a:b].T.astype(np.int64)
+        team_bits[0, :, w0:w1] = _to_words(seeds > 0)
+        team_bits[1, :, w0:w1] = _to_words((seeds > 0) & (seeds <= 4))
+        team_bits[2, :, w0:w1] = _to_words(seeds == 1)
+        for k in range(WIN_BITS):
+            team_bits[3 + k, :, w0:w1] = _to_words((points >> k) & 1)
+    game_bits.flush(); team_bits.flush()
+    del game_bits, team_bits
+    meta = {"sims": sims, "teams": list(teams), "games": games[["game_id","week","home_team","away_team"]].to_dict("list"),
+            "locked": state.locked.astype(bool).tolist(), "points_per_win": 2, "run_id": f"{os.getpid()}-{time.time_ns()}"}
+    (tmp / "meta.json").write_text(json.dumps(meta, default=int))
+    # a directory can't be os.replace'd over a non-empty one: move the old store aside first
+    old = path.with_name(f"{path.name}.old-{os.getpid()}")
+    if path.exists():
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)   # open memmaps keep their (unlinked) files
+    return path
+
+class ScenarioStore:
+    """Conditional odds from the stored sims: store.query({"2024_10_KC_BUF": "BUF", ...})."""
+    def __init__(self, path: Path):
+        meta = json.loads((path / "meta.json").read_text())
+        self.sims, self.teams, self.run_id = meta["sims"], meta["teams"], meta.get("run_id")
+        self.games = pd.DataFrame(meta["games"])
+        self.games["locked"] = meta["locked"]
+        self._row = {g: i for i, g in enumerate(self.games["game_id"])}
+        self.per_win = meta.get("points_per_win", 1)   # older stores hold plain win totals
+        self.game_bits = np.load(path / "games.npy", mmap_mode="r")
+        self.team_bits = np.load(path / "teams.npy", mmap_mode="r")
+        self.all = _to_words(np.ones((1, self.sims), dtype=bool))[0]   # valid sims (padding bits clear)
+
+    @classmethod
+    def open(cls, season: int) -> "ScenarioStore":
+        p = scenario_dir(season)
+        if not (p / "meta.json").exists():
+            raise FileNotFoundError(f"No scenario store for {season}; run simulate_season first.")
+        return cls(p)
+
+    def find_game(self, team: str, week: int) -> str:
+        g = self.games[(self.games["week"] == week) & ((self.games["home_team"] == team) | (self.games["away_team"] == team))]
+        if g.empty:
+            raise KeyError(f"{team} has no game in week {week}")
+        return str(g["game_id"].iloc[0])
+
+    def mask(self, winners: dict) -> np.ndarray:
+        """Sims where every game_id in `winners` was won by the given team."""
+        m = self.all.copy()
+        for game_id, team in winners.items():
+            i = self._row[game_id]
+            g = self.games.iloc[i]
+            if team == g["home_team"]:
+                m &= self.game_bits[i]
+            elif team == g["away_team"]:
+                m &= ~self.game_bits[i]
+            else:
+                raise ValueError(f"{team} did not play in {game_id}")
+        return m
+
+    def query(self, winners: dict) -> pd.DataFrame:
+        """Per-team odds over the sims matching `winners` (all sims if empty)."""
+        m = self.mask(winners)
+        n = int(popcount(m))
+        counts = popcount(self.team_bits & m)    # (rows x teams)
+        wins = sum(counts[3 + k] << k for k in range(len(self.team_bits) - 3)) / self.per_win
+        d = max(n, 1)
+        out = pd.DataFrame({"team": self.teams, "playoff_odds": counts[0] / d, "div_odds": counts[1] / d,
+                            "top_seed_odds": counts[2] / d, "avg_wins": wins / d})
+        out.attrs["sims"], out.attrs["share"] = n, n / self.sims
+        return out
+
+    def compare(self, winners: dict) -> pd.DataFrame:
+        """Scenario vs baseline odds, with the change."""
+        base, cond = self.query({}), self.query(winners)
+        out = base.merge(cond, on="team", suffixes=("", "_if"))
+        out["playoff_delta"] = out["playoff_odds_if"] - out["playoff_odds"]
+        out.attrs.update(cond.attrs)
+        return out.sort_values("playoff_delta", ascending=False)
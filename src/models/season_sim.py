@@ -1,61 +1,32 @@
 from __future__ import annotations
+import argparse
 import os
 from pathlib import Path
 import numpy as np
 import pandas as pd
+from src.etl.catalog import read_table
+from src.models.scenarios import scenario_dir, write_store
+from src.models.batch_score import BatchScorer
+from src.models.sim_engine import (SIM_SEED, SIM_STRENGTH_SD, SIM_TARGET_SE, Schedule, SimState, Strength, game_key,
+                                   playoff_se, simulate, update)
+from src.utils.schema import ALIAS, norm_team, read_parquet  # noqa: F401  (re-exported)
 
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
 
-# Minimal alias map to normalize legacy/short codes
-ALIAS = {
-    # relocations / old codes
-    "OAK": "LV", "SD": "LAC", "STL": "LAR", "WSH": "WAS",
-    # short "LA" (some sources use this; map to Rams by default for NFC schedules)
-    "LA": "LAR",
-    # rare alternates
-    "JAX": "JAX",  # keep as-is if appears
-}
-
-def norm_team(t: str) -> str:
-    if not isinstance(t, str): return t
-    t = t.strip().upper()
-    return ALIAS.get(t, t)
-
 def _load_game_model_table() -> pd.DataFrame:
     p = PROC_DIR / "game_model_table.parquet"
     if not p.exists():
         raise FileNotFoundError("game_model_table.parquet not found; run enrich step first.")
-    df = pd.read_parquet(p)
+    df = read_parquet(p)
 
     # --- ensure we have home_win_prob ---
     if "home_win_prob" not in df.columns:
-        # Try to score with the trained model if present
-        try:
-            import joblib
-            model_path = ART_DIR / "game_win_extended.joblib"
-            if model_path.exists():
-                clf = joblib.load(model_path)
-                # minimal feature set used in training (adjust if you customized)
-                feat_cols = [c for c in df.columns if c.startswith(("off_", "def_", "net_", "rest_", "travel_", "is_dome", "is_altitude", "is_neutral"))]
-                X = df[feat_cols].fillna(0.0)
-                proba = clf.predict_proba(X)[:, 1]  # P(home win)
-                df["home_win_prob"] = proba.clip(0.001, 0.999)
-            else:
-                # Fallback proxy from net_diff if model not found
-                import numpy as np
-                def sigmoid(x): return 1/(1+np.exp(-x))
-                k = 0.9  # slope guess
-                base = df.get("net_diff", pd.Series(0, index=df.index)).fillna(0)
-                hfa  = 0.25  # modest home field bump already baked into features usually
-                df["home_win_prob"] = sigmoid(k * base + hfa).clip(0.001, 0.999)
-        except Exception as e:
-            # Last-ditch fallback: purely from net_diff
-            import numpy as np
-            def sigmoid(x): return 1/(1+np.exp(-x))
-            base = df.get("net_diff", pd.Series(0, index=df.index)).fillna(0)
-            df["home_win_prob"] = sigmoid(0.9 * base + 0.25).clip(0.001, 0.999)
+        # score with the extended model's own feature list (net_diff proxy if untrained)
+        scorer = _game_scorer()
+        X = df.reindex(columns=scorer.features).fillna(0.0).to_numpy(float)
+        df["home_win_prob"] = scorer.predict(X).clip(0.001, 0.999)
 
     # Normalize team codes
     for col in ["home_team", "away_team"]:
@@ -95,10 +66,57 @@ def _load_team_meta() -> pd.DataFrame:
         ]]
         return pd.DataFrame(data, columns=["team","conf","div"])
 
-def simulate_season(season: int, sims: int = 5000, use_extended: bool = True) -> str:
+def _game_scorer() -> BatchScorer:
+    """The extended game model as a batch scorer (net_diff proxy if it isn't trained or can't be read)."""
+    scorer_path = ART_DIR / "game_win_extended_scorer.json"
+    if scorer_path.exists():
+        return BatchScorer.load(scorer_path)
+    # model trained before the scorer export
+    model_path, feat_path = ART_DIR / "game_win_extended.joblib", ART_DIR / "game_win_extended_features.json"
+    if model_path.exists() and feat_path.exists():
+        try:
+            import joblib
+            return BatchScorer.from_model(joblib.load(model_path), pd.read_json(feat_path, typ="series").tolist())
+        except Exception as e:
+            print(f"[sim] can't batch-score {model_path.name} ({e}); using the net_diff proxy")
+    return BatchScorer.fallback()
+
+def _final_results(season: int, gmt: pd.DataFrame) -> np.ndarray:
+    """1.0 / 0.0 / 0.5 for completed games (home won / lost / tie), NaN otherwise; scores from the latest raw schedules."""
+    sched = read_table("schedules", seasons=[season], columns=["game_id","home_score","away_score"])
+    scores = sched.set_index("game_id") if len(sched) else gmt.set_index("game_id")[["home_score","away_score"]]
+    scores = scores[~scores.index.duplicated(keep="last")].reindex(gmt["game_id"])
+    h, a = scores["home_score"].to_numpy(float), scores["away_score"].to_numpy(float)
+    final = np.where(np.isnan(h) | np.isnan(a), np.nan, (h > a) + 0.5 * (h == a))
+    ties = gmt["game_id"].to_numpy()[final == 0.5]
+    if len(ties):
+        # locked as half a win each; unplayed games are never simulated as ties
+        print(f"[sim] {season}: {len(ties)} tied final(s) locked as half a win each: {', '.join(ties)}")
+    return final
+
+def simulate_season(season: int, sims: int = 5000, use_extended: bool = True,
+                    seed: int = SIM_SEED, workers: int | None = None, incremental: bool = False,
+                    scenarios: bool = True, strength_sd: float = SIM_STRENGTH_SD, antithetic: bool = False,
+                    target_se: float | None = SIM_TARGET_SE) -> str:
     """
     Monte Carlo over a season using our calibrated game win probs.
-    Writes season summary CSV (avg wins, playoff-ish odds proxy).
+    Completed games are locked to their results; only the rest are simulated.
+    Writes season summary CSV (avg wins, playoff/division odds and the seed
+    distribution) and the per-team win-total distribution. Runs on the batched
+    engine (sim_engine), so 1M sims are fine.
+
+    `incremental` keeps every sim's outcomes in season_<YEAR>_sim_state.npz;
+    the next run redraws only games whose result or probability changed and
+    re-seeds only the sims they flip (same output as a full run).
+    `scenarios` writes the what-if store (src.models.scenarios) next to the summary.
+    `strength_sd` > 0 turns on correlated sims: each sim shocks every team's
+    offense and defense rating by N(0, strength_sd) EPA/play and re-scores the
+    remaining games through the game model (sim_engine.Strength).
+    `antithetic` mirrors half of every chunk; `target_se` makes `sims` a cap and
+    stops once every team's playoff-odds SE is below it. Draws are keyed by
+    seed, so two runs with the same seed share random numbers and their
+    difference is mostly the change itself. The summary reports playoff_se and a
+    95% interval (playoff_lo/playoff_hi).
     """
     gmt = _load_game_model_table()
     gmt = gmt[gmt["season"] == season].copy()
@@ -122,51 +140,103 @@ def simulate_season(season: int, sims: int = 5000, use_extended: bool = True) ->
     # Build index maps
     idx = {t:i for i,t in enumerate(teams)}
     confs = np.array([conf_map[t] for t in teams], dtype=object)
+    divs = np.array([f"{conf_map[t]} {div_map[t]}" for t in teams], dtype=object)
 
     # Prepare schedule arrays
-    games = gmt[["home_team","away_team",pcol]].copy()
+    games = gmt[["game_id","home_team","away_team",pcol]].copy()
     games["home_team"] = games["home_team"].map(norm_team)
     games["away_team"] = games["away_team"].map(norm_team)
 
-    h = games["home_team"].map(idx).to_numpy()
-    a = games["away_team"].map(idx).to_numpy()
-    p_home = games[pcol].to_numpy().clip(0.001, 0.999)
-
-    rng = np.random.default_rng(42)
-    nteams = len(teams)
-    wins = np.zeros((sims, nteams), dtype=np.int16)
-
-    for s in range(sims):
-        r = rng.random(len(games))
-        home_wins = (r < p_home).astype(np.int8)
-        away_wins = 1 - home_wins
-        w = np.zeros(nteams, dtype=np.int16)
-        # accumulate
-        np.add.at(w, h, home_wins)
-        np.add.at(w, a, away_wins)
-        wins[s] = w
-
-    avg_wins = wins.mean(axis=0)
-    # crude playoff odds proxy: top 7 by conf in each sim
-    playoff = np.zeros((sims, nteams), dtype=np.int8)
-    for s in range(sims):
-        w = wins[s]
-        for conf in ["AFC","NFC"]:
-            mask = (confs == conf)
-            idxs = np.where(mask)[0]
-            # top 7 win counts in that conf
-            top7 = idxs[np.argsort(w[idxs])[-7:]]
-            playoff[s, top7] = 1
-
-    playoff_odds = playoff.mean(axis=0)
+    final = _final_results(season, gmt)
+    locked = ~np.isnan(final)
+    strength = None
+    if strength_sd > 0:
+        scorer = _game_scorer()
+        X = gmt.reindex(columns=scorer.features).fillna(0.0).to_numpy(float)
+        strength = Strength(sd=float(strength_sd), scorer=scorer, X=X)
+        # unshocked probabilities from the same scorer, so shocks are centred on them
+        games[pcol] = scorer.predict(X)
+        print(f"[sim] correlated mode: team strength sd {strength_sd:g}, {len(scorer.folds)} model fold(s)")
+    sched = Schedule(home=games["home_team"].map(idx).to_numpy(),
+                     away=games["away_team"].map(idx).to_numpy(),
+                     p_home=np.where(locked, final, games[pcol].to_numpy().clip(0.001, 0.999)).astype(np.float32),
+                     conf=np.unique(confs, return_inverse=True)[1],
+                     div=np.unique(divs, return_inverse=True)[1], nteams=len(teams),
+                     keys=np.array([game_key(g) for g in games["game_id"]], dtype=np.int64), locked=locked,
+                     strength=strength, antithetic=antithetic)
+    print(f"[sim] {season}: {int(locked.sum())} completed game(s) locked, {int((~locked).sum())} to simulate")
+
+    if incremental:
+        state_path = ART_DIR / f"season_{season}_sim_state.npz"
+        state = SimState.load(state_path)
+        # an adaptive run keeps whatever sample size it stopped at
+        fits = state is not None and state.seed == seed and (state.sims <= sims if target_se else state.sims == sims)
+        res = update(state, sched) if fits else None
+        if res is None:
+            agg, state = simulate(sched, sims, seed=seed, workers=workers, keep=True, target_se=target_se)
+        else:
+            agg, stats = res
+            print(f"[sim] incremental: redrew {stats['games_redrawn']} game(s), re-seeded {stats['sims_reseeded']:,} of {state.sims:,} sims")
+        state.save(state_path)
+    elif scenarios:
+        agg, state = simulate(sched, sims, seed=seed, workers=workers, keep=True, target_se=target_se)
+    else:
+        agg = simulate(sched, sims, seed=seed, workers=workers, target_se=target_se)
+    if scenarios:
+        write_store(scenario_dir(season), state, games.assign(week=gmt["week"].to_numpy()), teams)
+
+    avg_wins = agg["wins_sum"] / agg["sims"]
+    wins_sd = np.sqrt(np.maximum(agg["wins_sq"] / agg["sims"] - avg_wins ** 2, 0))
+    # seeds from division titles + NFL tiebreakers (see src.models.seeding)
+    seed_probs = agg["seeds"] / agg["sims"]
+    playoff_odds, se = agg["playoffs"] / agg["sims"], playoff_se(agg)
 
     out = pd.DataFrame({
         "team": teams,
+        "conf": confs,
+        "div": divs,
         "avg_wins": avg_wins,
+        "wins_sd": wins_sd,
         "playoff_odds": playoff_odds,
+        "playoff_se": se,
+        "playoff_lo": np.clip(playoff_odds - 1.96 * se, 0, 1),
+        "playoff_hi": np.clip(playoff_odds + 1.96 * se, 0, 1),
+        "div_odds": seed_probs[:, 1:5].sum(axis=1),
+        "top_seed_odds": seed_probs[:, 1],
+        **{f"seed_{k}": seed_probs[:, k] for k in range(1, seed_probs.shape[1])},
     }).sort_values("avg_wins", ascending=False)
 
+    hist = agg["win_hist"] / agg["sims"]
+    dist = pd.DataFrame({"team": np.repeat(teams, hist.shape[1]),
+                         "wins": np.tile(np.arange(hist.shape[1]) / 2, len(teams)),   # bins are half wins
+                         "prob": hist.ravel()})
+
     ART_DIR.mkdir(parents=True, exist_ok=True)
+    dist = dist[dist["prob"] > 0]
+    if (dist["wins"] % 1 == 0).all():   # no ties: keep whole win totals
+        dist = dist.astype({"wins": int})
+    dist.to_csv(ART_DIR / f"season_{season}_win_dist.csv", index=False)
     out_path = ART_DIR / f"season_{season}_sim_summary.csv"
     out.to_csv(out_path, index=False)
     return str(out_path)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--season", type=int, required=True)
+    ap.add_argument("--sims", type=int, default=5000, help="sims to run (the cap with --target-se)")
+    ap.add_argument("--seed", type=int, default=SIM_SEED)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--incremental", action="store_true", help="reuse cached sims; redraw only games that changed")
+    ap.add_argument("--no-scenarios", action="store_true", help="skip the what-if store (saves memory on huge runs)")
+    ap.add_argument("--strength-sd", type=float, default=SIM_STRENGTH_SD,
+                    help="per-sim team rating shock SD in EPA/play (0 = independent games)")
+    ap.add_argument("--antithetic", action="store_true", help="mirror half of each chunk (1 - u) to cut variance")
+    ap.add_argument("--target-se", type=float, default=SIM_TARGET_SE,
+                    help="stop once every team's playoff-odds standard error is below this")
+    args = ap.parse_args()
+    print(simulate_season(args.season, sims=args.sims, seed=args.seed, workers=args.workers,
+                          incremental=args.incremental, scenarios=not args.no_scenarios,
+                          strength_sd=args.strength_sd, antithetic=args.antithetic, target_se=args.target_se))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+
+# Playoff seeding with NFL tiebreakers, for every simulated season at once.
+# Everything is derived from per-sim game outcomes (sims x games): results are
+# collapsed to wins per meeting team pair (one matmul), each tiebreaker is a sum
+# over pairs credited back to teams (another matmul), and the cascade is packed
+# into int64 sort keys so ranking is one lexsort along the team axis.
+# No per-sim Python loops.
+#
+# Cascade (most significant first):
+#   division:   wins, head-to-head among tied, division record, conference
+#               record, strength of victory, strength of schedule, coin toss
+#   seeding:    division winners first (seeds 1-4), then wins; wild cards only
+#               compare the top tied club of each division; head-to-head among
+#               tied (only if every tied club met every other), conference
+#               record, strength of victory, strength of schedule, coin toss
+# Approximations (vs the official procedure): a step that separates one club
+# does not restart the cascade for the rest; common games and the points-based
+# steps are skipped (sims have no scores). Ties (draws) only come from completed
+# games, which are locked as half a win for each side (home_won = 0.5); standings
+# are in points, 2 per win and 1 per tie, which orders clubs like win pct.
+
+PLAYOFF_TEAMS = 7   # per conference
+
+@dataclass
+class League:
+    conf: np.ndarray         # conference id per team
+    div: np.ndarray          # division id per team (unique across conferences)
+    i: np.ndarray            # team pairs that meet (i < j)
+    j: np.ndarray
+    pair_games: np.ndarray   # games between i and j
+    layers: list             # (games, pairs, sign): k-th meeting of each pair that has one
+    base: np.ndarray         # i's pair wins = base + sum over layers of sign * home_won[games]
+    e_i: np.ndarray          # pairs x teams incidence of i / j
+    e_j: np.ndarray
+    opp: np.ndarray          # teams x teams: games played against each other
+    games: np.ndarray        # games per team
+    same_div: np.ndarray     # per pair
+    same_conf: np.ndarray
+    div_games: np.ndarray    # per team
+    conf_games: np.ndarray
+
+def league(home: np.ndarray, away: np.ndarray, conf: np.ndarray, div: np.ndarray) -> League:
+    nteams = len(conf)
+    conf, div = np.asarray(conf), np.asarray(div)
+    lo, hi = np.minimum(home, away), np.maximum(home, away)
+    pair_id, pair_of_game = np.unique(lo * nteams + hi, return_inverse=True)
+    i, j = pair_id // nteams, pair_id % nteams
+    # i wins at home when home wins; away when home loses
+    i_home = home == lo
+    sign = np.where(i_home, 1, -1).astype(np.float32)
+    base = np.bincount(pair_of_game[~i_home], minlength=len(pair_id)).astype(np.float32)
+    by_pair = np.argsort(pair_of_game, kind="stable")
+    meeting = np.empty(len(home), dtype=np.int64)
+    meeting[by_pair] = np.arange(len(home)) - np.searchsorted(pair_of_game[by_pair], pair_of_game[by_pair])
+    layers = [(np.flatnonzero(meeting == k), pair_of_game[meeting == k], sign[meeting == k])
+              for k in range(int(meeting.max()) + 1)]
+    e_i = np.zeros((len(pair_id), nteams), dtype=np.float32); e_i[np.arange(len(pair_id)), i] = 1
+    e_j = np.zeros((len(pair_id), nteams), dtype=np.float32); e_j[np.arange(len(pair_id)), j] = 1
+    opp = np.zeros((nteams, nteams), dtype=np.float32)
+    np.add.at(opp, (home, away), 1); np.add.at(opp, (away, home), 1)
+    pair_games = np.bincount(pair_of_game).astype(np.float32)
+    same_div = (div[i] == div[j]).astype(np.float32)
+    same_conf = (conf[i] == conf[j]).astype(np.float32)
+    return League(conf=conf, div=div, i=i, j=j, pair_games=pair_games, layers=layers, base=base,
+                  e_i=e_i, e_j=e_j, opp=opp, games=opp.sum(axis=1), same_div=same_div, same_conf=same_conf,
+                  div_games=(pair_games * same_div) @ (e_i + e_j), conf_games=(pair_games * same_conf) @ (e_i + e_j))
+
+def _by_team(lg: League, for_i: np.ndarray, for_j: np.ndarray) -> np.ndarray:
+    # per-pair quantities credited to team i and team j -> sims x teams
+    return for_i @ lg.e_i + for_j @ lg.e_j
+
+def _pct(w: np.ndarray, g: np.ndarray) -> np.ndarray:
+    return np.divide(w, g, out=np.full(np.broadcast(w, g).shape, 0.5, dtype=np.float32), where=g > 0)
+
+def _quantize(pct: np.ndarray, max_den: float) -> tuple[np.ndarray, int]:
+    # order-preserving integer code: fractions with denominators <= max_den differ by >= 1/max_den^2
+    q = int(2 * max_den * max_den)
+    return np.floor(pct * q).astype(np.int64), q.bit_length()
+
+def _pack(fields: list[tuple[np.ndarray, int]]) -> list[np.ndarray]:
+    """Fields (values, bits), most significant first, into as few int64 keys as fit (ascending = better)."""
+    keys, key, used = [], None, 0
+    for v, bits in fields:
+        assert bits <= 63, "sort key overflow"
+        if key is None or used + bits > 63:
+            if key is not None:
+                keys.append(key)
+            key, used = np.zeros(v.shape, dtype=np.int64), 0
+        key, used = (key << bits) | v, used + bits
+    return keys + [key]
+
+def _order(fields: list[tuple[np.ndarray, int]]) -> np.ndarray:
+    return np.lexsort(_pack(fields)[::-1], axis=-1)   # lexsort: last key is primary
+
+def _desc(v: np.ndarray, bits: int) -> tuple[np.ndarray, int]:
+    return (1 << bits) - 1 - v, bits
+
+def _tie_count(key: np.ndarray) -> np.ndarray:
+    """Number of teams in the same sim sharing each team's `key`."""
+    order = np.argsort(key, axis=1)
+    s = np.take_along_axis(key, order, axis=1)
+    k = np.arange(key.shape[1])
+    new = np.ones(s.shape, dtype=bool); new[:, 1:] = s[:, 1:] != s[:, :-1]
+    end = np.ones(s.shape, dtype=bool); end[:, :-1] = new[:, 1:]
+    first = np.maximum.accumulate(np.where(new, k, 0), axis=1)
+    last = np.minimum.accumulate(np.where(end, k, len(k))[:, ::-1], axis=1)[:, ::-1]
+    out = np.empty_like(order)
+    np.put_along_axis(out, order, last - first + 1, axis=1)
+    return out
+
+def _tie_runs(order: np.ndarray, key: np.ndarray) -> np.ndarray:
+    """For a sort order in which equal `key`s are adjacent, each team's position within its run (0 = first)."""
+    s = np.take_along_axis(key, order, axis=1)
+    k = np.arange(key.shape[1])
+    new = np.ones(s.shape, dtype=bool); new[:, 1:] = s[:, 1:] != s[:, :-1]
+    out = np.empty_like(order)
+    np.put_along_axis(out, order, k - np.maximum.accumulate(np.where(new, k, 0), axis=1), axis=1)
+    return out
+
+def _h2h(lg: League, pw: np.ndarray, key: np.ndarray, require_all: bool) -> np.ndarray:
+    """
+    Win pct in games among clubs tied on `key` (sims x teams); 0.5 (neutral)
+    if they never met, or with `require_all` unless every tied club met every other.
+    """
+    t = (np.take(key, lg.i, axis=1) == np.take(key, lg.j, axis=1)).astype(np.float32)
+    g = lg.pair_games * t
+    pct = _pct(_by_team(lg, pw * t, g - pw * t), _by_team(lg, g, g))
+    if require_all:
+        pct = np.where(_by_team(lg, t, t) == _tie_count(key) - 1, pct, 0.5)
+    return pct
+
+def _rank_within(order: np.ndarray, group: np.ndarray) -> np.ndarray:
+    """Rank of each team within its group, given a sort order whose primary key is `group`."""
+    sizes = np.bincount(group)
+    start = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    k = np.arange(order.shape[1])
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, k - start[group[order]], axis=1)
+    return rank
+
+def seed(lg: League, home_won: np.ndarray, points: np.ndarray, coin: np.ndarray) -> np.ndarray:
+    """
+    (sims x teams) playoff seed, 1..PLAYOFF_TEAMS, 0 = out. `points` are
+    standings points (2 per win, 1 per tie). Division winners hold seeds 1-4.
+    `coin` (sims x teams ints in [0, 2**30)) settles what the tiebreakers
+    don't; lower wins.
+    """
+    n, nteams = points.shape
+    pw = np.broadcast_to(lg.base, (n, len(lg.base))).copy()   # pair wins of i, sims x pairs
+    for games, pairs, sign in lg.layers:
+        pw[:, pairs] += np.take(home_won, games, axis=1) * sign
+    pl = lg.pair_games - pw                               # ... of j
+    w = points.astype(np.float32) / 2
+    wi = points.astype(np.int64)
+    max_games = float(lg.games.max())
+    # a tie puts halves into every record: denominators double
+    den = max_games * (2 if (home_won % 1).any() else 1)
+
+    div_pct = _pct(_by_team(lg, pw * lg.same_div, pl * lg.same_div), lg.div_games)
+    conf_pct = _pct(_by_team(lg, pw * lg.same_conf, pl * lg.same_conf), lg.conf_games)
+    # SOV: combined record of beaten opponents; SOS: of all opponents
+    sov = _pct(_by_team(lg, pw * np.take(w, lg.j, axis=1), pl * np.take(w, lg.i, axis=1)),
+               _by_team(lg, pw * lg.games[lg.j], pl * lg.games[lg.i]))
+    sos = _pct(w @ lg.opp.T, lg.opp @ lg.games)
+    wins_f = _desc(wi, int(2 * max_games).bit_length())
+    div_f, conf_f = _quantize(div_pct, den), _quantize(conf_pct, den)
+    sov_f, sos_f = _quantize(sov, den ** 2), _quantize(sos, den ** 2)
+    tail = [_desc(*sos_f), (coin.astype(np.int64), 30)]   # sos, coin toss
+
+    # division ranks
+    group = np.broadcast_to(lg.div, (n, nteams))
+    h2h = _quantize(_h2h(lg, pw, group * 64 + wi, require_all=False), den)
+    order = _order([(group, int(lg.div.max()).bit_length()), wins_f, _desc(*h2h), _desc(*div_f),
+                    _desc(*conf_f), _desc(*sov_f), *tail])
+    div_rank = _rank_within(order, lg.div)
+    winner = div_rank == 0
+    # wild-card step 1: only the top tied club of each division is compared
+    tier = _tie_runs(order, group * 64 + wi)
+
+    # conference seeding
+    group = np.broadcast_to(lg.conf, (n, nteams))
+    h2h = _quantize(_h2h(lg, pw, ((group * 2 + winner) * 64 + tier) * 64 + wi, require_all=True), den)
+    rank = _rank_within(_order([(group, int(lg.conf.max()).bit_length()), (~winner, 1), wins_f, (tier, 6), _desc(*h2h),
+                                _desc(*conf_f), _desc(*sov_f), *tail]), lg.conf)
+    return np.where(rank < PLAYOFF_TEAMS, rank + 1, 0).astype(np.int8)
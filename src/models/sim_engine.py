@@ -0,0 +1,306 @@
+from __future__ import annotations
+import contextlib
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+import numpy as np
+from src.models.batch_score import BatchScorer
+from src.models.seeding import PLAYOFF_TEAMS, league, seed as seed_sims
+
+# Batched Monte Carlo engine for season simulations. Outcomes are drawn as
+# (chunk x games) blocks; team standings points (2 per win, 1 per tie) are one
+# matrix product per block and every
+# sim in a block is seeded at once (src.models.seeding: division winners and
+# tiebreakers). Each game's column in each chunk comes from its own stream,
+# keyed by (seed, chunk, game key), so a game's draws never depend on the other
+# games, the number of workers or the order anything runs in. Completed games
+# are locked to their result and not drawn at all; a tied final is locked at 0.5
+# (half a win each), the only way a sim ever contains a tie.
+#
+# Games are independent given their probabilities unless the schedule carries a
+# Strength: then every sim also draws offense/defense rating shocks per team
+# (from its own keyed stream), shifts each game's net/off/def diffs by them and
+# re-scores all (sims x games) through the model in one batch. A team that runs
+# hot in a sim runs hot all season, which widens the win-total spread.
+#
+# Variance reduction: the keyed streams already give common random numbers
+# (same seed -> same uniforms per game, so a before/after comparison differs
+# only where probabilities moved). With `antithetic`, the second half of every
+# chunk mirrors the first (1 - u, -shock); standard errors then treat each
+# mirrored pair as one unit. simulate(target_se=...) stops between waves of
+# chunks once every team's playoff-odds standard error is below the target.
+#
+# Two modes:
+#   simulate()         streams chunk aggregates; memory bounded by one block
+#   simulate(keep=True) also returns a SimState with every sim's outcomes
+#                      (bit-packed), points and seeds; update() then redraws only
+#                      the games whose result or probability changed and
+#                      re-seeds only the sims whose outcomes flipped
+
+SIM_CHUNK = int(os.getenv("SIM_CHUNK", "20000"))
+SIM_WORKERS = int(os.getenv("SIM_WORKERS", str(min(4, os.cpu_count() or 1))))
+SIM_SEED = int(os.getenv("SIM_SEED", "42"))
+SIM_STRENGTH_SD = float(os.getenv("SIM_STRENGTH_SD", "0"))   # > 0 turns on correlated mode
+SIM_TARGET_SE = float(os.getenv("SIM_TARGET_SE", "0")) or None  # adaptive stopping on playoff-odds SE
+COIN_KEY = 0       # stream key for tiebreak coin tosses
+STRENGTH_KEY = 1   # ... for team strength shocks; game keys are >= 2
+
+def game_key(game_id: str) -> int:
+    """Stable 63-bit stream key for a game."""
+    return max(int.from_bytes(hashlib.sha256(str(game_id).encode()).digest()[:8], "little") >> 1, 2)
+
+@dataclass
+class Strength:
+    """Per-sim team strength shocks, re-scored through the game model."""
+    sd: float               # SD of each team's offense and defense rating shock (EPA/play)
+    scorer: BatchScorer
+    X: np.ndarray           # games x scorer.features, model inputs without shocks
+
+    def signature(self) -> np.ndarray:
+        # games x folds base scores: what the shocked probabilities depend on per game
+        return self.scorer.decision(self.X).T
+
+@dataclass
+class Schedule:
+    home: np.ndarray      # team index per game
+    away: np.ndarray
+    p_home: np.ndarray    # P(home win) per game; 1.0 / 0.0 / 0.5 (tie) for locked results
+    conf: np.ndarray      # conference id per team
+    div: np.ndarray       # division id per team (unique across conferences)
+    nteams: int
+    keys: np.ndarray | None = None     # stream key per game (default: position)
+    locked: np.ndarray | None = None   # completed games
+    strength: Strength | None = None   # correlated mode
+    antithetic: bool = False           # second half of each chunk mirrors the first
+
+    def __post_init__(self):
+        if self.keys is None:
+            self.keys = np.arange(2, len(self.home) + 2, dtype=np.int64)
+        if self.locked is None:
+            self.locked = np.zeros(len(self.home), dtype=bool)
+
+    @property
+    def max_games(self) -> int:
+        return int(np.bincount(np.concatenate([self.home, self.away]), minlength=self.nteams).max())
+
+def _design(sched: Schedule) -> tuple[np.ndarray, np.ndarray]:
+    # wins = home_won @ (H - A) + away games per team, with H/A the game x team one-hots
+    d = np.zeros((len(sched.home), sched.nteams), dtype=np.float32)
+    np.add.at(d, (np.arange(len(sched.home)), sched.home), 1)
+    np.add.at(d, (np.arange(len(sched.away)), sched.away), -1)
+    return d, np.bincount(sched.away, minlength=sched.nteams).astype(np.float32)
+
+def _bounds(sims: int, chunk: int) -> list[tuple[int, int]]:
+    return [(a, min(a + chunk, sims)) for a in range(0, sims, chunk)]
+
+def _mirrored(draw, n: int, antithetic: bool, mirror) -> np.ndarray:
+    # n draws along axis 0; with `antithetic` rows h.. mirror rows 0.. (h = ceil(n / 2))
+    if not antithetic:
+        return draw(n)
+    half = draw((n + 1) // 2)
+    return np.concatenate([half, mirror(half)])[:n]
+
+def strength_probs(sched: Schedule, n: int, seed: int, chunk: int, cols) -> np.ndarray:
+    """(n x cols) P(home win) under each sim's team strength shocks."""
+    st = sched.strength
+    rng = np.random.default_rng([seed, chunk, STRENGTH_KEY])
+    off, dfn = st.sd * _mirrored(lambda k: rng.standard_normal((k, 2, sched.nteams)), n,
+                                 sched.antithetic, np.negative).transpose(1, 0, 2)
+    inc = _design(sched)[0][cols].T.astype(np.float64)     # teams x cols: +1 home, -1 away
+    w_net, w_off, w_def = (st.scorer.weights(f) for f in ("net_diff", "off_diff", "def_diff"))
+    base = st.scorer.decision(st.X[cols])
+    p = np.zeros((n, len(cols)))
+    for k, fold in enumerate(st.scorer.folds):
+        # net = off - def, so a team's shocks move its score by this much per fold
+        shift = (w_net[k] + w_off[k]) * off + (w_def[k] - w_net[k]) * dfn
+        p += fold.calibrate(base[k] + shift @ inc)
+    return np.clip(p / len(st.scorer.folds), 0.001, 0.999)
+
+def draw_outcomes(sched: Schedule, n: int, seed: int, chunk: int, cols=None) -> np.ndarray:
+    """(n x cols) 1.0 where the home team won, for the rows of chunk number `chunk` (all games by default)."""
+    cols = np.arange(len(sched.home)) if cols is None else np.asarray(cols)
+    out = np.empty((n, len(cols)), dtype=np.float32, order="F")
+    live = np.flatnonzero(~sched.locked[cols])
+    p = strength_probs(sched, n, seed, chunk, cols[live]) if sched.strength is not None and len(live) else None
+    for c, g in enumerate(cols):
+        if sched.locked[g]:
+            out[:, c] = sched.p_home[g]
+        else:
+            rng = np.random.default_rng([seed, chunk, int(sched.keys[g])])
+            u = _mirrored(lambda k: rng.random(k, dtype=np.float32), n, sched.antithetic, lambda h: 1 - h)
+            out[:, c] = u < (sched.p_home[g] if p is None else p[:, np.searchsorted(live, c)])
+    return out
+
+def coin_tosses(seed: int, chunk: int, n: int, nteams: int) -> np.ndarray:
+    return np.random.default_rng([seed, chunk, COIN_KEY]).integers(0, 1 << 30, (n, nteams))
+
+def points_from(home_won: np.ndarray, design) -> np.ndarray:
+    """(n x teams) standings points: 2 per win, 1 per tie."""
+    d, base = design
+    return (2 * (home_won @ d + base)).astype(np.int16)  # exact: small half-integers in float32
+
+def _season(sched: Schedule, home_won: np.ndarray, coin: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    points = points_from(home_won, _design(sched))
+    return points, seed_sims(league(sched.home, sched.away, sched.conf, sched.div), home_won, points, coin)
+
+def empty_aggregate(nteams: int, max_games: int) -> dict:
+    return {"sims": 0,
+            "wins_sum": np.zeros(nteams), "wins_sq": np.zeros(nteams),
+            "playoffs": np.zeros(nteams, dtype=np.int64),
+            "seeds": np.zeros((nteams, PLAYOFF_TEAMS + 1), dtype=np.int64),   # [:, 0] = missed
+            "win_hist": np.zeros((nteams, 2 * max_games + 1), dtype=np.int64),   # by points (half wins)
+            # per sampling unit (a sim, or a mirrored pair) u with S_u playoff trips in m_u sims:
+            "units": 0, "unit_sq": np.zeros(nteams), "unit_cross": np.zeros(nteams), "unit_m2": 0}
+
+def merge(agg: dict, other: dict) -> dict:
+    for k, v in other.items():
+        agg[k] = agg[k] + v
+    return agg
+
+def _counts(values: np.ndarray, k: int) -> np.ndarray:
+    # (sims x teams) small ints -> (teams x k) counts
+    cells = np.arange(values.shape[1]) * k + values.astype(np.int64)
+    return np.bincount(cells.ravel(), minlength=values.shape[1] * k).reshape(values.shape[1], k)
+
+def aggregate(points: np.ndarray, seeds: np.ndarray, max_games: int, antithetic: bool = False) -> dict:
+    """Totals for one chunk (rows in chunk layout, so mirrored pairs are rows i and i + ceil(n / 2))."""
+    agg = empty_aggregate(points.shape[1], max_games)
+    n = len(points)
+    w = points / 2
+    made = (seeds > 0).astype(np.float64)
+    paired = n // 2 if antithetic else 0
+    pair = made[:paired] + made[n - paired:]
+    agg.update(sims=n, wins_sum=w.sum(axis=0), wins_sq=(w * w).sum(axis=0), playoffs=(seeds > 0).sum(axis=0),
+               win_hist=_counts(points, 2 * max_games + 1), seeds=_counts(seeds, PLAYOFF_TEAMS + 1),
+               units=n - paired, unit_m2=n + 2 * paired,
+               unit_sq=(pair * pair).sum(axis=0) + made.sum(axis=0) - pair.sum(axis=0),
+               unit_cross=made.sum(axis=0) + pair.sum(axis=0))
+    return agg
+
+def playoff_se(agg: dict) -> np.ndarray:
+    """Standard error of each team's playoff odds (ratio estimator over sampling units)."""
+    n, units = agg["sims"], agg["units"]
+    p = agg["playoffs"] / n
+    ss = agg["unit_sq"] - 2 * p * agg["unit_cross"] + p * p * agg["unit_m2"]
+    return np.sqrt(np.maximum(ss, 0) * units / max(units - 1, 1)) / n
+
+def _run_chunk(sched: Schedule, n: int, seed: int, chunk: int, keep: bool = False):
+    home_won = draw_outcomes(sched, n, seed, chunk)
+    points, seeds = _season(sched, home_won, coin_tosses(seed, chunk, n, sched.nteams))
+    agg = aggregate(points, seeds, sched.max_games, sched.antithetic)
+    if not keep:
+        return agg
+    return agg, np.packbits(home_won.astype(np.uint8), axis=1), points.astype(np.int8), seeds
+
+@dataclass
+class SimState:
+    """Every sim's outcomes, for incremental updates. Rows follow the chunk layout of `chunk`."""
+    seed: int
+    chunk: int
+    keys: np.ndarray       # stream key per game
+    p_home: np.ndarray     # probabilities (or locked results) the outcomes were drawn with
+    locked: np.ndarray
+    antithetic: bool
+    strength_sd: float     # 0 = independent games
+    inputs: np.ndarray     # games x folds Strength.signature() (games x 0 when independent)
+    outcomes: np.ndarray   # sims x ceil(games / 8), packed home_won bits (a locked tie packs as 0)
+    points: np.ndarray     # sims x teams, int8 standings points
+    seeds: np.ndarray      # sims x teams, int8
+
+    @property
+    def sims(self) -> int:
+        return len(self.points)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, **{f.name: getattr(self, f.name) for f in fields(self)})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SimState | None":
+        if not path.exists():
+            return None
+        with np.load(path) as z:
+            if any(f.name not in z for f in fields(cls)):   # written by an older version
+                return None
+            return cls(**{f.name: z[f.name].item() if z[f.name].ndim == 0 else z[f.name] for f in fields(cls)})
+
+def simulate(sched: Schedule, sims: int, seed: int = SIM_SEED, chunk: int = SIM_CHUNK,
+             workers: int | None = None, keep: bool = False, target_se: float | None = None):
+    """
+    Aggregates over `sims` seasons: sims, wins_sum, wins_sq, playoffs (counts),
+    win_hist (team x points, i.e. half wins), seeds (team x seed). With `keep`, returns (agg, SimState).
+    With `target_se`, `sims` is a cap: chunks run in waves of `workers` and stop
+    once playoff_se() <= target_se for every team. Chunk c is the same draw either
+    way, so a stopped run equals a fixed run of the sims it completed.
+    """
+    bounds = _bounds(sims, chunk)
+    workers = SIM_WORKERS if workers is None else max(1, int(workers))
+    agg = empty_aggregate(sched.nteams, sched.max_games)
+    parallel = workers > 1 and len(bounds) > 1
+    wave = len(bounds) if target_se is None else workers
+    kept = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) if parallel else contextlib.nullcontext() as pool:
+        for w0 in range(0, len(bounds), wave):
+            part_bounds = bounds[w0:w0 + wave]
+            k = len(part_bounds)
+            args = ([sched] * k, [b - a for a, b in part_bounds], [seed] * k, range(w0, w0 + k), [keep] * k)
+            for part in (pool.map if parallel else map)(_run_chunk, *args):
+                if keep:
+                    part, *rows = part
+                    kept.append(rows)
+                merge(agg, part)
+            if target_se is not None and playoff_se(agg).max() <= target_se:
+                break
+    if target_se is not None:
+        print(f"[sim] {agg['sims']:,} sims (cap {sims:,}); max playoff-odds SE {playoff_se(agg).max():.4f} (target {target_se:g})")
+    if not keep:
+        return agg
+    outcomes, points, seeds = (np.concatenate(x) for x in zip(*kept))
+    sd, inputs = _inputs(sched)
+    return agg, SimState(seed=seed, chunk=chunk, keys=sched.keys.copy(), p_home=sched.p_home.copy(),
+                         locked=sched.locked.copy(), antithetic=sched.antithetic, strength_sd=sd, inputs=inputs,
+                         outcomes=outcomes, points=points, seeds=seeds)
+
+def _inputs(sched: Schedule) -> tuple[float, np.ndarray]:
+    if sched.strength is None:
+        return 0.0, np.zeros((len(sched.home), 0))
+    return float(sched.strength.sd), sched.strength.signature()
+
+def update(state: SimState, sched: Schedule) -> tuple[dict, dict] | None:
+    """
+    Bring `state` up to date with `sched` in place: redraw the games whose
+    probability or lock changed (from the same keyed streams, so the result is
+    identical to a full re-run) and re-seed the sims where any of them flipped.
+    Returns (aggregates, stats), or None if the state is for a different schedule.
+    """
+    if len(state.keys) != len(sched.keys) or not np.array_equal(state.keys, sched.keys):
+        return None
+    sd, inputs = _inputs(sched)
+    if sd != state.strength_sd or inputs.shape != state.inputs.shape or state.antithetic != sched.antithetic:
+        return None
+    changed = np.flatnonzero((state.p_home != sched.p_home) | (state.locked != sched.locked)
+                             | (state.inputs != inputs).any(axis=1))
+    flipped = 0
+    for c, (a, b) in enumerate(_bounds(state.sims, state.chunk) if len(changed) else []):
+        new = draw_outcomes(sched, b - a, state.seed, c, changed)
+        rows = np.unpackbits(state.outcomes[a:b], axis=1, count=len(sched.keys))
+        flip = np.flatnonzero((rows[:, changed] != new).any(axis=1))
+        if not len(flip):
+            continue
+        home_won = rows[flip].astype(np.float32)
+        home_won[:, sched.locked] = sched.p_home[sched.locked]   # the bits can't hold a tie's 0.5
+        home_won[:, changed] = new[flip]
+        points, seeds = _season(sched, home_won, coin_tosses(state.seed, c, b - a, sched.nteams)[flip])
+        state.outcomes[a + flip] = np.packbits(home_won.astype(np.uint8), axis=1)
+        state.points[a + flip], state.seeds[a + flip] = points, seeds
+        flipped += len(flip)
+    state.p_home, state.locked, state.inputs = sched.p_home.copy(), sched.locked.copy(), inputs
+    stats = {"games_redrawn": len(changed), "sims_reseeded": flipped}
+    agg = empty_aggregate(sched.nteams, sched.max_games)
+    for a, b in _bounds(state.sims, state.chunk):
+        merge(agg, aggregate(state.points[a:b], state.seeds[a:b], sched.max_games, state.antithetic))
+    return agg, stats
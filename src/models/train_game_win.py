@@ -7,6 +7,8 @@ from sklearn.metrics import brier_score_loss, log_loss
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.model_selection import TimeSeriesSplit
 import joblib
+from src.models.batch_score import BatchScorer
+from src.models.game_features import load_game_features
 
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
@@ -15,37 +17,17 @@ ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
 def _ensure_dirs():
     ART_DIR.mkdir(parents=True, exist_ok=True)
 
-def train_and_save():
+def train_and_save(rating: str | None = None):
     _ensure_dirs()
-    ratings = pd.read_parquet(PROC_DIR / "team_ratings.parquet")
-    sched_files = [p for p in RAW_DIR.glob("schedules_*.parquet")]
-    assert sched_files, "Missing schedules. Run ETL first."
-    schedules = pd.read_parquet(sched_files[0]) if len(sched_files)==1 else pd.concat([pd.read_parquet(p) for p in sched_files], ignore_index=True)
-
-    # Build a per-game table with pre-game ratings for home/away
-    # Merge ratings for each team in the game_id row
-    base = ratings[["season","week","game_id","team","off_epa_pp_roll","def_epa_pp_roll","net_epa_rating"]].copy()
-    # Home
-    home = schedules[["game_id","season","week","home_team","away_team","home_score","away_score"]].copy()
-    home = home.merge(base.rename(columns={"team":"home_team"}),
-                      on=["game_id","season","week","home_team"], how="left")
-    # Away
-    full = home.merge(base.rename(columns={"team":"away_team",
-                                           "off_epa_pp_roll":"away_off_roll",
-                                           "def_epa_pp_roll":"away_def_roll",
-                                           "net_epa_rating":"away_net"}),
-                      on=["game_id","season","week","away_team"], how="left")
-
-    # Features: differences (home - away)
-    full["net_diff"] = full["net_epa_rating"] - full["away_net"]
-    full["off_diff"] = full["off_epa_pp_roll"] - full["away_off_roll"]
-    full["def_diff"] = full["def_epa_pp_roll"] - full["away_def_roll"]
+    # Per-game table with pre-game ratings for home/away and their differences (home - away)
+    full = load_game_features(rating, context=False)  # rating: cube variant, e.g. "roll4", "ewm8", "std"
 
     # Label: home win
     full["home_win"] = (full["home_score"] > full["away_score"]).astype(int)
 
     # Drop rows with missing features (early season with insufficient history)
-    X = full[["net_diff","off_diff","def_diff"]].dropna()
+    features = ["net_diff","off_diff","def_diff"]
+    X = full[features].dropna()
     y = full.loc[X.index, "home_win"]
 
     if len(X) < 50:
@@ -65,5 +47,6 @@ def train_and_save():
     }
     # Save
     joblib.dump(calib, ART_DIR / "game_win_clf.joblib")
+    BatchScorer.from_model(calib, features).save(ART_DIR / "game_win_clf_scorer.json")   # sklearn-free copy
     pd.Series(metrics).to_json(ART_DIR / "game_win_metrics.json")
     return metrics
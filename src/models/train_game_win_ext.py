@@ -7,12 +7,14 @@ from sklearn.calibration import CalibratedClassifierCV
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import brier_score_loss, log_loss
 import joblib
+from src.models.batch_score import BatchScorer
+from src.utils.schema import read_parquet
 
 PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
 ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
 
 def train_and_save_extended():
-    df = pd.read_parquet(PROC_DIR / "game_model_table.parquet").copy()
+    df = read_parquet(PROC_DIR / "game_model_table.parquet").copy()
 
     # Select features (use what we have; betting columns may be NaN)
     feature_cols = ["net_diff","off_diff","def_diff","rest_diff","travel_diff_km","dome_any"]
@@ -42,6 +44,7 @@ def train_and_save_extended():
     # Save both the trained model and the feature list
     joblib.dump(model, ART_DIR / "game_win_extended.joblib")
     pd.Series(feature_cols).to_json(ART_DIR / "game_win_extended_features.json")
+    BatchScorer.from_model(model, feature_cols).save(ART_DIR / "game_win_extended_scorer.json")   # sklearn-free copy
 
     # Save metrics
     import json
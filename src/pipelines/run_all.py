@@ -1,33 +1,54 @@
 from __future__ import annotations
 import json
+import os
+from pathlib import Path
 from src.utils.config import parse_args
+from src.utils.profiling import Profiler
 from src.etl.fetch_nflverse import run as etl_run
-from src.features.team_ratings import build_team_epa_rolling
+from src.features.team_ratings import build_team_epa_rolling, update_team_epa_rolling
 from src.features.player_usage import build_player_usage
 from src.models.train_game_win import train_and_save
 from src.models.player_projections import build_simple_usage_projections
 
+RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
+PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
+ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
+
 def main():
     cfg = parse_args()
+    # --profile: per-step wall/CPU/RSS/rows/bytes (paths below are only used for row/byte counts)
+    prof = Profiler("run_all", enabled=cfg.profile, cprofile=cfg.cprofile, config={"seasons": cfg.seasons})
+    raw = lambda *ts: [str(RAW_DIR / t) for t in ts]
+
     print("[ETL] fetching open nflverse data...")
-    etl_paths = etl_run(cfg.seasons)
+    etl_paths = prof.run("etl", etl_run, seasons=cfg.seasons,
+                         outputs=raw("pbp", "pbp_slim", "weekly", "rosters", "schedules"))
     print(json.dumps(etl_paths, indent=2))
 
     print("[FEAT] building team ratings...")
-    team_path = build_team_epa_rolling()
+    # incremental by default: only games not yet rated are read (full build if no state yet)
+    build = update_team_epa_rolling if os.getenv("RATINGS_INCREMENTAL", "1") == "1" else build_team_epa_rolling
+    team_path = prof.run("team_ratings", build, inputs=raw("pbp_slim"),
+                         outputs=[str(PROC_DIR / "team_ratings.parquet")])
     print(f"team_ratings -> {team_path}")
 
     print("[FEAT] building player usage...")
-    usage_path = build_player_usage()
+    usage_path = prof.run("player_usage", build_player_usage, inputs=raw("weekly"),
+                          outputs=[str(PROC_DIR / "player_usage.parquet")])
     print(f"player_usage -> {usage_path}")
 
     print("[MODEL] training game win model...")
-    metrics = train_and_save()
+    metrics = prof.run("train_game_win", train_and_save, inputs=[str(PROC_DIR / "team_ratings.parquet"), *raw("schedules")],
+                       outputs=[str(ART_DIR / "game_win_clf.joblib"), str(ART_DIR / "game_win_clf_scorer.json")])
     print(f"game_win metrics: {metrics}")
 
     print("[MODEL] building simple player usage projections...")
-    proj_path = build_simple_usage_projections()
+    proj_path = prof.run("player_projections", build_simple_usage_projections,
+                         inputs=[str(PROC_DIR / "player_usage.parquet")],
+                         outputs=[str(ART_DIR / "player_usage_projections.csv")])
     print(f"player projections -> {proj_path}")
 
+    prof.report()
+
 if __name__ == "__main__":
     main()
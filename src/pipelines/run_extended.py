@@ -1,90 +1,96 @@
 from __future__ import annotations
-from src.utils.config import parse_args
-from src.etl.fetch_nflverse import run as etl_run
-from src.etl.fetch_betting_weather import fetch_betting_lines, build_betting_game_features
-from src.etl.fetch_injuries import fetch_injuries
-from src.features.team_ratings import build_team_epa_rolling
-from src.features.player_usage import build_player_usage
-from src.features.context_features import build_context_features
-from src.features.injury_adjustments import build_injury_adjustments
-from src.models.enrich_game_features import build_game_model_table
-from src.models.train_game_win_ext import train_and_save_extended
-from src.models.player_stats_projections import build_player_stat_projections
-from src.models.apply_injury_to_usage import apply_injury_to_player_projections
-from src.models.season_sim import simulate_season
-from src.models.predict_game_week import predict_week
-from src.reports.slate_report import build_weekly_slate_report
+import os
+from pathlib import Path
+from src.utils.config import RunConfig, parse_args
+from src.pipelines.runner import Stage, run_stages
 
-def main():
-    cfg = parse_args()
-    print("[ETL] nflverse core...")
-    etl_paths = etl_run(cfg.seasons)
-    print(etl_paths)
-
-    print("[ETL] betting lines (optional)...")
-    bpath = fetch_betting_lines(cfg.seasons)
-    if bpath:
-        print("betting ->", bpath)
-        print("[FEAT] betting features...")
-        bf = build_betting_game_features()
-        print("betting_features ->", bf)
-    else:
-        print("betting lines not available; continuing without.")
-
-    print("[ETL] injuries (optional)...")
-    ipath = fetch_injuries(cfg.seasons)
-    if ipath:
-        print("injuries ->", ipath)
-
-    print("[FEAT] team ratings (EPA rolling)...")
-    tr = build_team_epa_rolling()
-    print("team_ratings ->", tr)
-
-    print("[FEAT] player usage...")
-    pu = build_player_usage()
-    print("player_usage ->", pu)
+RAW_DIR = Path(os.getenv("RAW_DIR", "data/raw"))
+PROC_DIR = Path(os.getenv("PROC_DIR", "data/processed"))
+ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
+STATIC_DIR = Path("data/static")
 
-    print("[FEAT] context features (rest/travel/dome)...")
-    cf = build_context_features()
-    print("context_features ->", cf)
+def _raw(table: str) -> list[str]:
+    # partitioned table dir plus any legacy <table>_<start>_<end>.parquet files
+    return [str(RAW_DIR / table), str(RAW_DIR / f"{table}_*.parquet")]
 
-    if ipath:
-        print("[FEAT] injury adjustments...")
-        ia = build_injury_adjustments()
-        print("injury_adjustments ->", ia)
-
-    print("[MODEL] build enriched game table...")
-    tbl = build_game_model_table()
-    print("game_model_table ->", tbl)
+def stages(cfg: RunConfig) -> list[Stage]:
+    """
+    Every stage of the extended pipeline with its deps, inputs and outputs.
+    Independent branches (ratings / usage / context / injuries / betting, then
+    the game model vs. player stat projections) run concurrently.
+    """
+    season = max(cfg.seasons)
+    P, A = (lambda n: str(PROC_DIR / n)), (lambda n: str(ART_DIR / n))
+    return [
+        # Downloads always run (the download cache makes them cheap); their outputs gate everything else
+        Stage("etl", "src.etl.fetch_nflverse:run", {"seasons": cfg.seasons}, volatile=True,
+              outputs=[str(RAW_DIR / t) for t in ("pbp", "pbp_slim", "weekly", "rosters", "schedules")]
+                      + [str(RAW_DIR / "ids_latest.parquet")]),
+        Stage("betting_lines", "src.etl.fetch_betting_weather:fetch_betting_lines", {"years": cfg.seasons},
+              volatile=True, optional=True, outputs=[str(RAW_DIR / "betting_log")]),
+        Stage("injuries", "src.etl.fetch_injuries:fetch_injuries", {"years": cfg.seasons},
+              volatile=True, optional=True, outputs=_raw("injuries")),
 
-    print("[MODEL] train extended game-win model...")
-    metrics = train_and_save_extended()
-    print("extended metrics ->", metrics)
+        # Features: independent of one another
+        Stage("betting_features", "src.etl.fetch_betting_weather:build_betting_game_features",
+              deps=["etl", "betting_lines"], optional=True,
+              inputs=[str(RAW_DIR / "betting_log"), str(RAW_DIR / "betting_*.parquet"), *_raw("schedules")],
+              outputs=[P("betting_features.parquet")]),
+        Stage("team_ratings", "src.features.team_ratings:build_team_epa_rolling", deps=["etl"],
+              inputs=[*_raw("pbp"), *_raw("pbp_slim")],
+              outputs=[P("team_ratings.parquet"), P("team_ratings_state.npz")]),
+        Stage("player_usage", "src.features.player_usage:build_player_usage", deps=["etl"],
+              inputs=_raw("weekly"), outputs=[P("player_usage.parquet"), A("player_usage_projections.csv")]),
+        Stage("context", "src.features.context_features:build_context_features", deps=["etl"],
+              inputs=[*_raw("schedules"), str(STATIC_DIR / "stadiums.csv")],
+              outputs=[P("context_features.parquet"), P("stadium_matrix.npz")]),
+        Stage("injury_adjustments", "src.features.injury_adjustments:build_injury_adjustments",
+              deps=["injuries"], optional=True,
+              inputs=_raw("injuries"), outputs=[P("injury_adjustments.parquet"), P("injury_index.npz")]),
 
-    print("[MODEL] player stat projections...")
-    pstats = build_player_stat_projections()
-    print("player_stat_projections ->", pstats)
+        # Game model branch
+        Stage("game_table", "src.models.enrich_game_features:build_game_model_table",
+              deps=["team_ratings", "context", "betting_features"],
+              inputs=[*_raw("schedules"), P("team_ratings.parquet"), P("context_features.parquet"), P("betting_features.parquet")],
+              outputs=[P("game_model_table.parquet")]),
+        Stage("train_extended", "src.models.train_game_win_ext:train_and_save_extended", deps=["game_table"],
+              inputs=[P("game_model_table.parquet")],
+              outputs=[A("game_win_extended.joblib"), A("game_win_extended_features.json"), A("game_win_extended_metrics.json"),
+                       A("game_win_extended_scorer.json")]),
+        Stage("season_sim", "src.models.season_sim:simulate_season", {"season": season, "sims": 100_000, "target_se": 0.0025,
+                                                                        "antithetic": True, "use_extended": True},
+              deps=["game_table", "train_extended"],
+              inputs=[P("game_model_table.parquet"), A("game_win_extended_scorer.json"), A("game_win_extended.joblib"),
+                      str(STATIC_DIR / "team_meta.csv")],
+              outputs=[A(f"season_{season}_sim_summary.csv"), A(f"season_{season}_win_dist.csv"),
+                       A(f"season_{season}_scenarios")]),
 
-    # Injury-apply to usage projections
-    print("[MODEL] apply injury adjustments to usage projections...")
-    adjp = apply_injury_to_player_projections()
-    print("injury-adjusted usage projections ->", adjp)
+        # Player branch
+        Stage("player_stats", "src.models.player_stats_projections:build_player_stat_projections", deps=["etl"],
+              inputs=_raw("weekly"), outputs=[A("player_stat_projections.csv"), P("player_stat_projections_pergame.parquet")]),
+        Stage("injury_usage", "src.models.apply_injury_to_usage:apply_injury_to_player_projections",
+              deps=["player_usage", "injury_adjustments"],
+              inputs=[A("player_usage_projections.csv"), P("injury_adjustments.parquet"), P("injury_index.npz")],
+              outputs=[A("player_usage_projections_injury_adj.csv")]),
 
-    # Season sim for last season in range
-    season = max(cfg.seasons)
-    print(f"[SIM] Monte Carlo season {season}...")
-    sres = simulate_season(season=season, sims=2000, use_extended=True)
-    print("season_sim ->", sres)
+        # Predict/report week 1 of the last season (skipped on failure, as before)
+        Stage("predict", "src.models.predict_game_week:predict_week", {"season": season, "week": 1},
+              deps=["game_table"], optional=True,
+              inputs=[P("game_model_table.parquet"), P("team_ratings.parquet"), A("game_win_clf_scorer.json"),
+                      A("game_win_clf.joblib")],
+              outputs=[A(f"predictions_{season}_wk1.csv")]),
+        Stage("slate_report", "src.reports.slate_report:build_weekly_slate_report", {"season": season, "week": 1},
+              deps=["predict", "player_usage", "injury_usage"], optional=True,
+              inputs=[A(f"predictions_{season}_wk1.csv"), A("player_usage_projections.csv"),
+                      A("player_usage_projections_injury_adj.csv")],
+              outputs=[A(f"slate_report_{season}_wk1.html")]),
+    ]
 
-    # Predict most recent regular-season week that exists in schedules for reporting
-    # For simplicity assume week 1
-    try:
-        pw = predict_week(season=season, week=1)
-        print("predictions ->", pw)
-        rep = build_weekly_slate_report(season=season, week=1)
-        print("slate report ->", rep)
-    except Exception as e:
-        print("Slate report generation skipped:", e)
+def main():
+    cfg = parse_args()
+    run_stages(stages(cfg), force=cfg.force, until=cfg.until, workers=cfg.workers,
+               profile=cfg.profile, cprofile=cfg.cprofile, pipeline="run_extended",
+               config={"seasons": cfg.seasons, "force": cfg.force, "until": cfg.until})
 
 if __name__ == "__main__":
     main()
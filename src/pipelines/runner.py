@@ -0,0 +1,280 @@
+from __future__ import annotations
+import ast
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from src.utils.profiling import expand, print_summary, previous_report, profile_call, run_stamp, write_report
+
+ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
+MANIFEST = Path(os.getenv("PIPELINE_MANIFEST", str(ART_DIR / "pipeline_manifest.json")))
+HASH_CACHE = Path(os.getenv("PIPELINE_HASH_CACHE", "data/cache/pipeline_hashes.json"))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Incremental, parallel stage runner. Stages form a DAG (Stage.deps) and run on
+# a process pool as soon as their deps finish; data passes between them only
+# through their files on disk. A stage's fingerprint is the content hash of its
+# inputs, its code (the target module plus every src module it imports,
+# transitively) and its arguments; a stage whose fingerprint and outputs match
+# the manifest from the last run is skipped. File hashes are cached by
+# (size, mtime) so unchanged files are never re-read.
+
+@dataclass
+class Stage:
+    name: str
+    target: str                  # "package.module:function"
+    kwargs: dict = field(default_factory=dict)
+    deps: list[str] = field(default_factory=list)     # stages that must finish first
+    inputs: list[str] = field(default_factory=list)   # files, directories or globs
+    outputs: list[str] = field(default_factory=list)
+    volatile: bool = False       # reads remote data: always runs (its outputs gate the rest)
+    optional: bool = False       # a failure is reported and the run continues
+
+# --- hashing ------------------------------------------------------------------
+
+class HashCache:
+    def __init__(self, path: Path = HASH_CACHE):
+        self.path = path
+        try:
+            self.entries = json.loads(path.read_text())
+        except Exception:
+            self.entries = {}
+        self.dirty = False
+
+    def file(self, p: Path) -> str:
+        st = p.stat()
+        key = str(p)
+        hit = self.entries.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha256()
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.entries[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        self.dirty = True
+        return h.hexdigest()
+
+    def path_hash(self, spec: str) -> str:
+        """Hash of a file, a directory tree or a glob ("missing" if nothing matches)."""
+        if Path(spec).is_file():
+            return self.file(Path(spec))
+        files = expand(spec)
+        if not files:
+            return "missing"
+        h = hashlib.sha256()
+        for f in files:
+            h.update(f"{f}:{self.file(f)}\n".encode())
+        return h.hexdigest()
+
+    def save(self) -> None:
+        if self.dirty:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries))
+            self.dirty = False
+
+def _module_file(name: str) -> Path | None:
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return Path(spec.origin) if spec and spec.origin and spec.origin.endswith(".py") else None
+
+def code_files(module: str) -> list[Path]:
+    """The module's source plus every `src.*` module it imports, transitively."""
+    seen, todo = {}, [module]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        path = seen[name] = _module_file(name)
+        if path is None:
+            continue
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                names = [node.module] + [f"{node.module}.{a.name}" for a in node.names]
+            elif isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            else:
+                continue
+            todo += [n for n in names if n == "src" or n.startswith("src.")]
+    return sorted({p for p in seen.values() if p is not None})
+
+def fingerprint(stage: Stage, cache: HashCache) -> dict:
+    module = stage.target.split(":")[0]
+    code = hashlib.sha256()
+    for p in code_files(module):
+        code.update(f"{p.name}:{cache.file(p)}\n".encode())
+    fp = {"code": code.hexdigest(),
+          "args": json.dumps(stage.kwargs, sort_keys=True, default=str),
+          "inputs": {i: cache.path_hash(i) for i in stage.inputs}}
+    fp["digest"] = hashlib.sha256(json.dumps(fp, sort_keys=True).encode()).hexdigest()
+    return fp
+
+# --- manifest / execution -----------------------------------------------------
+
+def load_manifest(path: Path = MANIFEST) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except Exception:
+        return {"stages": {}}
+
+def _save_manifest(manifest: dict, path: Path = MANIFEST) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, default=str))
+    os.replace(tmp, path)
+
+def resolve(target: str):
+    module, fn = target.split(":")
+    return getattr(importlib.import_module(module), fn)
+
+def _up_to_date(stage: Stage, fp: dict, prev: dict | None, cache: HashCache) -> bool:
+    if stage.volatile or prev is None or prev.get("status") != "ok" or prev.get("fingerprint") != fp["digest"]:
+        return False
+    # outputs from the last run must still be there, unmodified
+    return all(cache.path_hash(p) == h for p, h in prev.get("outputs", {}).items())
+
+def _check_names(stages: list[Stage], names) -> None:
+    known = {s.name for s in stages}
+    unknown = [n for n in names if n not in known and n != "all"]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s) {unknown}; stages are: {[s.name for s in stages]}")
+
+def _ancestors(stages: list[Stage], name: str) -> set[str]:
+    by_name = {s.name: s for s in stages}
+    out, todo = set(), [name]
+    while todo:
+        for d in by_name[todo.pop()].deps:
+            if d not in out:
+                out.add(d); todo.append(d)
+    return out
+
+def _execute(target: str, kwargs: dict, profile: dict | None = None):
+    # runs in a worker process; only the target string and kwargs cross the boundary
+    if profile is not None:
+        result, stats = profile_call(resolve(target), kwargs, **profile)
+        return result, stats["wall_s"], stats
+    t0 = time.time()
+    return resolve(target)(**kwargs), time.time() - t0, None
+
+def run_stages(stages: list[Stage], force=(), until: str | None = None, workers: int | None = None,
+               profile: bool = False, cprofile: bool = False, pipeline: str = "pipeline", config: dict | None = None) -> dict:
+    """
+    Run `stages` as a dependency graph on a process pool of `workers`
+    (default PIPELINE_WORKERS; 1 runs in-process), skipping those whose
+    fingerprint matches the manifest. A stage starts once all its deps are
+    done; stages downstream of a failed (non-optional) stage are skipped while
+    independent branches carry on. `force` names stages to re-run regardless
+    ("all" for every stage); `until` runs only that stage and its ancestors.
+    `profile` records per-stage wall/CPU/RSS/rows/bytes into a run report
+    (`cprofile` also dumps cProfile stats per stage); each stage then runs in a
+    fresh worker process, so its peak RSS is its own, and its CPU time includes
+    any processes it spawned.
+    Returns the manifest; raises at the end if a required stage failed.
+    """
+    force = set(force or ())
+    _check_names(stages, force | ({until} if until else set()) | {d for s in stages for d in s.deps})
+    if until:
+        keep = _ancestors(stages, until) | {until}
+        stages = [s for s in stages if s.name in keep]
+    workers = PIPELINE_WORKERS if workers is None else max(1, int(workers))
+    by_name = {s.name: s for s in stages}
+
+    manifest = load_manifest()
+    cache = HashCache()
+    status: dict[str, str] = {}  # ok / skipped / failed / blocked
+    pending, running = list(stages), {}
+    stamp, t_run, report = run_stamp(), time.time(), {}
+
+    def profile_args(stage: Stage) -> dict | None:
+        if not profile:
+            return None
+        path = ART_DIR / "profiles" / f"{pipeline}_{stamp}" / f"{stage.name}.prof" if cprofile else None
+        return {"inputs": stage.inputs, "outputs": stage.outputs, "cprofile_path": path}
+
+    def finish(stage: Stage, rec: dict, outcome) -> None:
+        if isinstance(outcome, BaseException):
+            rec.update(status="failed", error=f"{type(outcome).__name__}: {outcome}")
+            note = " (optional, continuing)" if stage.optional else ""
+            print(f"[{stage.name}] failed{note}: {outcome}")
+        else:
+            result, seconds, stats = outcome
+            rec.update(status="ok", result=result, seconds=round(seconds, 3))
+            if stats:
+                rec["profile"] = stats
+            print(f"{stage.name} -> {result} ({seconds:.1f}s)")
+        report[stage.name] = {"status": rec["status"], **rec.get("profile", {})}
+        rec["outputs"] = {p: h for p in stage.outputs if (h := cache.path_hash(p)) != "missing"}
+        status[stage.name] = rec["status"]
+        manifest["stages"][stage.name] = rec
+        # saved after every stage so an interrupted run keeps its progress
+        _save_manifest(manifest); cache.save()
+
+    # profiled stages each get a fresh worker: ru_maxrss is a lifetime peak, so a
+    # reused process would report an earlier stage's peak as this one's
+    if profile:
+        pool = ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while pending or running:
+            progressed = False
+            for stage in list(pending):
+                if any(d not in status for d in stage.deps):
+                    continue
+                pending.remove(stage); progressed = True
+                failed = [d for d in stage.deps if status[d] == "blocked" or (status[d] == "failed" and not by_name[d].optional)]
+                if failed:
+                    print(f"[blocked] {stage.name} (upstream failed: {', '.join(failed)})")
+                    status[stage.name] = report[stage.name] = "blocked"
+                    continue
+                fp = fingerprint(stage, cache)
+                if not (force & {stage.name, "all"}) and _up_to_date(stage, fp, manifest["stages"].get(stage.name), cache):
+                    print(f"[skip] {stage.name} (up to date)")
+                    status[stage.name] = report[stage.name] = "skipped"
+                    continue
+                print(f"[run] {stage.name}...")
+                rec = {"fingerprint": fp["digest"], "code": fp["code"], "inputs": fp["inputs"],
+                       "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                if pool is None:
+                    try:
+                        outcome = _execute(stage.target, stage.kwargs, profile_args(stage))
+                    except Exception as e:
+                        outcome = e
+                    finish(stage, rec, outcome)
+                else:
+                    running[pool.submit(_execute, stage.target, stage.kwargs, profile_args(stage))] = (stage, rec)
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    stage, rec = running.pop(fut)
+                    try:
+                        outcome = fut.result()
+                    except Exception as e:
+                        outcome = e
+                    finish(stage, rec, outcome)
+            elif pending and not progressed:
+                raise RuntimeError(f"Dependency cycle among stages: {[s.name for s in pending]}")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    count = lambda st: [n for n, v in status.items() if v == st]
+    print(f"[pipeline] ran {len(count('ok')) + len(count('failed'))} stage(s) on {workers} worker(s), "
+          f"skipped {len(count('skipped'))} up-to-date: {', '.join(count('skipped')) or '-'}")
+    if profile:
+        report = {n: v if isinstance(v, dict) else {"status": v} for n, v in report.items()}
+        wall = time.time() - t_run
+        print_summary(report, wall, previous_report(pipeline, stamp))
+        print(f"[profile] report -> {write_report(pipeline, report, stamp, wall, {**(config or {}), 'workers': workers})}")
+    required = [n for n in count("failed") if not by_name[n].optional] + count("blocked")
+    if required:
+        raise RuntimeError(f"Pipeline incomplete; failed: {[n for n in count('failed') if not by_name[n].optional]}, "
+                           f"blocked downstream: {count('blocked')}")
+    return manifest
@@ -1,20 +1,36 @@
 from __future__ import annotations
 import argparse
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 @dataclass
 class RunConfig:
     seasons: list[int]
+    force: list[str] = field(default_factory=list)
+    until: str | None = None
+    workers: int | None = None
+    profile: bool = False
+    cprofile: bool = False
 
-def parse_args() -> RunConfig:
+def parse_args(argv=None) -> RunConfig:
     p = argparse.ArgumentParser(description="NFL open projections pipeline")
     p.add_argument("--seasons", required=True, type=str,
                    help="Season range like 2019-2024 or list like 2019,2020,2021")
-    args = p.parse_args()
+    p.add_argument("--force", action="append", default=[], metavar="STAGE",
+                   help="Re-run a stage even if it is up to date (repeatable; 'all' for every stage)")
+    p.add_argument("--until", default=None, metavar="STAGE",
+                   help="Run only this stage and the stages it depends on")
+    p.add_argument("--workers", type=int, default=None,
+                   help="Parallel stage processes (default PIPELINE_WORKERS; 1 = serial, in-process)")
+    p.add_argument("--profile", action="store_true",
+                   help="Record per-stage wall/CPU time, peak RSS, rows and bytes; writes a run report to data/artifacts")
+    p.add_argument("--cprofile", action="store_true",
+                   help="With --profile, also dump cProfile stats per stage (data/artifacts/profiles/)")
+    args = p.parse_args(argv)
     txt = args.seasons.strip()
     if "-" in txt:
         start, end = [int(x) for x in txt.split("-")]
         years = list(range(start, end+1))
     else:
         years = [int(x) for x in txt.split(",")]
-    return RunConfig(seasons=years)
+    return RunConfig(seasons=years, force=args.force, until=args.until, workers=args.workers,
+                     profile=args.profile or args.cprofile, cprofile=args.cprofile)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import cProfile
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+import pyarrow.parquet as pq
+
+ART_DIR = Path(os.getenv("ART_DIR", "data/artifacts"))
+
+# Per-stage profiling for the pipelines (--profile): wall and CPU time, peak RSS,
+# parquet rows in/out and bytes written. Reports are JSON in ART_DIR
+# (run_report_<pipeline>_<timestamp>.json plus one line per run appended to
+# run_reports.jsonl, so runs can be compared over time).
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _cpu_s() -> float:
+    # this process plus its reaped children (stages with their own pools, e.g. season_sim)
+    if resource is None:
+        return time.process_time()
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + kids.ru_utime + kids.ru_stime
+
+def _maxrss_mb() -> float:
+    # lifetime peak of this process: per-stage only if the stage has the process to itself
+    if resource is None:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes on macOS, KB on Linux
+
+def expand(spec: str) -> list[Path]:
+    """Files for a path spec: a file, a directory (recursive) or a glob."""
+    if any(ch in spec for ch in "*?["):
+        files = sorted(Path(f) for f in glob.glob(spec))   # Path.glob rejects absolute patterns
+    else:
+        p = Path(spec)
+        files = [p] if p.is_file() else sorted(q for q in p.rglob("*") if q.is_file()) if p.is_dir() else []
+    return [f for f in files if not f.name.endswith(".tmp")]
+
+def parquet_rows(specs) -> int:
+    # from footers only; nothing is read
+    n = 0
+    for spec in specs:
+        for f in expand(spec):
+            if f.suffix == ".parquet":
+                try:
+                    n += pq.ParquetFile(f).metadata.num_rows
+                except Exception:
+                    pass
+    return n
+
+def bytes_written(specs, since: float) -> int:
+    return sum(f.stat().st_size for spec in specs for f in expand(spec) if f.stat().st_mtime >= since)
+
+def profile_call(fn, kwargs: dict, inputs=(), outputs=(), cprofile_path: Path | None = None):
+    """Call fn(**kwargs) and return (result, stats)."""
+    rows_in = parquet_rows(inputs)
+    rss0, cpu0, t0 = _maxrss_mb(), _cpu_s(), time.time()
+    prof = cProfile.Profile() if cprofile_path else None
+    if prof:
+        prof.enable()
+    try:
+        result = fn(**kwargs)
+    finally:
+        if prof:
+            prof.disable()
+            cprofile_path.parent.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(cprofile_path)
+    wall, cpu, rss1 = time.time() - t0, _cpu_s() - cpu0, _maxrss_mb()
+    stats = {"wall_s": round(wall, 3), "cpu_s": round(cpu, 3),
+             "peak_rss_mb": round(rss1, 1), "rss_delta_mb": round(rss1 - rss0, 1),
+             "rows_in": rows_in, "rows_out": parquet_rows(outputs),
+             "bytes_written": bytes_written(outputs, since=t0 - 1),
+             "pid": os.getpid()}
+    if cprofile_path:
+        stats["cprofile"] = str(cprofile_path)
+    return result, stats
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def run_stamp() -> str:
+    return time.strftime("%Y%m%dT%H%M%S")
+
+def write_report(pipeline: str, stages: dict, stamp: str, wall_s: float, config: dict | None = None) -> Path:
+    """JSON report for one run; also appended to run_reports.jsonl for comparisons over time."""
+    report = {"pipeline": pipeline, "started": stamp, "wall_s": round(wall_s, 3),
+              "commit": _git_commit(), "python": platform.python_version(), "host": platform.node(),
+              "cpus": os.cpu_count(), "config": config or {}, "stages": stages}
+    ART_DIR.mkdir(parents=True, exist_ok=True)
+    p = ART_DIR / f"run_report_{pipeline}_{stamp}.json"
+    p.write_text(json.dumps(report, indent=2, default=str))
+    with open(ART_DIR / "run_reports.jsonl", "a") as f:
+        f.write(json.dumps(report, default=str) + "\n")
+    return p
+
+def previous_report(pipeline: str, before: str) -> dict | None:
+    p = ART_DIR / "run_reports.jsonl"
+    if not p.exists():
+        return None
+    last = None
+    for line in p.read_text().splitlines():
+        try:
+            r = json.loads(line)
+        except ValueError:
+            continue
+        if r.get("pipeline") == pipeline and r.get("started", "") < before:
+            last = r
+    return last
+
+def print_summary(stages: dict, wall_s: float, previous: dict | None = None) -> None:
+    prev = (previous or {}).get("stages", {})
+    print(f"{'stage':<22}{'status':>9}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'+rss MB':>9}"
+          f"{'rows in':>12}{'rows out':>12}{'MB out':>9}{'vs last':>9}")
+    for name, s in stages.items():
+        if "wall_s" not in s:
+            print(f"{name:<22}{s.get('status', '-'):>9}")
+            continue
+        last = prev.get(name, {}).get("wall_s")
+        vs = f"{s['wall_s'] / last:>8.2f}x" if last else f"{'-':>9}"
+        print(f"{name:<22}{s.get('status', 'ok'):>9}{s['wall_s']:>9.2f}{s['cpu_s']:>9.2f}{s['peak_rss_mb']:>9.0f}"
+              f"{s['rss_delta_mb']:>9.0f}{s['rows_in']:>12,}{s['rows_out']:>12,}{s['bytes_written'] / 2**20:>9.1f}{vs}")
+    total = f" (last run {previous['wall_s']:.2f}s)" if previous else ""
+    print(f"{'total wall':<22}{'':>9}{wall_s:>9.2f}{total}")
+
+class Profiler:
+    """Wraps the serial pipeline's calls; a no-op passthrough unless enabled."""
+    def __init__(self, pipeline: str, enabled: bool = False, cprofile: bool = False, config: dict | None = None):
+        self.pipeline, self.enabled, self.cprofile, self.config = pipeline, enabled, cprofile, config
+        self.stamp, self.t0, self.stages = run_stamp(), time.time(), {}
+
+    def run(self, name: str, fn, inputs=(), outputs=(), **kwargs):
+        if not self.enabled:
+            return fn(**kwargs)
+        path = ART_DIR / "profiles" / f"{self.pipeline}_{self.stamp}" / f"{name}.prof" if self.cprofile else None
+        try:
+            result, stats = profile_call(fn, kwargs, inputs, outputs, path)
+        except Exception as e:
+            self.stages[name] = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            self.report()
+            raise
+        self.stages[name] = {"status": "ok", **stats}
+        return result
+
+    def report(self) -> Path | None:
+        if not self.enabled:
+            return None
+        wall = time.time() - self.t0
+        print_summary(self.stages, wall, previous_report(self.pipeline, self.stamp))
+        p = write_report(self.pipeline, self.stages, self.stamp, wall, self.config)
+        print(f"[profile] report -> {p}")
+        return p
@@ -0,0 +1,83 @@
+from __future__ import annotations
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# The 32 current franchises. Category order is fixed, so a team's integer code
+# (0..31, int8) is the same in every table, file and process.
+TEAMS = [
+    "ARI", "ATL", "BAL", "BUF", "CAR", "CHI", "CIN", "CLE", "DAL", "DEN", "DET", "GB",
+    "HOU", "IND", "JAX", "KC", "LAC", "LAR", "LV", "MIA", "MIN", "NE", "NO", "NYG",
+    "NYJ", "PHI", "PIT", "SEA", "SF", "TB", "TEN", "WAS",
+]
+TEAM_DTYPE = pd.CategoricalDtype(TEAMS)
+TEAM_INDEX = {t: i for i, t in enumerate(TEAMS)}
+
+# Minimal alias map to normalize legacy/short codes
+ALIAS = {
+    # relocations / old codes
+    "OAK": "LV", "SD": "LAC", "STL": "LAR", "WSH": "WAS",
+    # short "LA" (nflverse uses this for the Rams)
+    "LA": "LAR",
+    # rare alternates seen in older feeds
+    "JAC": "JAX", "ARZ": "ARI", "BLT": "BAL", "CLV": "CLE", "HST": "HOU", "SL": "LAR", "LVR": "LV",
+}
+
+# Column roles (applied wherever the column is present)
+TEAM_COLUMNS = ("team", "home_team", "away_team", "posteam", "defteam", "recent_team", "opponent")
+PLAYER_COLUMNS = ("player_id", "gsis_id")
+INT_COLUMNS = {"season": "int16", "week": "int8"}
+
+def norm_team(t: str) -> str:
+    if not isinstance(t, str): return t
+    t = t.strip().upper()
+    return ALIAS.get(t, t)
+
+def to_team(s: pd.Series) -> pd.Series:
+    """Alias-normalize and intern team codes as the fixed 32-entry categorical (unknown -> NaN)."""
+    # (unordered categorical dtypes compare equal regardless of category order,
+    # so check the order explicitly: codes must mean the same team everywhere)
+    if isinstance(s.dtype, pd.CategoricalDtype) and s.cat.categories.equals(TEAM_DTYPE.categories):
+        return s
+    # normalize each distinct value once, then remap integer codes
+    codes, uniques = pd.factorize(s)
+    lut = np.array([TEAM_INDEX.get(norm_team(u), -1) for u in uniques] + [-1], dtype=np.int8)
+    return pd.Series(pd.Categorical.from_codes(lut[codes], dtype=TEAM_DTYPE), index=s.index, name=s.name)
+
+def team_codes(s: pd.Series) -> np.ndarray:
+    """int8 team codes (index into TEAMS; -1 for unknown/missing)."""
+    return to_team(s).cat.codes.to_numpy(np.int8)
+
+def _downcast_int(s: pd.Series, dtype: str) -> pd.Series:
+    if s.dtype == dtype or s.isna().any():
+        return s
+    info = np.iinfo(dtype)
+    v = pd.to_numeric(s, errors="coerce")
+    if v.isna().any() or v.min() < info.min or v.max() > info.max:
+        return s
+    return v.astype(dtype)
+
+def enforce(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """
+    Apply the compact pipeline schema to whatever known columns `df` has:
+    teams -> TEAM_DTYPE, player ids -> categorical, season -> int16, week -> int8.
+    Columns that can't be cast losslessly (e.g. weeks with NaN) are left as-is.
+    Returns a new frame (column data shared where unchanged) unless `inplace`,
+    which is only for frames the caller owns outright (fresh reads).
+    """
+    if not inplace:
+        df = df.copy(deep=False)   # never write into the caller's frame or a slice of one
+    for c in TEAM_COLUMNS:
+        if c in df.columns:
+            df[c] = to_team(df[c])
+    for c in PLAYER_COLUMNS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    for c, dtype in INT_COLUMNS.items():
+        if c in df.columns:
+            df[c] = _downcast_int(df[c], dtype)
+    return df
+
+def read_parquet(path, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+    """pd.read_parquet with the pipeline schema enforced."""
+    return enforce(pd.read_parquet(Path(path), columns=columns, filters=filters), inplace=True)
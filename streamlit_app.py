@@ -103,9 +103,16 @@ def section_teams():
         return
     teams = sorted(tr["team"].dropna().unique().tolist())
     team = st.selectbox("Team", teams, index=teams.index("KC") if "KC" in teams else 0)
+    # Rating cube: off_/def_/net_<variant> columns (roll4/roll8/roll16, ewm4/ewm8, std = season to date)
+    variants = [c[4:] for c in tr.columns if c.startswith("net_") and c != "net_epa_rating"]
+    if variants:
+        variant = st.selectbox("Rating window", variants, index=variants.index("roll8") if "roll8" in variants else 0)
+        cols = [f"off_{variant}", f"def_{variant}", f"net_{variant}"]
+    else:
+        cols = ["off_epa_pp_roll","def_epa_pp_roll","net_epa_rating"]
     tt = tr[tr["team"]==team].sort_values(["season","week"])
-    fig = px.line(tt, x=tt["season"].astype(str)+"-W"+tt["week"].astype(str), y=["off_epa_pp_roll","def_epa_pp_roll","net_epa_rating"],
-                  labels={"value":"EPA per play (rolling)","x":"Season-Week","variable":"metric"})
+    fig = px.line(tt, x=tt["season"].astype(str)+"-W"+tt["week"].astype(str), y=cols,
+                  labels={"value":"EPA per play (pre-game)","x":"Season-Week","variable":"metric"})
     st.plotly_chart(fig, use_container_width=True)
     st.dataframe(tt.tail(20), use_container_width=True)
 
@@ -124,6 +131,32 @@ def section_sims():
     fig = px.bar(df.sort_values("avg_wins", ascending=False), x="team", y="avg_wins", labels={"avg_wins":"Average Wins"})
     st.plotly_chart(fig, use_container_width=True)
     st.dataframe(df.sort_values(["playoff_odds"], ascending=False), use_container_width=True)
+    section_what_if(int(choice.split("_")[1]))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_scenarios(path: Path, stamp: int):
+    # `stamp` (meta.json mtime) keys the cache, so a re-sim is picked up
+    from src.models.scenarios import ScenarioStore
+    return ScenarioStore(path)
+
+def section_what_if(season: int):
+    path = ART_DIR / f"season_{season}_scenarios"
+    if not (path / "meta.json").exists():
+        return
+    st.subheader("What if...")
+    store = load_scenarios(path, (path / "meta.json").stat().st_mtime_ns)
+    games = store.games[~store.games["locked"]]
+    labels = {f"W{g.week}: {g.away_team} @ {g.home_team}": g for g in games.itertuples()}
+    picked = st.multiselect("Decide remaining games", list(labels))
+    winners = {labels[l].game_id: st.radio(l, [labels[l].away_team, labels[l].home_team], horizontal=True, key=l)
+               for l in picked}
+    if not winners:
+        return
+    res = store.compare(winners)
+    st.caption(f"{res.attrs['sims']:,} of {store.sims:,} simulated seasons match ({res.attrs['share']:.1%}).")
+    if res.attrs["sims"]:
+        st.dataframe(res[["team","playoff_odds","playoff_odds_if","playoff_delta","div_odds_if","top_seed_odds_if","avg_wins_if"]],
+                     use_container_width=True)
 
 def section_admin():
     st.header("Admin & Automation")